@@ -1,11 +1,10 @@
 import sys
 import ctypes
 import json
-import random
 import os
 import requests
-import re
 from collections import deque
+from concurrent.futures import CancelledError
 
 # import musicbrainzngs # Removed dependency
 from youtubesearchpython import VideosSearch
@@ -21,8 +20,8 @@ from PyQt6.QtWidgets import (
     QPushButton,
     QLabel,
     QMessageBox,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QStyledItemDelegate,
     QHeaderView,
     QFrame,
     QInputDialog,
@@ -33,14 +32,39 @@ from PyQt6.QtWidgets import (
     QProgressDialog,
     QLineEdit,
     QFormLayout,
+    QSpinBox,
 )
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineProfile
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QUrl, QStandardPaths, QTimer
-from PyQt6.QtGui import QAction, QIcon, QPixmap, QDesktopServices, QImage
+from PyQt6.QtCore import (
+    Qt,
+    QThread,
+    pyqtSignal,
+    QUrl,
+    QStandardPaths,
+    QTimer,
+    QRect,
+    QSize,
+)
+from PyQt6.QtGui import QAction, QIcon, QPixmap, QDesktopServices, QImage, QColor
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkDiskCache
 
+from fetch_client import DEFAULT_TIMEOUT as FETCH_TIMEOUT, FetchClient, worker_command
+from lru_cache import ByteBudgetLRU
+from mb_cache import CACHE_PATH_ENV, OFFLINE_ENV
+from ranking_session import RankingSession, split_session_data
+from ratings import (
+    BT_MAX_ITERATIONS,
+    BT_TOLERANCE,
+    DEFAULT_K_FACTOR,
+    RATING_ENGINES,
+    EloEngine,
+    fit_bradley_terry,
+)
+from table_models import AlbumRankingModel, LeaderboardModel
+from worker_protocol import FrameParser
+
 
 # ==========================================
 # 0. CUSTOM WIDGETS
@@ -305,170 +329,131 @@ class AddSongDialog(QDialog):
         }
 
 
-# ==========================================
-# 1. DATABASE MANAGER (With Filtering)
-# ==========================================
-class RankingSession:
-    def __init__(self):
-        self.songs = {}
-        self.current_filename = None
-        self.has_unsaved_changes = False
-        self.active_filter = "All Albums"  # Default filter
-        self.match_history = deque(maxlen=20)  # Track last 20 pairings to avoid repeats
-
-    def new_session(self):
-        self.songs = {}
-        self.current_filename = None
-        self.has_unsaved_changes = False
-        self.active_filter = "All Albums"
-        self.match_history.clear()
-
-    def load_from_file(self, filepath):
-        try:
-            with open(filepath, "r") as f:
-                self.songs = json.load(f)
-            self.current_filename = filepath
-            self.has_unsaved_changes = False
-            self.match_history.clear()
-            return True, f"Loaded {len(self.songs)} songs."
-        except Exception as e:
-            return False, str(e)
-
-    def save_session(self, filepath=None):
-        target = filepath if filepath else self.current_filename
-        if not target:
-            return False, "No filename specified"
-        try:
-            with open(target, "w") as f:
-                json.dump(self.songs, f, indent=4)
-            self.current_filename = target
-            self.has_unsaved_changes = False
-            return True, "Saved successfully."
-        except Exception as e:
-            return False, str(e)
-
-    def merge_data(self, new_data):
-        count = 0
-        for title, data in new_data.items():
-            if title not in self.songs:
-                self.songs[title] = data
-                count += 1
-        if count > 0:
-            self.has_unsaved_changes = True
-        return count
-
-    def get_albums_list(self):
-        """Returns a sorted list of unique albums in the current database."""
-        albums = set()
-        for data in self.songs.values():
-            if "album" in data:
-                albums.add(data["album"])
-        return sorted(list(albums))
-
-    def get_filtered_keys(self):
-        """Returns list of song keys matching the current filter."""
-        if self.active_filter == "All Albums":
-            return list(self.songs.keys())
-
-        filtered = []
-        for title, data in self.songs.items():
-            if data.get("album") == self.active_filter:
-                filtered.append(title)
-        return filtered
-
-    def get_matchup(self):
-        candidates = self.get_filtered_keys()
-        if len(candidates) < 2:
-            return None
-
-        # --- SMART MATCHMAKING ---
-
-        # 1. Select Song A (Challenger)
-        # Prioritize songs with fewer matches to ensure even coverage.
+class FitSettingsDialog(QDialog):
+    """Asks for the convergence settings of the Bradley-Terry fit."""
 
-        # Sort candidates by match count (ascending), then randomize slightly to break ties
-        random.shuffle(candidates)
-        candidates.sort(key=lambda k: self.songs[k]["matches"])
+    def __init__(self, parent=None, votes=0):
+        super().__init__(parent)
+        self.setWindowTitle("Fit MLE Scores")
+        self.resize(350, 150)
+        self.setStyleSheet("background-color: #333; color: white;")
 
-        pool_size = max(2, len(candidates) // 4)  # Bottom 25%
-        pool_a = candidates[:pool_size]
+        layout = QVBoxLayout(self)
+        layout.addWidget(
+            QLabel(f"Fit a Bradley-Terry model to {votes} recorded votes.")
+        )
+        form = QFormLayout()
 
-        song_a = random.choice(pool_a)
-        score_a = self.songs[song_a]["score"]
+        input_style = (
+            "padding: 5px; background: #444; border: 1px solid #555; color: white;"
+        )
 
-        # 2. Select Song B (Opponent)
-        # Prioritize songs with similar ELO ratings for a fair fight.
-        # Also avoid recent matchups.
+        self.inp_tol = QLineEdit(str(BT_TOLERANCE))
+        self.inp_tol.setStyleSheet(input_style)
+        form.addRow("Tolerance:", self.inp_tol)
 
-        opponents = [k for k in candidates if k != song_a]
+        self.inp_iter = QSpinBox()
+        self.inp_iter.setRange(1, 1000000)
+        self.inp_iter.setValue(BT_MAX_ITERATIONS)
+        self.inp_iter.setStyleSheet(input_style)
+        form.addRow("Max Iterations:", self.inp_iter)
 
-        weights = []
-        valid_opponents = []
+        layout.addLayout(form)
 
-        for opp in opponents:
-            # Check history
-            pair_key = tuple(sorted((song_a, opp)))
-            if pair_key in self.match_history:
-                continue  # Skip recently matched pairs
+        btn_layout = QHBoxLayout()
+        btn_ok = QPushButton("Fit")
+        btn_ok.clicked.connect(self.accept)
+        btn_ok.setStyleSheet(
+            "background-color: #3498db; padding: 8px; border-radius: 4px; font-weight: bold;"
+        )
 
-            score_b = self.songs[opp]["score"]
-            diff = abs(score_a - score_b)
+        btn_cancel = QPushButton("Cancel")
+        btn_cancel.clicked.connect(self.reject)
+        btn_cancel.setStyleSheet(
+            "background-color: #555; padding: 8px; border-radius: 4px;"
+        )
 
-            # Weight formula: Higher weight for smaller difference
-            # Add base to avoid division by zero and give small chance to upsets
-            weight = 1000 / (diff + 50)
+        btn_layout.addWidget(btn_ok)
+        btn_layout.addWidget(btn_cancel)
+        layout.addLayout(btn_layout)
 
-            valid_opponents.append(opp)
-            weights.append(weight)
+    def get_settings(self):
+        """Returns (tolerance, max_iter); tolerance is None if invalid."""
+        try:
+            tol = float(self.inp_tol.text())
+        except ValueError:
+            tol = None
+        if tol is not None and not tol > 0:
+            tol = None
+        return tol, self.inp_iter.value()
 
-        # Fallback if all opponents are in history (unlikely unless very few songs)
-        if not valid_opponents:
-            valid_opponents = opponents
-            weights = [1] * len(opponents)
 
-        song_b = random.choices(valid_opponents, weights=weights, k=1)[0]
+class CoverDelegate(QStyledItemDelegate):
+    """
+    Paints a size x size cover from MainWindow.image_cache. Qt only paints
+    rows inside the viewport, so only covers that are on screen get
+    requested (MainWindow.queue_cover).
+    """
 
-        # Record history
-        self.match_history.append(tuple(sorted((song_a, song_b))))
+    def __init__(self, window, size, parent=None):
+        super().__init__(parent)
+        self.window = window
+        self.size = size
 
-        # Return shuffled pair so A isn't always on the left
-        pair = [song_a, song_b]
-        random.shuffle(pair)
-        return pair
+    def paint(self, painter, option, index):
+        url = index.data(Qt.ItemDataRole.UserRole)
+        rect = QRect(0, 0, self.size, self.size)
+        rect.moveCenter(option.rect.center())
+        painter.fillRect(rect, QColor("#333"))
 
-    def update_score(self, winner, loser):
-        k = 32
-        r_win = self.songs[winner]["score"]
-        r_los = self.songs[loser]["score"]
+        pix = None
+        if not url:
+            text = "No Img"
+        elif url in self.window.failed_covers:
+            text = "Failed"
+        else:
+            pix = self.window.image_cache.get(self.window.cover_key(url, self.size))
+            if pix is None:
+                self.window.queue_cover(url, self.size)
+            text = "..."
 
-        e_win = 1 / (1 + 10 ** ((r_los - r_win) / 400))
-        e_los = 1 / (1 + 10 ** ((r_win - r_los) / 400))
+        if pix is not None:
+            painter.drawPixmap(rect, pix)
+        else:
+            painter.setPen(QColor("#b0b0b0"))
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, text)
 
-        self.songs[winner]["score"] = r_win + k * (1 - e_win)
-        self.songs[loser]["score"] = r_los + k * (0 - e_los)
-        self.songs[winner]["matches"] += 1
-        self.songs[loser]["matches"] += 1
-        self.has_unsaved_changes = True
+    def sizeHint(self, option, index):
+        return QSize(self.size + 10, self.size + 10)
 
 
 # ==========================================
 # 2. WORKER THREADS
 # ==========================================
+# iTunes and YouTube lookups share one long-lived fetch_data.py process
+fetch_worker = FetchClient()
+
+
 class Worker(QThread):
     finished = pyqtSignal(object)
     progress = pyqtSignal(str, int)  # New signal: (message, progress_value)
+    page = pyqtSignal(object)  # Songs of one release page, while importing
 
-    def __init__(self, task, payload, reject_list=None):
+    def __init__(self, task, payload, reject_list=None, env=None):
         super().__init__()
         self.task = task
         self.payload = payload
         self.reject_list = reject_list
+        self.env = env  # Environment of the fetch subprocess (None: inherit)
         self.process = None  # Handle to subprocess
+        self.lookups = []  # Futures of requests sent to the fetch worker
         self._is_running = True
 
     def stop(self):
         """Force kills the subprocess if it exists."""
         self._is_running = False
+        for future in self.lookups:
+            future.cancel()
         if self.process:
             try:
                 print(f"Terminating worker subprocess for task: {self.task}")
@@ -490,6 +475,12 @@ class Worker(QThread):
             self.search_youtube()
         elif self.task == "find_audio":
             self.search_itunes()
+        elif self.task == "fit_mle":
+            self.fit_mle()
+        elif self.task == "fill_matchups":
+            self.fill_matchups()
+        elif self.task == "prefetch_previews":
+            self.prefetch_previews()
 
     def fetch_artist_songs(self):
         import subprocess
@@ -497,22 +488,8 @@ class Worker(QThread):
         artist_name = self.payload
         print(f"Searching {artist_name} (Subprocess)...")
 
-        script_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), "fetch_data.py"
-        )
-
         try:
-            # Prepare arguments
-            if getattr(sys, "frozen", False):
-                # We are running in a bundle
-                # Call myself with --worker flag
-                cmd_args = [sys.executable, "--worker", artist_name]
-            else:
-                # Normal script execution
-                script_path = os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)), "fetch_data.py"
-                )
-                cmd_args = [sys.executable, script_path, artist_name]
+            cmd_args = worker_command(artist_name)
 
             # If we have a reject list, pass it as the 3rd argument (comma-separated)
             if self.reject_list:
@@ -521,243 +498,172 @@ class Worker(QThread):
                 # Pass empty string explicitly if list is empty but provided (implied 'reject nothing')
                 cmd_args.append("")
 
-            # Use Popen to read output line by line
+            # Binary pipes: the parser splits frames itself as chunks arrive
             self.process = subprocess.Popen(
                 cmd_args,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                bufsize=1,
-                universal_newlines=True,
-                encoding="utf-8",
-                errors="replace",
+                env=self.env,
                 creationflags=(
                     subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
                 ),
             )
 
-            output_json = []
-
+            parser = FrameParser()
+            self.result = None
+            self.error = None
             while self._is_running:
-                # Read line from stdout
-                line = self.process.stdout.readline()
-                if not line and self.process.poll() is not None:
+                chunk = self.process.stdout.read1(65536)
+                if not chunk:
                     break
-
-                if line:
-                    # Keep original line for JSON, but strip for checking tags
-                    stripped = line.strip()
-
-                    # Check for progress tag
-                    if stripped.startswith("PROGRESS:"):
-                        # Format: PROGRESS: Current/Total - Album Name
-                        try:
-                            parts = stripped.split(" - ", 1)
-                            album = parts[1] if len(parts) > 1 else ""
-                            nums = parts[0].replace("PROGRESS:", "").strip().split("/")
-                            current = int(nums[0])
-                            total = int(nums[1])
-
-                            percent = int((current / total) * 100)
-                            self.progress.emit(
-                                f"Fetching: {album} ({current}/{total})", percent
-                            )
-                        except Exception as e:
-                            print(f"Progress parse error: {e}")
-
-                    # Check for status tag (simple message update)
-                    elif stripped.startswith("STATUS:"):
-                        msg = stripped.replace("STATUS:", "").strip()
-                        # emit -1 for indeterminate
-                        self.progress.emit(msg, -1)
-
-                    else:
-                        # Assume it's part of the JSON output
-                        # We append the ORIGINAL line to preserve structure if needed (though json.loads handles whitespace)
-                        output_json.append(line)
-
-            # Wait for finish
-            stdout_remainder, stderr_output = self.process.communicate()
-            if stdout_remainder:
-                # Append any remainder that isn't progress (unlikely given logic above but good safety)
-                # Filter both PROGRESS and STATUS
-                rem_stripped = stdout_remainder.strip()
-                if not rem_stripped.startswith(
-                    "PROGRESS:"
-                ) and not rem_stripped.startswith("STATUS:"):
-                    output_json.append(stdout_remainder)
-
-            if self.process.returncode != 0:
-                # If we killed it manually, don't scream error
-                if not self._is_running:
-                    return
-
-                print(f"Subprocess failed: {stderr_output}")
-                self.finished.emit({})
+                for message in parser.feed(chunk):
+                    self.on_fetch_message(message)
+            for message in parser.close():
+                self.on_fetch_message(message)
+
+            _, stderr_output = self.process.communicate()
+            if not self._is_running:
+                # We killed it manually, don't scream error
                 return
-
             if stderr_output:
-                print(f"[Fetcher Log]: {stderr_output}")
-
-            full_output = "".join(output_json)
-            if not full_output:
-                self.finished.emit({})
-                return
+                print(
+                    f"[Fetcher Log]: {stderr_output.decode('utf-8', errors='replace')}"
+                )
 
-            try:
-                # Sometimes progress lines might get mixed if buffering is weird,
-                # but we filter for lines starting with { usually or just parse the last valid json line
-                # Ideally, the script only prints one JSON blob at the end.
-                # Let's find the JSON blob really simply:
-                match = re.search(r"(\{.*\})", full_output)
-                if match:
-                    new_songs = json.loads(match.group(1))
-                    self.finished.emit(new_songs)
-                else:
-                    # Try direct load if pure json
-                    try:
-                        new_songs = json.loads(full_output)
-                        self.finished.emit(new_songs)
-                    except json.JSONDecodeError:
-                        # Maybe the full output contains STATUS lines mixed in if they weren't caught line-by-line?
-                        # Try to clean it up
-                        cleaned_output = []
-                        for line in full_output.splitlines():
-                            if not line.startswith("STATUS:") and not line.startswith(
-                                "PROGRESS:"
-                            ):
-                                cleaned_output.append(line)
-
-                        new_songs = json.loads("".join(cleaned_output))
-                        self.finished.emit(new_songs)
-
-            except json.JSONDecodeError:
-                # Fallback: maybe multiple lines of JSON?
-                # Just emit empty if fail
-                print("Failed to parse JSON output")
-                self.finished.emit({})
+            if self.process.returncode != 0 and self.error is None:
+                self.error = f"Fetcher exited with code {self.process.returncode}"
+            if self.error is not None:
+                self.finished.emit({"error": self.error})
+            else:
+                self.finished.emit(self.result or {})
 
         except Exception as e:
             print(f"Subprocess Execution Error: {e}")
-            self.finished.emit({})
+            self.finished.emit({"error": str(e)})
+
+    def on_fetch_message(self, message):
+        """Handles one worker_protocol message of an artist fetch."""
+        kind = message["type"]
+        if kind == "status":
+            # emit -1 for indeterminate
+            self.progress.emit(message["message"], -1)
+        elif kind == "progress":
+            total = max(message["total"], 1)
+            percent = int(message["current"] / total * 100)
+            self.progress.emit(message["message"], percent)
+        elif kind == "partial":
+            self.page.emit(message["data"])
+        elif kind == "final":
+            self.result = message["result"]
+        elif kind == "error":
+            print(f"Fetch error: {message['message']}")
+            self.error = message["message"]
+            self.progress.emit(message["message"], -1)
+        elif kind == "metrics":
+            print(f"Fetch metrics: {message}")
+        else:
+            print(f"[Fetcher Log]: {message['text']}")
 
     def search_youtube(self):
-        import subprocess
-
         p = self.payload
         query = f"{p['artist']} {p['title']}"
+        url = self.lookup("youtube", query=query)
+        if not self._is_running:
+            return
+        self.finished.emit(url or None)
 
-        try:
-            if getattr(sys, "frozen", False):
-                cmd = [sys.executable, "--worker", "youtube", query]
-            else:
-                script_path = os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)), "fetch_data.py"
-                )
-                cmd = [sys.executable, script_path, "youtube", query]
+    def search_itunes(self):
+        self.finished.emit(self.find_itunes_preview(self.payload))
+
+    def prefetch_previews(self):
+        # payload: list of {"artist", "title", "album"}; emits {title: url or ""}
+        # All lookups go out at once; the fetch worker answers them in parallel
+        futures = [
+            (p["title"], self.submit_lookup("itunes", **self.itunes_params(p)))
+            for p in self.payload
+        ]
+        found = {}
+        for title, future in futures:
+            found[title] = self.wait_lookup(future) or ""
+            if not self._is_running:
+                return
+        self.finished.emit(found)
 
-            # subprocess to run search
-            # Use Popen instead of run() to allow killing
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                creationflags=(
-                    subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-                ),
-            )
+    def find_itunes_preview(self, p):
+        """Asks the fetch worker for a preview URL; returns it or None."""
+        return self.lookup("itunes", **self.itunes_params(p)) or None
 
-            try:
-                stdout, stderr = self.process.communicate(timeout=20)
-            except subprocess.TimeoutExpired:
-                self.process.kill()
-                stdout, stderr = self.process.communicate()
-                print("YouTube search timed out")
-
-            if self.process.returncode != 0:
-                if not self._is_running:
-                    return
-                print(f"YouTube Subprocess Error: {stderr}")
-                self.finished.emit(None)
-                return
+    @staticmethod
+    def itunes_params(p):
+        return {"artist": p["artist"], "title": p["title"], "album": p["album"]}
 
-            url = stdout.strip()
-            if url:
-                self.finished.emit(url)
-            else:
-                self.finished.emit(None)
+    def submit_lookup(self, method, **params):
+        future = fetch_worker.submit(method, **params)
+        self.lookups.append(future)
+        return future
 
+    def wait_lookup(self, future):
+        """Result of a lookup, or None if it failed, timed out or was stopped."""
+        try:
+            return future.result(timeout=FETCH_TIMEOUT)
+        except CancelledError:
+            return None
         except Exception as e:
-            print(f"DEBUG: Youtube Subprocess Exception: {e}")
-            self.finished.emit(None)
+            print(f"Fetch worker {self.task} lookup failed: {e}")
+            return None
+        finally:
+            fetch_worker.forget(future)
 
-    def search_itunes(self):
-        import subprocess
+    def lookup(self, method, **params):
+        return self.wait_lookup(self.submit_lookup(method, **params))
 
+    def fit_mle(self):
         p = self.payload
-        # args: itunes artist song album
         try:
-            if getattr(sys, "frozen", False):
-                cmd = [
-                    sys.executable,
-                    "--worker",
-                    "itunes",
-                    p["artist"],
-                    p["title"],
-                    p["album"],
-                ]
-            else:
-                script_path = os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)), "fetch_data.py"
-                )
-                cmd = [
-                    sys.executable,
-                    script_path,
-                    "itunes",
-                    p["artist"],
-                    p["title"],
-                    p["album"],
-                ]
-
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                creationflags=(
-                    subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-                ),
+            result = fit_bradley_terry(
+                p["votes"], p["titles"], tol=p["tol"], max_iter=p["max_iter"]
             )
+            self.finished.emit(result)
+        except Exception as e:
+            print(f"MLE fit failed: {e}")
+            self.finished.emit({"error": str(e)})
 
-            try:
-                stdout, stderr = self.process.communicate(timeout=15)
-            except subprocess.TimeoutExpired:
-                self.process.kill()
-                stdout, stderr = self.process.communicate()
-
-            url = stdout.strip()
-            if url:
-                self.finished.emit(url)
-            else:
-                self.finished.emit(None)
-
+    def fill_matchups(self):
+        # payload is the RankingSession; its lock keeps this off the UI's toes
+        try:
+            self.payload.fill_matchup_queue()
         except Exception as e:
-            print(f"DEBUG: iTunes Subprocess Exception: {e}")
-            self.finished.emit(None)
+            print(f"Matchup queue refill failed: {e}")
+        self.finished.emit(None)
 
 
 # ==========================================
 # 3. GUI MAIN WINDOW
 # ==========================================
+SESSION_OPEN_FILTER = (
+    "Sessions (*.json *.db *.sqlite);;JSON (*.json);;SQLite (*.db *.sqlite)"
+)
+SESSION_SAVE_FILTER = "JSON (*.json);;SQLite (*.db)"
+
+# Covers are cached pre-scaled to the size of the label showing them
+BATTLE_COVER_SIZE = 200
+ALBUM_COVER_SIZE = 60
+COVER_CACHE_BYTES = 48 * 1024 * 1024
+# Album-view covers downloading at once (battle covers are not limited)
+MAX_QUEUED_COVER_DOWNLOADS = 6
+
+
+def pixmap_bytes(pix):
+    return pix.width() * pix.height() * max(pix.depth(), 8) // 8
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.session = RankingSession()
         self.current_pair = None
+        self.prefetch_previews = False  # Read by setup_menu
+        self.offline_imports = False
 
         self.setWindowTitle("SongClash")
         self.resize(1100, 300)
@@ -782,8 +688,14 @@ class MainWindow(QMainWindow):
         self.network_manager.finished.connect(self.on_image_downloaded)
 
         # In-Memory Cache
-        self.image_cache = {}
-        self.active_downloads = {}
+        # (url, width, height) -> QPixmap scaled to that size, in device pixels
+        self.image_cache = ByteBudgetLRU(COVER_CACHE_BYTES, pixmap_bytes)
+        self.active_downloads = {}  # reply -> (cover url, started from the queue)
+        self.pending_covers = {}  # url being downloaded -> sizes wanted
+        self.failed_covers = set()  # Urls that could not be loaded
+        self.cover_queue = deque()  # (url, size) for album rows, newest first
+        self.queued_downloads = 0  # Downloads started from cover_queue
+        self.cover_targets = {}  # label -> cache key it should show once downloaded
 
         self.update_status("Welcome.")
         self.toggle_battle_mode(False)
@@ -798,6 +710,12 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """Ensure all subprocesses are killed when the app closes."""
         print("Closing application, cleaning up workers...")
+        stats = self.image_cache.stats()
+        print(
+            f"Cover cache: {stats['entries']} covers, {stats['bytes'] // 1024} KiB, "
+            f"{stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['evictions']} evictions"
+        )
         if hasattr(self, "worker") and self.worker and self.worker.isRunning():
             self.worker.stop()
             self.worker.wait()
@@ -810,6 +728,27 @@ class MainWindow(QMainWindow):
             self.a_worker.stop()
             self.a_worker.wait()
 
+        if hasattr(self, "p_worker") and self.p_worker and self.p_worker.isRunning():
+            self.p_worker.stop()
+            self.p_worker.wait()
+
+        if (
+            hasattr(self, "mle_worker")
+            and self.mle_worker
+            and self.mle_worker.isRunning()
+        ):
+            self.mle_worker.wait()
+
+        if (
+            hasattr(self, "queue_worker")
+            and self.queue_worker
+            and self.queue_worker.isRunning()
+        ):
+            self.queue_worker.wait()
+
+        fetch_worker.close()
+
+        self.session.close()
         event.accept()
 
     def setup_menu(self):
@@ -858,6 +797,49 @@ class MainWindow(QMainWindow):
         act_add.triggered.connect(self.action_add_artist)
         art_menu.addAction(act_add)
 
+        # Cancel Import: the progress popup goes away once songs arrive
+        self.act_cancel_import = QAction("Cancel Import", self)
+        self.act_cancel_import.setEnabled(False)
+        self.act_cancel_import.triggered.connect(self.action_cancel_import)
+        art_menu.addAction(self.act_cancel_import)
+
+        # Ratings Menu
+        rating_menu = menu.addMenu("&Ratings")
+
+        act_recompute = QAction("Recompute Ratings...", self)
+        act_recompute.triggered.connect(self.action_recompute_ratings)
+        rating_menu.addAction(act_recompute)
+
+        act_fit = QAction("Fit MLE Scores...", self)
+        act_fit.triggered.connect(self.action_fit_mle)
+        rating_menu.addAction(act_fit)
+
+        rating_menu.addSeparator()
+
+        # Pick the most informative pair instead of fewest matches + close score
+        act_active = QAction("Active Matchmaking", self)
+        act_active.setCheckable(True)
+        act_active.setChecked(self.session.matchmaking == "active")
+        act_active.toggled.connect(self.action_toggle_active_matchmaking)
+        rating_menu.addAction(act_active)
+
+        # Options Menu
+        options_menu = menu.addMenu("&Options")
+
+        # Look up iTunes previews for the next matchup before it is shown
+        act_previews = QAction("Prefetch Audio Previews", self)
+        act_previews.setCheckable(True)
+        act_previews.setChecked(self.prefetch_previews)
+        act_previews.toggled.connect(self.action_toggle_prefetch_previews)
+        options_menu.addAction(act_previews)
+
+        # Replay cached MusicBrainz responses instead of going online
+        act_offline = QAction("Offline Imports (Cached Only)", self)
+        act_offline.setCheckable(True)
+        act_offline.setChecked(self.offline_imports)
+        act_offline.toggled.connect(self.action_toggle_offline_imports)
+        options_menu.addAction(act_offline)
+
     def setup_ui(self):
         central = QWidget()
         self.setCentralWidget(central)
@@ -1054,7 +1036,7 @@ class MainWindow(QMainWindow):
         lbl.setStyleSheet("color: #b0b0b0;")
 
         lbl_cover = QLabel()
-        lbl_cover.setFixedSize(200, 200)
+        lbl_cover.setFixedSize(BATTLE_COVER_SIZE, BATTLE_COVER_SIZE)
         lbl_cover.setAlignment(Qt.AlignmentFlag.AlignCenter)
         lbl_cover.setStyleSheet("background-color: #1e1e1e; border: 1px solid #333;")
         lbl_cover.setScaledContents(True)
@@ -1144,6 +1126,7 @@ class MainWindow(QMainWindow):
 
     def on_filter_changed(self, text):
         self.session.active_filter = text
+        self.session.invalidate_matchups()
         self.next_matchup()
 
     def delete_current_album(self):
@@ -1166,17 +1149,10 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             # Delete songs belonging to this album
-            original_count = len(self.session.songs)
-
-            # Iterate over copy of keys to allow deletion
-            keys_to_delete = [
-                k for k, v in self.session.songs.items() if v.get("album") == album
-            ]
-
-            for k in keys_to_delete:
-                del self.session.songs[k]
-
-            deleted_count = original_count - len(self.session.songs)
+            keys = self.session.get_album_keys(album)
+            deleted_count = self.session.delete_album(album)
+            if self.leaderboard_visible():
+                self.leaderboard_model.remove_keys(keys)
 
             self.session.has_unsaved_changes = True
             self.refresh_filter_list()
@@ -1189,15 +1165,19 @@ class MainWindow(QMainWindow):
 
     def action_new(self):
         self.session.new_session()
+        if self.leaderboard_visible():
+            self.leaderboard_model.refresh()
         self.refresh_filter_list()
         self.toggle_battle_mode(False)
         self.update_status("New session.")
 
     def action_open(self):
-        fname, _ = QFileDialog.getOpenFileName(self, "Open", "", "JSON (*.json)")
+        fname, _ = QFileDialog.getOpenFileName(self, "Open", "", SESSION_OPEN_FILTER)
         if fname:
             ok, msg = self.session.load_from_file(fname)
             if ok:
+                if self.leaderboard_visible():
+                    self.leaderboard_model.refresh()
                 self.refresh_filter_list()
                 self.toggle_battle_mode(True)
                 self.next_matchup()
@@ -1211,7 +1191,7 @@ class MainWindow(QMainWindow):
             self.update_status(msg)
 
     def action_save_as(self):
-        fname, _ = QFileDialog.getSaveFileName(self, "Save", "", "JSON (*.json)")
+        fname, _ = QFileDialog.getSaveFileName(self, "Save", "", SESSION_SAVE_FILTER)
         if fname:
             _, msg = self.session.save_session(fname)
             self.update_status(msg)
@@ -1220,13 +1200,133 @@ class MainWindow(QMainWindow):
         fname, _ = QFileDialog.getOpenFileName(self, "Merge", "", "JSON (*.json)")
         if fname:
             with open(fname, "r") as f:
-                data = json.load(f)
+                data, _, _ = split_session_data(json.load(f))
+            new_titles = [t for t in data if t not in self.session.songs]
             c = self.session.merge_data(data)
+            if self.leaderboard_visible():
+                self.leaderboard_model.insert_keys(new_titles)
             self.refresh_filter_list()
             self.update_status(f"Merged {c} songs.")
             self.next_matchup()
 
+    def action_recompute_ratings(self):
+        votes = self.session.count_votes()
+        labels = [engine.LABEL for engine in RATING_ENGINES.values()]
+        label, ok = QInputDialog.getItem(
+            self,
+            "Recompute Ratings",
+            f"Replay {votes} recorded votes with rating engine:",
+            labels,
+            labels.index(self.session.engine.LABEL),
+            False,
+        )
+        if not ok:
+            return
+        engine_cls = next(e for e in RATING_ENGINES.values() if e.LABEL == label)
+
+        if engine_cls is EloEngine:
+            current = getattr(self.session.engine, "k_factor", DEFAULT_K_FACTOR)
+            k_factor, ok = QInputDialog.getInt(
+                self, "Recompute Ratings", "K-factor:", current, 1, 400
+            )
+            if not ok:
+                return
+            engine = EloEngine(k_factor)
+        else:
+            engine = engine_cls()
+
+        reply = QMessageBox.question(
+            self,
+            "Confirm Recompute",
+            "All scores and match counts will be rebuilt from the vote history.\n"
+            "Votes cast before the history was recorded will be lost.\n\nContinue?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No,
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        result = self.session.recompute_ratings(engine)
+        if self.leaderboard_visible():
+            self.leaderboard_model.refresh()
+        self.update_status(
+            f"Recomputed {engine.LABEL} ratings from {result['votes']} votes "
+            f"in {result['seconds']:.2f}s."
+        )
+        self.next_matchup()
+
+    def action_toggle_active_matchmaking(self, checked):
+        self.session.matchmaking = "active" if checked else "balanced"
+        self.session.invalidate_matchups()
+        self.update_status(
+            "Active matchmaking: picking the most informative pairs."
+            if checked
+            else "Balanced matchmaking: fewest matches, close scores."
+        )
+
+    def action_toggle_prefetch_previews(self, checked):
+        self.prefetch_previews = checked
+        if checked:
+            self.prefetch_upcoming()
+
+    def action_toggle_offline_imports(self, checked):
+        self.offline_imports = checked
+
+    def fetch_env(self):
+        """Environment for artist imports: where to cache MusicBrainz data."""
+        env = dict(os.environ)
+        env[CACHE_PATH_ENV] = os.path.join(
+            QStandardPaths.writableLocation(
+                QStandardPaths.StandardLocation.CacheLocation
+            ),
+            "musicbrainz.sqlite",
+        )
+        env[OFFLINE_ENV] = "1" if self.offline_imports else "0"
+        return env
+
+    def action_fit_mle(self):
+        if getattr(self, "mle_worker", None) and self.mle_worker.isRunning():
+            self.update_status("MLE fit already running...")
+            return
+        votes = self.session.count_votes()
+        if not votes:
+            QMessageBox.information(
+                self, "Fit MLE Scores", "No recorded votes to fit yet."
+            )
+            return
+
+        dlg = FitSettingsDialog(self, votes)
+        if dlg.exec() != QDialog.DialogCode.Accepted:
+            return
+        tol, max_iter = dlg.get_settings()
+        if tol is None:
+            QMessageBox.warning(self, "Error", "Tolerance must be a positive number.")
+            return
+
+        self.mle_worker = Worker("fit_mle", self.session.get_fit_payload(tol, max_iter))
+        self.mle_worker.finished.connect(self.on_mle_fitted)
+        self.mle_worker.start()
+        self.update_status(f"Fitting MLE scores to {votes} votes...")
+
+    def on_mle_fitted(self, result):
+        if "error" in result:
+            QMessageBox.warning(self, "Fit MLE Scores", result["error"])
+            return
+        self.session.mle_scores = result["scores"]
+        state = "converged" if result["converged"] else "stopped (not converged)"
+        self.update_status(
+            f"MLE fit {state} after {result['iterations']} iterations "
+            f"in {result['seconds']:.2f}s."
+        )
+        if self.leaderboard_visible():
+            self.leaderboard_model.column_changed("mle")
+
     def action_add_artist(self):
+        if self.is_importing():
+            QMessageBox.information(
+                self, "Add Artist", "Wait for the current import to finish."
+            )
+            return
         text, ok = QInputDialog.getText(self, "Add Artist", "Artist Name:")
         if ok and text:
             # Ask for types to include
@@ -1283,16 +1383,52 @@ class MainWindow(QMainWindow):
             for child in self.progress_dialog.findChildren(QLabel):
                 child.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
-            self.worker = Worker("fetch_artist", text, reject_list)
+            # Titles this import added; pages may rename or correct them
+            self.import_titles = set()
+            self.worker = Worker(
+                "fetch_artist", text, reject_list, env=self.fetch_env()
+            )
             self.worker.progress.connect(self.on_progress)
+            self.worker.page.connect(self.on_import_page)
             self.worker.finished.connect(self.on_added)
 
             # Connect cancel button to stop worker
-            self.progress_dialog.canceled.connect(self.worker.stop)
+            self.progress_dialog.canceled.connect(self.action_cancel_import)
 
+            self.act_cancel_import.setEnabled(True)
             self.worker.start()
 
+    def action_cancel_import(self):
+        if not self.is_importing():
+            return
+        self.worker.stop()
+        # A stopped worker does not emit finished; songs merged so far stay
+        self.act_cancel_import.setEnabled(False)
+        self.update_status(
+            f"Import cancelled, {len(self.import_titles)} songs were added."
+        )
+
+    def close_progress_dialog(self):
+        """Closes the import popup without cancelling the import."""
+        dialog = getattr(self, "progress_dialog", None)
+        if dialog is None or not dialog.isVisible():
+            return
+        # close() emits canceled, which would stop the import
+        try:
+            dialog.canceled.disconnect(self.action_cancel_import)
+        except TypeError:
+            pass  # Not connected
+        dialog.close()
+
+    def is_importing(self):
+        worker = getattr(self, "worker", None)
+        return worker is not None and worker.isRunning()
+
     def on_progress(self, msg, val):
+        if hasattr(self, "progress_dialog") and not self.progress_dialog.isVisible():
+            # Closed once the first songs arrived; keep reporting below
+            self.update_status(msg)
+            return
         if hasattr(self, "progress_dialog"):
             self.progress_dialog.setLabelText(msg)
             if val < 0:
@@ -1301,19 +1437,43 @@ class MainWindow(QMainWindow):
                 self.progress_dialog.setRange(0, 100)
                 self.progress_dialog.setValue(val)
 
-    def on_added(self, data):
-        # Close progress popup
-        if hasattr(self, "progress_dialog") and self.progress_dialog.isVisible():
-            self.progress_dialog.close()
-
-        if not data:
-            self.update_status("Fetch failed.")
-            return
-        c = self.session.merge_data(data)
+    def on_import_page(self, page):
+        """Merges a release page of a running import so battles can start."""
+        c = self.session.merge_import_page(page, self.import_titles)
         self.refresh_filter_list()
-        self.update_status(f"Added {c} songs.")
-        self.toggle_battle_mode(True)
-        self.next_matchup()
+        if self.leaderboard_visible():
+            # Rows of renamed or corrected songs are replaced, new ones added
+            titles = [t for pair in page.get("renamed", ()) for t in pair]
+            titles += [t for t in page["songs"] if t in self.import_titles]
+            self.leaderboard_model.remove_keys(titles)
+            self.leaderboard_model.insert_keys(titles)
+        if not self.import_titles:
+            return
+        # The modal popup would block voting; progress goes to the status bar
+        # and Add Music > Cancel Import stops the import from then on
+        self.close_progress_dialog()
+        self.update_status(
+            f"Importing... {len(self.import_titles)} songs so far (+{c})."
+        )
+        # Start battling, or replace a pair the page just renamed
+        if not self.current_pair or any(
+            t not in self.session.songs for t in self.current_pair
+        ):
+            self.next_matchup()
+
+    def on_added(self, data):
+        self.close_progress_dialog()
+        self.act_cancel_import.setEnabled(False)
+
+        # The songs themselves were merged page by page as they arrived;
+        # songs already in the session were fetched but not added
+        added = len(self.import_titles)
+        if "error" in data:
+            self.update_status(f"Fetch failed: {data['error']} ({added} songs added).")
+        elif not data.get("count"):
+            self.update_status("Fetch failed: no songs found (0 songs added).")
+        else:
+            self.update_status(f"Added {added} of {data['count']} fetched songs.")
 
     def toggle_battle_mode(self, enable):
         for p in [self.panel_a, self.panel_b]:
@@ -1322,8 +1482,55 @@ class MainWindow(QMainWindow):
             p["audio_btn"].setEnabled(enable)
         self.btn_skip.setEnabled(enable)
 
+    def refill_matchups(self):
+        """Tops up the session's matchup queue in a background thread."""
+        if getattr(self, "queue_worker", None) and self.queue_worker.isRunning():
+            return
+        self.queue_worker = Worker("fill_matchups", self.session)
+        self.queue_worker.finished.connect(lambda _: self.prefetch_upcoming())
+        self.queue_worker.start()
+
+    def prefetch_upcoming(self):
+        """
+        Starts downloading covers for every queued matchup and, if enabled,
+        looks up audio previews for the next one, so they are ready by the
+        time the pair is shown.
+        """
+        upcoming = self.session.peek_matchups()
+        for pair in upcoming:
+            for title in pair:
+                d = self.session.songs.get(title)
+                if d:
+                    self.fetch_cover(d.get("cover_url"))
+
+        if not self.prefetch_previews or not upcoming:
+            return
+        if getattr(self, "p_worker", None) and self.p_worker.isRunning():
+            return
+        missing = []
+        for title in upcoming[0]:
+            d = self.session.songs.get(title)
+            if d and "preview_url" not in d:
+                missing.append(
+                    {"artist": d["artist"], "title": title, "album": d["album"]}
+                )
+        if missing:
+            self.p_worker = Worker("prefetch_previews", missing)
+            self.p_worker.finished.connect(self.on_previews_prefetched)
+            self.p_worker.start()
+
+    def on_previews_prefetched(self, found):
+        for title, url in found.items():
+            d = self.session.songs.get(title)
+            # Leave it alone if a manual search finished first
+            if d is not None and "preview_url" not in d:
+                d["preview_url"] = url
+                self.session.has_unsaved_changes = True
+
     def next_matchup(self):
-        pair = self.session.get_matchup()
+        # Usually drawn ahead of time by refill_matchups
+        pair = self.session.pop_matchup()
+        self.refill_matchups()
         if not pair:
             # If filtering returns < 2 songs, disable buttons
             self.toggle_battle_mode(False)
@@ -1348,6 +1555,7 @@ class MainWindow(QMainWindow):
             '<h1 style="color:white;text-align:center;font-family:sans-serif;margin-top:20%;">Preview</h1>'
         )
         self.stop_audio()
+        self.prefetch_upcoming()
 
     def vote(self, side):
         if not self.current_pair:
@@ -1358,6 +1566,8 @@ class MainWindow(QMainWindow):
             else (self.current_pair[1], self.current_pair[0])
         )
         self.session.update_score(win, los)
+        if self.leaderboard_visible():
+            self.leaderboard_model.scores_changed((win, los))
         self.update_status("Rated.")
         self.next_matchup()
 
@@ -1548,18 +1758,66 @@ class MainWindow(QMainWindow):
         if status == QMediaPlayer.MediaStatus.EndOfMedia:
             self.stop_audio()
 
+    def cover_key(self, url, size):
+        """image_cache key for `url` shown in a size x size label."""
+        pixels = round(size * self.devicePixelRatioF())
+        return (url, pixels, pixels)
+
     def load_cover(self, url, label_widget):
         label_widget.clear()
-        label_widget.setText("Loading...")
+        self.cover_targets.pop(label_widget, None)
         if not url:
             label_widget.setText("No Cover")
             return
 
         # Check Memory Cache
-        if url in self.image_cache:
-            label_widget.setPixmap(self.image_cache[url])
+        key = self.cover_key(url, label_widget.width())
+        pix = self.image_cache.get(key)
+        if pix is not None:
+            label_widget.setPixmap(pix)
             return
 
+        label_widget.setText("Loading...")
+        self.cover_targets[label_widget] = key
+        self.fetch_cover(url, label_widget.width())
+
+    def queue_cover(self, url, size):
+        """
+        Asks for a cover of a row being painted in the album view. The most
+        recent requests (rows on screen now) start first, at most
+        MAX_QUEUED_COVER_DOWNLOADS at a time.
+        """
+        if url in self.pending_covers:
+            self.pending_covers[url].add(self.cover_key(url, size))
+            return
+        if (url, size) in self.cover_queue:
+            self.cover_queue.remove((url, size))
+        self.cover_queue.appendleft((url, size))
+        self.start_queued_covers()
+
+    def start_queued_covers(self):
+        while self.cover_queue and self.queued_downloads < MAX_QUEUED_COVER_DOWNLOADS:
+            url, size = self.cover_queue.popleft()
+            if url in self.pending_covers:
+                self.pending_covers[url].add(self.cover_key(url, size))
+            elif self.fetch_cover(url, size, queued=True):
+                self.queued_downloads += 1
+
+    def fetch_cover(self, url, size=BATTLE_COVER_SIZE, queued=False):
+        """
+        Downloads a cover and caches it scaled for a size x size label.
+        Several sizes of one url share a single download. Returns True if a
+        new download was started.
+        """
+        if not url:
+            return False
+        key = self.cover_key(url, size)
+        if key in self.image_cache:
+            return False
+        if url in self.pending_covers:
+            self.pending_covers[url].add(key)
+            return False
+
         req = QNetworkRequest(QUrl(url))
         # Ensure disk cache is used
         req.setAttribute(
@@ -1568,30 +1826,65 @@ class MainWindow(QMainWindow):
         )
 
         reply = self.network_manager.get(req)
-        self.active_downloads[reply] = label_widget
+        self.active_downloads[reply] = (url, queued)
+        self.pending_covers[url] = {key}
+        return True
 
     def on_image_downloaded(self, reply):
-        label_widget = self.active_downloads.pop(reply, None)
-        if not label_widget:
+        url, queued = self.active_downloads.pop(reply, (None, False))
+        if url is None:
             reply.deleteLater()
             return
+        keys = self.pending_covers.pop(url, set())
+        if queued:
+            self.queued_downloads -= 1
+            self.start_queued_covers()
 
-        url = reply.request().url().toString()
-
+        pix = None
         if reply.error() == reply.NetworkError.NoError:
             data = reply.readAll()
             pix = QPixmap()
             pix.loadFromData(data)
+        reply.deleteLater()
 
-            if not pix.isNull():
-                # Cache in memory only if valid
-                self.image_cache[url] = pix
-                label_widget.setPixmap(pix)
-            else:
-                label_widget.setText("Invalid Image")
+        # Labels still waiting for this url (none for a prefetch)
+        waiting = [
+            (label_widget, key)
+            for label_widget, key in self.cover_targets.items()
+            if key[0] == url
+        ]
+        scaled = {}
+        if pix is not None and not pix.isNull():
+            # Only the scaled copies are kept, never the full-size image
+            for key in keys.union(key for _, key in waiting):
+                scaled[key] = pix.scaled(
+                    key[1],
+                    key[2],
+                    Qt.AspectRatioMode.IgnoreAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation,
+                )
+                scaled[key].setDevicePixelRatio(self.devicePixelRatioF())
+                self.image_cache.put(key, scaled[key])
         else:
-            label_widget.setText("Failed")
-        reply.deleteLater()
+            self.failed_covers.add(url)  # So album rows stop asking for it
+
+        if hasattr(self, "win_alb") and self.win_alb.isVisible():
+            self.album_table.viewport().update()
+
+        for label_widget, key in waiting:
+            del self.cover_targets[label_widget]
+            try:
+                if pix is None:
+                    label_widget.setText("Failed")
+                elif pix.isNull():
+                    label_widget.setText("Invalid Image")
+                else:
+                    label_widget.setPixmap(scaled[key])
+            except RuntimeError:
+                pass  # Label was deleted with its window meanwhile
+
+    def leaderboard_visible(self):
+        return hasattr(self, "win_t") and self.win_t.isVisible()
 
     def show_leaderboard(self):
         self.win_t = QWidget()
@@ -1599,12 +1892,18 @@ class MainWindow(QMainWindow):
         self.win_t.resize(700, 600)
         l = QVBoxLayout(self.win_t)
 
-        self.table_widget = QTableWidget()
-        self.table_widget.setColumnCount(4)
-        self.table_widget.setHorizontalHeaderLabels(["Rank", "Artist", "Song", "Score"])
+        self.leaderboard_model = LeaderboardModel(self.session, self.win_t)
+        self.table_widget = QTableView()
+        self.table_widget.setModel(self.leaderboard_model)
+        self.table_widget.verticalHeader().setVisible(False)
         self.table_widget.horizontalHeader().setSectionResizeMode(
             2, QHeaderView.ResizeMode.Stretch
         )
+        # Click a header to sort by that column; starts in rank order
+        self.table_widget.horizontalHeader().setSortIndicator(
+            0, Qt.SortOrder.AscendingOrder
+        )
+        self.table_widget.setSortingEnabled(True)
         # Enable extended selection (Shift/Ctrl click) for multiple rows
         self.table_widget.setSelectionMode(
             QAbstractItemView.SelectionMode.ExtendedSelection
@@ -1650,10 +1949,7 @@ class MainWindow(QMainWindow):
         l.addLayout(btn_layout)
 
         def export_csv():
-            keys = self.session.get_filtered_keys()
-            sorted_keys = sorted(
-                keys, key=lambda k: self.session.songs[k]["score"], reverse=True
-            )
+            sorted_keys = self.session.get_ranked_keys()
 
             if not sorted_keys:
                 QMessageBox.warning(self.win_t, "Export", "No songs to export!")
@@ -1696,37 +1992,6 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 QMessageBox.critical(self.win_t, "Export Failed", str(e))
 
-        def populate_table():
-            # Only show songs from current filter
-            keys = self.session.get_filtered_keys()
-            # Sort them
-            sorted_keys = sorted(
-                keys, key=lambda k: self.session.songs[k]["score"], reverse=True
-            )
-
-            self.table_widget.setRowCount(len(sorted_keys))
-            for i, key in enumerate(sorted_keys):
-                d = self.session.songs[key]
-                # Rank
-                item_rank = QTableWidgetItem(str(i + 1))
-                item_rank.setFlags(item_rank.flags() ^ Qt.ItemFlag.ItemIsEditable)
-                self.table_widget.setItem(i, 0, item_rank)
-
-                # Artist
-                item_artist = QTableWidgetItem(d["artist"])
-                item_artist.setFlags(item_artist.flags() ^ Qt.ItemFlag.ItemIsEditable)
-                self.table_widget.setItem(i, 1, item_artist)
-
-                # Song
-                item_song = QTableWidgetItem(key)
-                item_song.setFlags(item_song.flags() ^ Qt.ItemFlag.ItemIsEditable)
-                self.table_widget.setItem(i, 2, item_song)
-
-                # Score
-                item_score = QTableWidgetItem(str(int(d["score"])))
-                item_score.setFlags(item_score.flags() ^ Qt.ItemFlag.ItemIsEditable)
-                self.table_widget.setItem(i, 3, item_score)
-
         def delete_selected():
             selected_rows = sorted(
                 set(index.row() for index in self.table_widget.selectedIndexes()),
@@ -1737,16 +2002,13 @@ class MainWindow(QMainWindow):
 
             # Confirm deletion? (Optional, but good practice. For now just do it as requested "just deleting rows")
 
-            for row in selected_rows:
-                song_item = self.table_widget.item(row, 2)
-                if song_item:
-                    song_key = song_item.text()
-                    if song_key in self.session.songs:
-                        del self.session.songs[song_key]
-                        self.session.has_unsaved_changes = True
+            model = self.leaderboard_model
+            keys = [model.key_at(row) for row in selected_rows]
+            for song_key in keys:
+                self.session.delete_song(song_key)
 
-            self.update_status(f"Deleted {len(selected_rows)} songs.")
-            populate_table()
+            self.update_status(f"Deleted {len(keys)} songs.")
+            model.remove_keys(keys)
 
             # Refresh matchup if current pair was deleted
             if self.current_pair:
@@ -1778,18 +2040,22 @@ class MainWindow(QMainWindow):
                     return
 
                 # Add to session
-                self.session.songs[title] = {
-                    "artist": data["artist"] if data["artist"] else "Unknown Artist",
-                    "album": data["album"] if data["album"] else "Unknown Album",
-                    "year": data["year"] if data["year"] else "????",
-                    "score": 1200,
-                    "matches": 0,
-                    "cover_url": None,
-                }
-                self.session.has_unsaved_changes = True
+                self.session.add_song(
+                    title,
+                    {
+                        "artist": (
+                            data["artist"] if data["artist"] else "Unknown Artist"
+                        ),
+                        "album": data["album"] if data["album"] else "Unknown Album",
+                        "year": data["year"] if data["year"] else "????",
+                        "score": 1200,
+                        "matches": 0,
+                        "cover_url": None,
+                    },
+                )
                 self.update_status(f"Added manual song: {title}")
                 self.refresh_filter_list()  # Update filter dropdown in main window in case new album added
-                populate_table()
+                self.leaderboard_model.insert_keys([title])
 
         def merge_selected_songs():
             selected_rows = sorted(
@@ -1802,11 +2068,9 @@ class MainWindow(QMainWindow):
                 return
 
             # Get song keys
-            keys_to_merge = []
-            for row in selected_rows:
-                item = self.table_widget.item(row, 2)
-                if item:
-                    keys_to_merge.append(item.text())
+            keys_to_merge = [
+                self.leaderboard_model.key_at(row) for row in selected_rows
+            ]
 
             if not keys_to_merge:
                 return
@@ -1828,48 +2092,12 @@ class MainWindow(QMainWindow):
                 )
                 return
 
-            # Calculate stats
-            total_matches = 0
-            score_sum = 0
-
-            # Use metadata from first song
-            first_data = self.session.songs[first_key]
-            artist = first_data["artist"]
-            album = first_data["album"]
-            year = first_data["year"]
-            cover_url = first_data.get("cover_url")
-
-            for k in keys_to_merge:
-                d = self.session.songs[k]
-                total_matches += d["matches"]
-                score_sum += d["score"]
-
-            avg_score = score_sum / len(keys_to_merge)
-
-            # Create new entry
-            self.session.songs[new_title] = {
-                "artist": artist,
-                "album": album,
-                "year": year,
-                "score": avg_score,
-                "matches": total_matches,
-                "cover_url": cover_url,
-            }
-
-            # Delete old entries
-            # If new title is same as one of old keys, define it first (above) then delete others?
-            # Actually we overwrote/set new_title above.
-            # Now we must delete the OLD keys.
-            # CAREFUL: If new_title is one of the keys_to_merge, we just overwrote it. We shouldn't delete it.
+            # Averages scores, sums matches, keeps metadata from the first song
+            self.session.merge_songs(keys_to_merge, new_title)
 
-            for k in keys_to_merge:
-                if k != new_title:
-                    if k in self.session.songs:
-                        del self.session.songs[k]
-
-            self.session.has_unsaved_changes = True
             self.update_status(f"Merged {len(keys_to_merge)} songs into '{new_title}'.")
-            populate_table()
+            self.leaderboard_model.remove_keys(keys_to_merge)
+            self.leaderboard_model.insert_keys([new_title])
 
             # Refresh matchup if current pair was affected
             if self.current_pair:
@@ -1878,28 +2106,40 @@ class MainWindow(QMainWindow):
                     self.next_matchup()
 
         btn_delete.clicked.connect(delete_selected)
-        populate_table()
         self.win_t.show()
 
     def show_album_leaderboard(self):
         self.win_alb = QWidget()
         self.win_alb.setWindowTitle("Album Rankings")
-        self.win_alb.resize(800, 600)
+        self.win_alb.resize(1000, 600)
         l = QVBoxLayout(self.win_alb)
 
-        self.album_table = QTableWidget()
-        self.album_table.setColumnCount(5)
-        self.album_table.setHorizontalHeaderLabels(
-            ["Rank", "Cover", "Album", "Avg Score", "Songs"]
+        # Running per-album aggregates, no pass over the songs
+        album_list = self.session.get_album_stats()
+
+        # Sort by Avg Score Descending
+        album_list.sort(key=lambda x: x["mean"], reverse=True)
+
+        self.album_table = QTableView()
+        self.album_table.setModel(AlbumRankingModel(album_list, self.win_alb))
+        # Covers are painted (and downloaded) only for rows on screen
+        self.album_table.setItemDelegateForColumn(
+            1, CoverDelegate(self, ALBUM_COVER_SIZE, self.album_table)
         )
+        self.album_table.verticalHeader().setVisible(False)
         self.album_table.horizontalHeader().setSectionResizeMode(
             2, QHeaderView.ResizeMode.Stretch
         )
+        self.album_table.setColumnWidth(1, ALBUM_COVER_SIZE + 10)
         self.album_table.verticalHeader().setDefaultSectionSize(70)  # Space for covers
         self.album_table.setSelectionBehavior(
             QAbstractItemView.SelectionBehavior.SelectRows
         )
         self.album_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        # Rows scrolled past no longer need their covers; visible ones ask again
+        self.album_table.verticalScrollBar().valueChanged.connect(
+            lambda _: self.cover_queue.clear()
+        )
 
         l.addWidget(self.album_table)
 
@@ -1907,65 +2147,6 @@ class MainWindow(QMainWindow):
         btn_close.clicked.connect(self.win_alb.close)
         l.addWidget(btn_close)
 
-        # Logic to populate
-        stats = {}  # album -> {title, total_score, count, cover_url}
-
-        for d in self.session.songs.values():
-            alb = d.get("album", "Unknown Album")
-            if alb not in stats:
-                stats[alb] = {
-                    "name": alb,
-                    "total": 0,
-                    "count": 0,
-                    "cover_url": d.get("cover_url"),
-                    "artist": d.get("artist", ""),
-                }
-
-            stats[alb]["total"] += d["score"]
-            stats[alb]["count"] += 1
-            if not stats[alb]["cover_url"] and d.get("cover_url"):
-                stats[alb]["cover_url"] = d.get("cover_url")
-
-        # Convert to list
-        album_list = []
-        for v in stats.values():
-            avg = v["total"] / v["count"] if v["count"] > 0 else 0
-            v["avg"] = avg
-            album_list.append(v)
-
-        # Sort by Avg Score Descending
-        album_list.sort(key=lambda x: x["avg"], reverse=True)
-
-        self.album_table.setRowCount(len(album_list))
-
-        for i, item in enumerate(album_list):
-            # Rank
-            self.album_table.setItem(i, 0, QTableWidgetItem(str(i + 1)))
-
-            # Cover Widget
-            lbl_cover = QLabel()
-            lbl_cover.setFixedSize(60, 60)
-            lbl_cover.setScaledContents(True)
-            lbl_cover.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            lbl_cover.setStyleSheet("background-color: #333; border: 1px solid #444;")
-
-            self.album_table.setCellWidget(i, 1, lbl_cover)
-
-            if item["cover_url"]:
-                self.load_cover(item["cover_url"], lbl_cover)
-            else:
-                lbl_cover.setText("No Img")
-
-            # Album Name + Artist
-            text_str = f"{item['name']}\n{item['artist']}"
-            self.album_table.setItem(i, 2, QTableWidgetItem(text_str))
-
-            # Avg Score
-            self.album_table.setItem(i, 3, QTableWidgetItem(f"{item['avg']:.1f}"))
-
-            # Count
-            self.album_table.setItem(i, 4, QTableWidgetItem(str(item["count"])))
-
         self.win_alb.show()
 
 
@@ -1991,7 +2172,7 @@ if __name__ == "__main__":
     app.setStyle("Fusion")
 
     # Dark Mode Palette
-    from PyQt6.QtGui import QPalette, QColor
+    from PyQt6.QtGui import QPalette
 
     dark_palette = QPalette()
     dark_palette.setColor(QPalette.ColorRole.Window, QColor(18, 18, 18))
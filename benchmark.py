@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from ranking_session import OrderStatisticList, RankingSession
+from simulate import build_library
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_THRESHOLD = 1.25  # new / old median time flagged as a slowdown
+MIN_TIME = 0.5  # Seconds spent per benchmark (at least one call)
+MAX_CALLS = 10000
+
+
+def measure(fn, min_time=MIN_TIME, max_calls=MAX_CALLS):
+    """Calls fn() until min_time has passed; returns per-call stats in ms."""
+    samples = []
+    clock = time.perf_counter
+    start = clock()
+    while len(samples) < max_calls:
+        t0 = clock()
+        fn()
+        samples.append(clock() - t0)
+        if clock() - start >= min_time:
+            break
+    samples.sort()
+    last = len(samples) - 1
+    return {
+        "median_ms": samples[last // 2] * 1000,
+        "p90_ms": samples[int(last * 0.9)] * 1000,
+        "min_ms": samples[0] * 1000,
+        "calls": len(samples),
+    }
+
+
+def make_session(n_songs, seed):
+    """A session with n_songs and about 5 votes per song already cast."""
+    rng = random.Random(seed)
+    random.seed(seed)
+    songs, true_scores = build_library(n_songs, 200.0, rng)
+    session = RankingSession()
+    session.songs = session.make_song_table(songs)
+    session.rebuild_indexes()
+    # Give the indexes a realistic spread of scores and match counts
+    titles = list(songs)
+    for _ in range(min(5 * n_songs, 50000)):
+        a, b = rng.sample(titles, 2)
+        if true_scores[a] < true_scores[b]:
+            a, b = b, a
+        session.update_score(a, b)
+    session.match_history.clear()
+    return session, titles, rng
+
+
+def run_size(n_songs, seed=0, min_time=MIN_TIME, files=True, log=print):
+    """Runs every benchmark on a generated session of n_songs."""
+    results = {}
+
+    def bench(name, fn, **kwargs):
+        results[name] = measure(fn, min_time=min_time, **kwargs)
+        log(f"  {name:<24} {results[name]['median_ms']:10.4f} ms")
+
+    start = time.perf_counter()
+    session, titles, rng = make_session(n_songs, seed)
+    log(f"{n_songs} songs (setup {time.perf_counter() - start:.1f}s)")
+    album = session.get_albums_list()[0]
+
+    session.active_filter = "All Albums"
+    bench("get_matchup", session.get_matchup)
+    bench("get_filtered_keys", session.get_filtered_keys)
+    bench("get_ranked_keys", session.get_ranked_keys)
+
+    session.active_filter = album
+    bench("get_matchup[album]", session.get_matchup)
+    bench("get_filtered_keys[album]", session.get_filtered_keys)
+    bench("get_ranked_keys[album]", session.get_ranked_keys)
+    session.active_filter = "All Albums"
+
+    bench("get_albums_list", session.get_albums_list)
+    bench("get_album_stats", session.get_album_stats)
+
+    ranks = dict(session.score_index.scores)
+    order = OrderStatisticList((-score, key) for key, score in ranks.items())
+
+    def rank_move():
+        # What the live leaderboard does for each song of a vote
+        key = rng.choice(titles)
+        order.remove((-ranks[key], key))
+        ranks[key] += rng.uniform(-16, 16)
+        order.add((-ranks[key], key))
+        order.index((-ranks[key], key))
+
+    bench("rank_move", rank_move)
+
+    def update_score():
+        a, b = rng.sample(titles, 2)
+        session.update_score(a, b)
+
+    batches = iter(range(MAX_CALLS))
+
+    def merge_data():
+        # 100 new songs per call, as from a small artist import
+        batch = next(batches)
+        session.merge_data(
+            {
+                f"Import {batch}-{i}": {
+                    "artist": "Imported Artist",
+                    "album": f"Imported Album {batch}",
+                    "year": "2001",
+                    "score": 1200,
+                    "matches": 0,
+                    "cover_url": None,
+                }
+                for i in range(100)
+            }
+        )
+
+    # Benchmarks that grow the session come last
+    bench("update_score", update_score)
+    bench("merge_data[100]", merge_data, max_calls=100)
+
+    if files:
+        tmp = tempfile.mkdtemp(prefix="songclash-bench-")
+        try:
+            for ext in ("json", "db"):
+                path = os.path.join(tmp, f"session.{ext}")
+                # Saving to a new database copies the session into it
+                bench(
+                    f"save_session[{ext}]",
+                    lambda: session.save_session(path),
+                    max_calls=1 if ext == "db" else MAX_CALLS,
+                )
+                loaded = RankingSession()
+                bench(f"load_from_file[{ext}]", lambda: loaded.load_from_file(path))
+                loaded.close()
+                # Votes on a saved session are journaled / written to the database
+                bench(f"update_score[{ext}]", update_score)
+
+            # Back to memory so the database can be removed
+            session.save_session(os.path.join(tmp, "restore.json"))
+        finally:
+            session.close()
+            shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def run(sizes, seed=0, min_time=MIN_TIME, files=True):
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": seed,
+            "min_time": min_time,
+        },
+        "results": {
+            str(n): run_size(n, seed=seed, min_time=min_time, files=files)
+            for n in sizes
+        },
+    }
+
+
+def compare(old, new, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the fastest call of each benchmark between two runs (less
+    sensitive to background load than the median). Returns a list of
+    (size, benchmark, old ms, new ms, ratio, flag) where flag is "SLOWER",
+    "faster" or "".
+    """
+    rows = []
+    for size, benches in new["results"].items():
+        for name, stats in benches.items():
+            before = old["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = stats["min_ms"] / max(before["min_ms"], 1e-9)
+            if ratio >= threshold:
+                flag = "SLOWER"
+            elif ratio <= 1 / threshold:
+                flag = "faster"
+            else:
+                flag = ""
+            rows.append((size, name, before["min_ms"], stats["min_ms"], ratio, flag))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks RankingSession hot paths without Qt or network."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Run the benchmarks")
+    p_run.add_argument(
+        "--sizes",
+        default=",".join(str(n) for n in DEFAULT_SIZES),
+        help="Comma-separated session sizes, e.g. 1000,10000,100000,1000000",
+    )
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument(
+        "--min-time", type=float, default=MIN_TIME, help="Seconds per benchmark"
+    )
+    p_run.add_argument(
+        "--no-files", action="store_true", help="Skip save/load benchmarks"
+    )
+    p_run.add_argument("--out", metavar="PATH", help="Write results as JSON")
+
+    p_cmp = sub.add_parser("compare", help="Compare two result files")
+    p_cmp.add_argument("old")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Slowdown ratio to flag (default %(default)s)",
+    )
+    args = parser.parse_args()
+
+    if args.command == "run":
+        sizes = [int(n) for n in args.sizes.split(",")]
+        result = run(sizes, args.seed, args.min_time, files=not args.no_files)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(result, f, indent=4)
+            print(f"Results written to {args.out}")
+        return
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows = compare(old, new, args.threshold)
+    print(
+        f"{'size':>8}  {'benchmark':<24} {'old min ms':>10} {'new min ms':>10} {'ratio':>6}"
+    )
+    for size, name, before, after, ratio, flag in rows:
+        print(f"{size:>8}  {name:<24} {before:10.4f} {after:10.4f} {ratio:6.2f} {flag}")
+    slower = [row for row in rows if row[5] == "SLOWER"]
+    if slower:
+        print(f"\n{len(slower)} benchmarks slower by {args.threshold}x or more")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+
+from worker_protocol import PROTOCOL_VERSION, FrameParser
+
+# Seconds a lookup may take before the caller gives up on it
+DEFAULT_TIMEOUT = 20
+
+
+def worker_command(*args):
+    """Command line running fetch_data.py with `args`, frozen or not."""
+    if getattr(sys, "frozen", False):
+        # The bundle runs fetch_data.main() when called with --worker
+        return [sys.executable, "--worker", *args]
+    script_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "fetch_data.py"
+    )
+    return [sys.executable, script_path, *args]
+
+
+class FetchClient:
+    """
+    Talks to one long-lived `fetch_data.py serve` process.
+
+    Requests are written as JSON lines to its stdin and answered in any
+    order on its stdout (see worker_protocol); a reader thread matches each
+    answer to its Future by id, so several threads can have lookups in
+    flight at once. The
+    process is started on the first request and started again if it has
+    died, which fails whatever was in flight at the time.
+    """
+
+    def __init__(self, command=None):
+        self.command = command or worker_command("serve")
+        self.lock = threading.Lock()
+        self.process = None
+        self.pending = {}  # request id -> Future
+        self.ids = itertools.count(1)
+        self.restarts = 0
+
+    def ensure_process(self):
+        # Caller holds self.lock
+        if self.process is not None and self.process.poll() is None:
+            return
+        if self.process is not None:
+            self.restarts += 1
+            print(f"Fetch worker exited, restarting (restart {self.restarts})")
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            creationflags=(
+                subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+            ),
+        )
+        threading.Thread(
+            target=self.read_responses, args=(self.process,), daemon=True
+        ).start()
+
+    def read_responses(self, process):
+        parser = FrameParser()
+        while True:
+            chunk = process.stdout.read1(65536)
+            if not chunk:
+                break
+            for message in parser.feed(chunk):
+                self.dispatch(message)
+
+        # EOF: the process is gone, nothing in flight will be answered
+        process.wait()
+        with self.lock:
+            if self.process is not process:
+                return
+            failed = list(self.pending.values())
+            self.pending.clear()
+        for future in failed:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(ConnectionError("Fetch worker exited"))
+
+    def dispatch(self, message):
+        if message["type"] == "log":
+            print(f"[Fetch worker]: {message['text']}")
+            return
+        with self.lock:
+            future = self.pending.pop(message.get("id"), None)
+        if future is None or not future.set_running_or_notify_cancel():
+            if message["type"] == "error":
+                print(f"Fetch worker error: {message['message']}")
+            return
+        if message["type"] == "error":
+            future.set_exception(RuntimeError(message["message"]))
+        else:
+            future.set_result(message.get("result"))
+
+    def submit(self, method, **params):
+        """Sends a request; returns a Future of its result."""
+        future = Future()
+        with self.lock:
+            request_id = future.request_id = next(self.ids)
+            line = json.dumps(
+                {
+                    "v": PROTOCOL_VERSION,
+                    "id": request_id,
+                    "method": method,
+                    "params": params,
+                }
+            )
+            for attempt in range(2):
+                self.ensure_process()
+                self.pending[request_id] = future
+                try:
+                    self.process.stdin.write(line.encode("utf-8") + b"\n")
+                    self.process.stdin.flush()
+                    break
+                except OSError:
+                    # Died since the poll above; start it again once
+                    self.pending.pop(request_id, None)
+                    self.process.kill()
+                    self.process.wait()
+            else:
+                future.set_exception(ConnectionError("Fetch worker unavailable"))
+        return future
+
+    def call(self, method, timeout=DEFAULT_TIMEOUT, **params):
+        """Sends a request and waits for its result."""
+        future = self.submit(method, **params)
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            self.forget(future)
+
+    def forget(self, future):
+        """Stops tracking a request; an answer arriving later is ignored."""
+        with self.lock:
+            self.pending.pop(future.request_id, None)
+
+    def close(self):
+        with self.lock:
+            process, self.process = self.process, None
+            failed = list(self.pending.values())
+            self.pending.clear()
+        for future in failed:
+            future.cancel()
+        if process is None:
+            return
+        try:
+            # Closing stdin ends the serve loop once in-flight requests finish
+            process.stdin.close()
+            process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
@@ -4,10 +4,16 @@ import requests
 import time
 import re
 import io
+import os
 import musicbrainzngs
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import socket
 
+from mb_cache import ARTIST_SEARCH_TTL, BROWSE_TTL, open_cache
+from worker_protocol import PROTOCOL_VERSION, send
+
 # Force UTF-8 for pipes
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", line_buffering=True)
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", line_buffering=True)
@@ -15,14 +21,69 @@ sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", line_bufferin
 # Set global timeout for all network operations (30 seconds)
 socket.setdefaulttimeout(30.0)
 
+# One connection pool per process: a long-lived "serve" process reuses its
+# TLS connections to iTunes across lookups
+http = requests.Session()
+
+# Threads answering requests at once in "serve" mode
+SERVE_WORKERS = 4
+
+# Seconds between MusicBrainz requests, and the largest page browse allows
+RATE_LIMIT_INTERVAL = 1.5
+BROWSE_PAGE_SIZE = 100
+
+# How artist imports pick releases: "releases" or "release-groups". The
+# latter needs the same release pages (without tracks) plus one lookup per
+# album, so it never makes fewer requests; it only gets smaller responses
+FETCH_STRATEGIES = ("releases", "release-groups")
+DEFAULT_STRATEGY = "releases"
+STRATEGY_ENV = "SONGCLASH_FETCH_STRATEGY"
+
+
+def fetch_data(
+    artist_name,
+    reject_types=None,
+    on_page=None,
+    stats=None,
+    cache=None,
+    pipelined=True,
+    strategy=DEFAULT_STRATEGY,
+):
+    """
+    Returns {title: song} for the artist's studio albums.
+
+    If given, on_page(songs, renamed) is called after each page of releases
+    (each album, for the release-group strategy) with the songs it added or
+    changed and the [old, new] title renames its deduplication made, in
+    order, so a caller can use the songs before the whole discography is
+    in. Counts of requests, retries, pages and releases are added to the
+    `stats` dict if one is passed. MusicBrainz
+    responses are reused from `cache` (an mb_cache.ResponseCache) if given.
+    When `pipelined`, the next page of releases downloads while the current
+    one is processed.
+
+    `strategy` is "releases" (every release of every album, deduplicated by
+    title) or "release-groups" (one representative release per album, see
+    fetch_release_groups; more requests, smaller responses, and no tracks
+    that only exist on other editions).
+    """
+    if stats is None:
+        stats = {}
+    for counter in ("requests", "retries", "pages", "releases"):
+        stats.setdefault(counter, 0)
+    # Requests are counted on the pager thread, pages on this one
+    stats_lock = threading.Lock()
+
+    def add_stat(counter, amount=1):
+        with stats_lock:
+            stats[counter] += amount
 
-def fetch_data(artist_name, reject_types=None):
     # Configure MusicBrainz
     musicbrainzngs.set_useragent(
         "SongClashApp", "1.0", "https://github.com/remy1/ranksongs"
     )
     # Be conservative with rate limiting to avoid connection errors
-    musicbrainzngs.set_rate_limit(limit_or_interval=1.5, new_requests=1)
+    musicbrainzngs.set_rate_limit(limit_or_interval=RATE_LIMIT_INTERVAL, new_requests=1)
 
     # Default reject types if none provided
     if reject_types is None:
@@ -42,12 +103,17 @@ def fetch_data(artist_name, reject_types=None):
         # Ensure it's a set
         reject_types = set(reject_types)
 
+    request_times = []  # When each MusicBrainz response arrived
+
     def run_with_retries(func, *args, **kwargs):
         max_retries = 8
         base_wait = 2.0
         for attempt in range(max_retries):
+            add_stat("requests")
             try:
-                return func(*args, **kwargs)
+                result = func(*args, **kwargs)
+                request_times.append(time.perf_counter())
+                return result
             except Exception as e:
                 # Check for connection errors specifically if possible, but generic catch for now is safer for these transient issues
                 if (
@@ -57,8 +123,10 @@ def fetch_data(artist_name, reject_types=None):
                     or isinstance(e, socket.timeout)
                 ):
                     wait_time = base_wait * (2**attempt)
-                    print(
-                        f"STATUS: Network error (timeout/reset): {e}. Retrying in {wait_time}s... (Attempt {attempt + 1}/{max_retries})"
+                    add_stat("retries")
+                    send(
+                        "status",
+                        message=f"Network error (timeout/reset): {e}. Retrying in {wait_time}s... (Attempt {attempt + 1}/{max_retries})",
                     )
                     time.sleep(wait_time)
                     # Add extra delay after retry to give server time to recover
@@ -67,16 +135,28 @@ def fetch_data(artist_name, reject_types=None):
                     raise e
         raise Exception(f"Failed after {max_retries} retries")
 
-    print(f"STATUS: Searching {artist_name}...")
+    def request(name, ttl, func, **kwargs):
+        # Content-keyed: the same call with the same arguments is answered
+        # from the cache without touching the network or the rate limiter
+        if cache is None:
+            return run_with_retries(func, **kwargs)
+        return cache.call(name, ttl, lambda: run_with_retries(func, **kwargs), **kwargs)
+
+    send("status", message=f"Searching {artist_name}...")
     try:
-        data = run_with_retries(
-            musicbrainzngs.search_artists, artist=artist_name, limit=1
+        data = request(
+            "search_artists",
+            ARTIST_SEARCH_TTL,
+            musicbrainzngs.search_artists,
+            artist=artist_name,
+            limit=1,
         )
     except Exception as e:
-        print(f"STATUS: Artist search failed: {e}")
+        send("error", message=f"Artist search failed: {e}")
         return {}
 
     if not data or not data.get("artist-list"):
+        send("error", message=f"No artist found for {artist_name}")
         return {}
 
     artist_data = data["artist-list"][0]
@@ -120,251 +200,474 @@ def fetch_data(artist_name, reject_types=None):
     # Format: { normalized_title: original_title }
     normalized_lookup = {}
 
-    print(f"STATUS: Fetching release data for {real_name}...")
+    send("status", message=f"Fetching release data for {real_name}...")
+
+    allow_bootlegs = "Bootleg" not in reject_types
+
+    def wanted_status(release_info):
+        # 1. Filter Release Status (Official only, no Bootlegs)
+        # Logic update: Allow "Bootleg" if it IS NOT in reject_types
+        # "Official" is always allowed.
+        release_status = release_info.get("status")
+        if release_status == "Official":
+            return True
+        # If it's not official, the only other thing we accept is Bootleg,
+        # and ONLY if allowed.
+        return release_status == "Bootleg" and allow_bootlegs
+
+    def wanted_group(rg):
+        # 2. Filter Release Group Types
+        primary = rg.get("primary-type")
+        secondary = rg.get("secondary-type-list") or []
+
+        # Primary must be Album (or EP if we wanted, but previous logic was strict Album)
+        if primary != "Album":
+            return False
+
+        # Strict filtering for Studio Albums
+        # Reject these secondary types if they are in the reject list
+        return not set(secondary).intersection(reject_types)
+
+    def add_tracks(release_info, rg, page_changed, page_renamed):
+        """Adds a release's songs, recording what changed for on_page."""
+        # Use Release Group's first release date if available (better for canonical year), otherwise release date
+        release_date_src = rg.get("first-release-date") or release_info.get(
+            "date", "????"
+        )
+        year = release_date_src[:4] if release_date_src else "????"
 
-    limit = 30
-    offset = 0
-    total_processed = 0
+        # Append year to title for disambiguation (e.g. "Peter Gabriel (1977)")
+        album_title = f"{release_info['title']} ({year})"
 
-    while True:
-        try:
-            # We filter for 'album' type on the server side to reduce payload
-            # AND include recordings (tracks) and release-group (for type filtering)
-            resp = run_with_retries(
-                musicbrainzngs.browse_releases,
-                artist=artist_id,
-                release_type=["album"],  # Server-side filter for Albums
-                includes=["recordings", "release-groups"],
-                limit=limit,
-                offset=offset,
+        # 3. Check for Covers
+        cover_url = None
+        if release_info.get("cover-art-archive", {}).get("front") == "true":
+            cover_url = (
+                f"http://coverartarchive.org/release/{release_info['id']}/front-250"
             )
 
-            releases = resp.get("release-list", [])
-            if not releases:
-                break
+        if "medium-list" not in release_info:
+            return
+
+        # 4. Process Tracks
+        for medium in release_info["medium-list"]:
+            if "track-list" not in medium:
+                continue
+            for track in medium["track-list"]:
+                if "recording" in track:
+                    song_title = track["recording"]["title"]
+
+                    norm = normalize_title(song_title)
+
+                    # Check duplicates using O(1) lookup
+                    if norm in normalized_lookup:
+                        existing_title = normalized_lookup[norm]
+
+                        # Prefer shorter title
+                        if len(song_title) < len(existing_title):
+                            # We found a "better" version of the same song (shorter title)
+                            # Swap them out
+
+                            # 1. Pop old data
+                            data = new_songs.pop(existing_title)
+
+                            # 2. Update lookup to point to new title
+                            normalized_lookup[norm] = song_title
+
+                            # 3. Preserve/Update metadata
+                            if not cover_url and "cover_url" in data:
+                                cover_url = data["cover_url"]
+
+                            data["cover_url"] = cover_url
+                            data["album"] = album_title
+                            data["year"] = year
+
+                            # 4. Store under new title
+                            new_songs[song_title] = data
+                            page_changed.pop(existing_title, None)
+                            page_changed[song_title] = None
+                            page_renamed.append([existing_title, song_title])
+                        else:
+                            # Existing title is better or equal length.
+                            # Just update cover/album info if helpful.
+                            curr_data = new_songs[existing_title]
+                            if cover_url and "cover_url" not in curr_data:
+                                curr_data["cover_url"] = cover_url
+                                curr_data["album"] = album_title
+                                curr_data["year"] = year
+                                page_changed[existing_title] = None
 
-            for release_info in releases:
-                total_processed += 1
-
-                # 1. Filter Release Status (Official only, no Bootlegs)
-                # Logic update: Allow "Bootleg" if it IS NOT in reject_types
-                # "Official" is always allowed.
-                release_status = release_info.get("status")
+                    else:
+                        # New unique song
+                        normalized_lookup[norm] = song_title
+                        new_songs[song_title] = {
+                            "score": 1200,
+                            "matches": 0,
+                            "album": album_title,
+                            "year": year,
+                            "artist": real_name,
+                            "cover_url": cover_url,
+                        }
+                        page_changed[song_title] = None
+
+    def emit_page(page_changed, page_renamed):
+        if on_page and (page_changed or page_renamed):
+            on_page({title: new_songs[title] for title in page_changed}, page_renamed)
+
+    # Requests run on a helper thread. Pipelined, the next request goes out
+    # before the current response is normalized; musicbrainzngs still
+    # spaces requests RATE_LIMIT_INTERVAL apart, so the budget is used in
+    # full instead of idling while we process.
+    pager = ThreadPoolExecutor(max_workers=1)
+
+    def browse_pages(name, func, list_key, count_key, **kwargs):
+        """Yields (items, total count) for each page of a browse."""
+
+        def fetch_page(page_offset):
+            return request(
+                name,
+                BROWSE_TTL,
+                func,
+                limit=BROWSE_PAGE_SIZE,
+                offset=page_offset,
+                **kwargs,
+            )
 
-                is_official = release_status == "Official"
-                is_bootleg = release_status == "Bootleg"
+        offset = 0
+        next_page = pager.submit(fetch_page, offset)
+        while next_page is not None:
+            resp = next_page.result()
+            next_page = None
 
-                # Check if we should allow bootlegs
-                allow_bootlegs = "Bootleg" not in reject_types
+            items = resp.get(list_key, [])
+            if not items:
+                return
+            add_stat("pages")
 
-                if not is_official:
-                    # If it's not official, the only other thing we accept is Bootleg,
-                    # and ONLY if allowed.
-                    if is_bootleg and allow_bootlegs:
-                        pass  # Allowed
-                    else:
-                        continue
-
-                # 2. Filter Release Group Types
-                # release-group info is embedded thanks to includes=['release-groups']
-                rg = release_info.get("release-group", {})
-                primary = rg.get("primary-type")
-                secondary = rg.get("secondary-type-list") or []
-
-                # Primary must be Album (or EP if we wanted, but previous logic was strict Album)
-                if primary != "Album":
-                    continue
-
-                # Strict filtering for Studio Albums
-                # Reject these secondary types if they are in the reject list
-                if set(secondary).intersection(reject_types):
-                    continue
-
-                # Use Release Group's first release date if available (better for canonical year), otherwise release date
-                release_date_src = rg.get("first-release-date") or release_info.get(
-                    "date", "????"
+            # Robust pagination: intentionally simplistic
+            # If we got any items, advance offset by that amount.
+            # Without a count, keep asking until a page comes back empty
+            following = offset + len(items)
+            count = resp.get(count_key)
+            more = count is None or following < count
+            if pipelined and more:
+                next_page = pager.submit(fetch_page, following)
+
+            yield items, max(count or 0, following)
+
+            offset = following
+            if more and next_page is None:
+                next_page = pager.submit(fetch_page, offset)
+
+    def fetch_releases():
+        """Every album release with its tracks, page by page."""
+        total_processed = 0
+        # We filter for 'album' type on the server side to reduce payload
+        # AND include recordings (tracks) and release-group (for type filtering)
+        pages = browse_pages(
+            "browse_releases",
+            musicbrainzngs.browse_releases,
+            "release-list",
+            "release-count",
+            artist=artist_id,
+            release_type=["album"],  # Server-side filter for Albums
+            includes=["recordings", "release-groups"],
+        )
+        try:
+            for releases, total in pages:
+                add_stat("releases", len(releases))
+
+                # What this page changed, for on_page
+                page_changed = {}  # title -> None, in insertion order
+                page_renamed = []  # [old title, new title]
+
+                for release_info in releases:
+                    total_processed += 1
+                    # release-group info is embedded thanks to includes=['release-groups']
+                    rg = release_info.get("release-group", {})
+                    if wanted_status(release_info) and wanted_group(rg):
+                        add_tracks(release_info, rg, page_changed, page_renamed)
+
+                send(
+                    "progress",
+                    current=total_processed,
+                    total=total,
+                    message=f"Processed {total_processed} releases (found {len(new_songs)} unique songs so far)",
                 )
-                year = release_date_src[:4] if release_date_src else "????"
-
-                # Append year to title for disambiguation (e.g. "Peter Gabriel (1977)")
-                album_title = f"{release_info['title']} ({year})"
-
-                # 3. Check for Covers
-                cover_url = None
-                if release_info.get("cover-art-archive", {}).get("front") == "true":
-                    cover_url = f"http://coverartarchive.org/release/{release_info['id']}/front-250"
-
-                if "medium-list" not in release_info:
-                    continue
-
-                # 4. Process Tracks
-                for medium in release_info["medium-list"]:
-                    if "track-list" not in medium:
-                        continue
-                    for track in medium["track-list"]:
-                        if "recording" in track:
-                            song_title = track["recording"]["title"]
-
-                            norm = normalize_title(song_title)
-
-                            # Check duplicates using O(1) lookup
-                            if norm in normalized_lookup:
-                                existing_title = normalized_lookup[norm]
-
-                                # Prefer shorter title
-                                if len(song_title) < len(existing_title):
-                                    # We found a "better" version of the same song (shorter title)
-                                    # Swap them out
-
-                                    # 1. Pop old data
-                                    data = new_songs.pop(existing_title)
-
-                                    # 2. Update lookup to point to new title
-                                    normalized_lookup[norm] = song_title
-
-                                    # 3. Preserve/Update metadata
-                                    if not cover_url and "cover_url" in data:
-                                        cover_url = data["cover_url"]
-
-                                    data["cover_url"] = cover_url
-                                    data["album"] = album_title
-                                    data["year"] = year
-
-                                    # 4. Store under new title
-                                    new_songs[song_title] = data
-                                else:
-                                    # Existing title is better or equal length.
-                                    # Just update cover/album info if helpful.
-                                    curr_data = new_songs[existing_title]
-                                    if cover_url and "cover_url" not in curr_data:
-                                        curr_data["cover_url"] = cover_url
-                                        curr_data["album"] = album_title
-                                        curr_data["year"] = year
-
-                            else:
-                                # New unique song
-                                normalized_lookup[norm] = song_title
-                                new_songs[song_title] = {
-                                    "score": 1200,
-                                    "matches": 0,
-                                    "album": album_title,
-                                    "year": year,
-                                    "artist": real_name,
-                                    "cover_url": cover_url,
-                                }
-
-            print(
-                f"STATUS: Processed {total_processed} releases... (found {len(new_songs)} unique songs so far)"
+                emit_page(page_changed, page_renamed)
+
+        except Exception as e:
+            send(
+                "error",
+                message=f"Error fetching releases after {total_processed}: {e}",
             )
 
-            # Robust pagination: intentionally simplistic
-            # If we got any releases, advance offset by that amount.
-            # If we got NO releases, we are done (handled by 'if not releases: break' above)
-            offset += len(releases)
+    def representative_key(release_info):
+        # Earliest official release, with cover art if any has it
+        has_cover = release_info.get("cover-art-archive", {}).get("front") == "true"
+        return (
+            release_info.get("status") != "Official",
+            not has_cover,
+            release_info.get("date") or "9999",
+            release_info["id"],
+        )
 
+    def fetch_release_groups():
+        """
+        The tracks of one representative release per wanted release group:
+        groups are filtered here, then one light browse of the releases
+        (no tracks) picks each group's release, and only those are fetched
+        with their recordings.
+        """
+        groups = {}
+        try:
+            for items, _ in browse_pages(
+                "browse_release_groups",
+                musicbrainzngs.browse_release_groups,
+                "release-group-list",
+                "release-group-count",
+                artist=artist_id,
+                release_type=["album"],
+            ):
+                for rg in items:
+                    if wanted_group(rg):
+                        groups[rg["id"]] = rg
+            send("status", message=f"Choosing releases for {len(groups)} albums...")
+
+            candidates = {}  # release group id -> [release]
+            for releases, _ in browse_pages(
+                "browse_releases",
+                musicbrainzngs.browse_releases,
+                "release-list",
+                "release-count",
+                artist=artist_id,
+                release_type=["album"],
+                includes=["release-groups"],
+            ):
+                for release_info in releases:
+                    rg_id = release_info.get("release-group", {}).get("id")
+                    if rg_id in groups and wanted_status(release_info):
+                        candidates.setdefault(rg_id, []).append(release_info)
         except Exception as e:
-            print(f"STATUS: Error fetching releases at offset {offset}: {e}")
+            send("error", message=f"Error listing albums: {e}")
+            return
+
+        # Oldest albums first, like a discography
+        chosen = sorted(
+            (
+                (groups[rg_id], min(releases, key=representative_key))
+                for rg_id, releases in candidates.items()
+            ),
+            key=lambda pair: (
+                pair[0].get("first-release-date") or "9999",
+                pair[0]["id"],
+            ),
+        )
+
+        def fetch_tracks(release_id):
+            return request(
+                "get_release_by_id",
+                BROWSE_TTL,
+                musicbrainzngs.get_release_by_id,
+                id=release_id,
+                includes=["recordings"],
+            )
+
+        def start_fetch(i):
+            if i >= len(chosen):
+                return None
+            return pager.submit(fetch_tracks, chosen[i][1]["id"])
+
+        next_release = start_fetch(0)
+        for i, (rg, _) in enumerate(chosen):
+            try:
+                release_info = next_release.result()["release"]
+            except Exception as e:
+                send("error", message=f"Error fetching {rg.get('title')}: {e}")
+                return
+            next_release = start_fetch(i + 1) if pipelined else None
+            add_stat("releases")
+
+            page_changed = {}
+            page_renamed = []
+            add_tracks(release_info, rg, page_changed, page_renamed)
+            send(
+                "progress",
+                current=i + 1,
+                total=len(chosen),
+                message=f"Fetched {release_info['title']} ({i + 1}/{len(chosen)}, {len(new_songs)} unique songs so far)",
+            )
+            emit_page(page_changed, page_renamed)
 
-            break
+            if next_release is None:
+                next_release = start_fetch(i + 1)
+
+    if strategy == "release-groups":
+        fetch_release_groups()
+    else:
+        fetch_releases()
+
+    pager.shutdown(wait=False, cancel_futures=True)
+
+    stats["rate_budget"] = 1 / RATE_LIMIT_INTERVAL
+    if len(request_times) > 1:
+        stats["request_rate"] = (len(request_times) - 1) / (
+            request_times[-1] - request_times[0]
+        )
+        send(
+            "status",
+            message=f"Fetched {stats['pages']} pages at {stats['request_rate']:.2f} requests/s (limit {stats['rate_budget']:.2f})",
+        )
 
     return new_songs
 
 
+def find_youtube_video(query):
+    """Returns the link of the first YouTube result for `query`, or ""."""
+    from youtubesearchpython import VideosSearch
+
+    try:
+        videosSearch = VideosSearch(query, limit=1)
+        result = videosSearch.result()
+        if result["result"]:
+            return result["result"][0]["link"]
+        return ""
+    except Exception:
+        return ""
+
+
+def find_itunes_preview(artist, title, album):
+    """Returns the iTunes preview URL best matching the song, or ""."""
+    try:
+        # Construct a specific query
+        # "Artist Song" is usually enough, but let's try to be specific
+        term = f"{artist} {title}"
+        params = {
+            "term": term,
+            "media": "music",
+            "entity": "song",
+            "limit": 5,  # Fetch a few to filter
+        }
+        resp = http.get("https://itunes.apple.com/search", params=params, timeout=10)
+        data = resp.json()
+
+        found_url = ""
+
+        if data["resultCount"] > 0:
+            results = data["results"]
+            # 1. Try to find match with exact artist
+            best_match = None
+
+            # Normalize helper
+            def norm(s):
+                return re.sub(r"[^a-z0-9]", "", str(s).lower())
+
+            target_artist = norm(artist)
+            target_album = norm(album)
+            target_title = norm(title)
+
+            for r in results:
+                r_artist = norm(r.get("artistName", ""))
+                r_track = norm(r.get("trackName", ""))
+                r_album = norm(r.get("collectionName", ""))
+
+                # Check artist match first
+                if target_artist in r_artist or r_artist in target_artist:
+                    # Check title match
+                    if target_title in r_track or r_track in target_title:
+                        best_match = r
+                        # If album also matches, it's a perfect match, stop looking
+                        if target_album and (
+                            target_album in r_album or r_album in target_album
+                        ):
+                            break
+
+            # If we found a match, check if it has a preview Url
+            if best_match:
+                found_url = best_match.get("previewUrl", "")
+            elif results:
+                # Fallback to first result if we are desperate?
+                # No, better false negative than wrong song.
+                pass
+
+        return found_url
+
+    except Exception as e:
+        # print(f"DEBUG: iTunes error: {e}")
+        return ""
+
+
+# Methods a "serve" process answers: name -> function(**params)
+SERVE_METHODS = {
+    "ping": lambda: "pong",
+    "youtube": find_youtube_video,
+    "itunes": find_itunes_preview,
+}
+
+
+def serve(max_workers=SERVE_WORKERS):
+    """
+    Answers newline-delimited JSON requests on stdin until it is closed.
+
+    Each request is {"v": 1, "id": ..., "method": ..., "params": {...}} and
+    gets one "final" message {"id": ..., "result": ...} or "error" message
+    {"id": ..., "message": "..."} (see worker_protocol). Requests run
+    concurrently on a thread pool, so answers may come back in any order.
+    """
+    write_lock = threading.Lock()
+
+    def reply(kind, **fields):
+        with write_lock:
+            send(kind, **fields)
+
+    def handle(request):
+        request_id = request.get("id")
+        try:
+            method = SERVE_METHODS[request["method"]]
+            reply("final", id=request_id, result=method(**request.get("params", {})))
+        except Exception as e:
+            reply("error", id=request_id, message=f"{type(e).__name__}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                reply("error", id=None, message=f"Bad request: {e}")
+                continue
+            if request.get("v") != PROTOCOL_VERSION:
+                reply(
+                    "error",
+                    id=request.get("id"),
+                    message=f"Unsupported protocol version {request.get('v')}",
+                )
+                continue
+            pool.submit(handle, request)
+
+
 def main():
     if len(sys.argv) < 2:
-        print(json.dumps({}))
+        send("error", message="Usage: fetch_data.py serve|youtube|itunes|<artist>")
         sys.exit(1)
 
-    # Mode: 'youtube' or defaults to artist search
+    # Mode: 'serve', 'youtube', 'itunes' or defaults to artist search
     mode = sys.argv[1]
 
-    if mode == "youtube":
+    if mode == "serve":
+        serve()
+
+    elif mode == "youtube":
         if len(sys.argv) < 3:
             sys.exit(1)
-        query = sys.argv[2]
-
-        # Youtube search implementation
-        from youtubesearchpython import VideosSearch
-
-        try:
-            videosSearch = VideosSearch(query, limit=1)
-            result = videosSearch.result()
-            if result["result"]:
-                print(result["result"][0]["link"])
-            else:
-                print("")
-        except Exception:
-            print("")
+        send("final", result=find_youtube_video(sys.argv[2]))
 
     elif mode == "itunes":
         if len(sys.argv) < 5:
             # Expected: script.py itunes artist song album
             sys.exit(1)
-
-        artist = sys.argv[2]
-        title = sys.argv[3]
-        album = sys.argv[4]
-
-        # iTunes Search Implementation
-        try:
-            # Construct a specific query
-            # "Artist Song" is usually enough, but let's try to be specific
-            term = f"{artist} {title}"
-            params = {
-                "term": term,
-                "media": "music",
-                "entity": "song",
-                "limit": 5,  # Fetch a few to filter
-            }
-            resp = requests.get(
-                "https://itunes.apple.com/search", params=params, timeout=10
-            )
-            data = resp.json()
-
-            found_url = ""
-
-            if data["resultCount"] > 0:
-                results = data["results"]
-                # 1. Try to find match with exact artist
-                best_match = None
-
-                # Normalize helper
-                def norm(s):
-                    return re.sub(r"[^a-z0-9]", "", str(s).lower())
-
-                target_artist = norm(artist)
-                target_album = norm(album)
-                target_title = norm(title)
-
-                for r in results:
-                    r_artist = norm(r.get("artistName", ""))
-                    r_track = norm(r.get("trackName", ""))
-                    r_album = norm(r.get("collectionName", ""))
-
-                    # Check artist match first
-                    if target_artist in r_artist or r_artist in target_artist:
-                        # Check title match
-                        if target_title in r_track or r_track in target_title:
-                            best_match = r
-                            # If album also matches, it's a perfect match, stop looking
-                            if target_album and (
-                                target_album in r_album or r_album in target_album
-                            ):
-                                break
-
-                # If we found a match, check if it has a preview Url
-                if best_match:
-                    found_url = best_match.get("previewUrl", "")
-                elif results:
-                    # Fallback to first result if we are desperate?
-                    # No, better false negative than wrong song.
-                    pass
-
-            print(found_url)
-
-        except Exception as e:
-            # print(f"DEBUG: iTunes error: {e}")
-            print("")
+        send("final", result=find_itunes_preview(sys.argv[2], sys.argv[3], sys.argv[4]))
 
     else:
         # Artist Search Mode
@@ -377,13 +680,35 @@ def main():
             if reject_str:
                 reject_list_arg = reject_str.split(",")
 
+        def send_page(songs, renamed):
+            # One message per release page, merged by the GUI as it arrives
+            send("partial", data={"songs": songs, "renamed": renamed})
+
+        stats = {}
+        start = time.perf_counter()
+        cache = None
         try:
-            songs = fetch_data(artist_name_arg, reject_list_arg)
-            print(json.dumps(songs, indent=2))
+            strategy = os.environ.get(STRATEGY_ENV) or DEFAULT_STRATEGY
+            if strategy not in FETCH_STRATEGIES:
+                raise ValueError(f"Unknown fetch strategy {strategy}")
+            stats["strategy"] = strategy
+            cache = open_cache()
+            songs = fetch_data(
+                artist_name_arg,
+                reject_list_arg,
+                on_page=send_page,
+                stats=stats,
+                cache=cache,
+                strategy=strategy,
+            )
+            # The songs themselves all went out as partial messages
+            send("final", result={"count": len(songs)})
         except Exception as e:
-            print(f"STATUS: Error: {e}")
-
-            print("{}")
+            send("error", message=f"Error: {e}")
+        if cache is not None:
+            stats.update(cache.stats())
+            cache.close()
+        send("metrics", seconds=time.perf_counter() - start, **stats)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+
+class ByteBudgetLRU:
+    """
+    Least-recently-used cache bounded by the total size of its values.
+
+    `sizeof(value)` gives each value's cost in bytes; once the total goes
+    over `max_bytes` the least recently used entries are evicted. A value
+    bigger than the whole budget is not stored at all. Counts hits, misses
+    and evictions so the budget can be tuned.
+    """
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()  # key -> (value, size), oldest first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        # Membership tests neither count nor refresh the entry
+        return key in self.entries
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        self.discard(key)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, old_size) = self.entries.popitem(last=False)
+            self.total_bytes -= old_size
+            self.evictions += 1
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
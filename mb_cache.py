@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Artist ids never change; discographies do, now and then
+ARTIST_SEARCH_TTL = 30 * 24 * 3600
+BROWSE_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Environment variables read by open_cache()
+CACHE_PATH_ENV = "SONGCLASH_MB_CACHE"  # Database path, or "off"
+OFFLINE_ENV = "SONGCLASH_OFFLINE"  # "1": answer from the cache only
+
+
+class OfflineCacheMiss(Exception):
+    """An offline cache has no response for a request."""
+
+
+class ResponseCache:
+    """
+    MusicBrainz responses stored in a SQLite file, keyed by a hash of the
+    request (call name and arguments).
+
+    Each entry expires `ttl` seconds after it was stored; expired entries
+    are fetched again, unless the cache is offline, in which case they are
+    still used and a request that was never cached raises
+    OfflineCacheMiss. Responses are stored compressed, and once they add up
+    to more than `max_bytes` the least recently used ones are dropped.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0  # Expired entries used while offline
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Pages may be fetched from a helper thread; the lock serializes use
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(name, params):
+        text = json.dumps([name, params], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, key, allow_expired=False):
+        """The cached response, or None if missing (or expired)."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            body, expires = row
+            now = time.time()
+            if expires < now:
+                if not allow_expired:
+                    return None
+                self.stale_hits += 1
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+                )
+        return json.loads(zlib.decompress(body))
+
+    def put(self, key, name, value, ttl):
+        body = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, name, body, len(body), now + ttl, now),
+            )
+            self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until the size cap is met."""
+        total = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ).fetchall()
+        dropped = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            dropped.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", dropped)
+
+    def call(self, name, ttl, fetch, **params):
+        """
+        Returns the cached response to `name(**params)`, or stores and
+        returns fetch() when there is no fresh one.
+        """
+        key = self.make_key(name, params)
+        value = self.get(key, allow_expired=self.offline)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        if self.offline:
+            raise OfflineCacheMiss(f"{name} {params} is not in the offline cache")
+        value = fetch()
+        self.put(key, name, value, ttl)
+        return value
+
+    def stats(self):
+        with self.lock:
+            size, entries = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses"
+            ).fetchone()
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_stale_hits": self.stale_hits,
+            "cache_entries": entries,
+            "cache_bytes": size,
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+def default_cache_path():
+    return os.path.join(
+        os.path.expanduser("~"), ".cache", "songclash", "musicbrainz.sqlite"
+    )
+
+
+def open_cache():
+    """
+    The cache configured by the environment: SONGCLASH_MB_CACHE gives its
+    path ("off" disables it) and SONGCLASH_OFFLINE=1 makes it answer from
+    stored responses only. Returns None if the cache is off or unusable.
+    """
+    path = os.environ.get(CACHE_PATH_ENV) or default_cache_path()
+    offline = os.environ.get(OFFLINE_ENV) == "1"
+    if path == "off":
+        return None
+    try:
+        return ResponseCache(path, offline=offline)
+    except (OSError, sqlite3.Error) as e:
+        if offline:
+            raise
+        print(f"MusicBrainz cache unavailable ({e}), fetching without it")
+        return None
@@ -0,0 +1,1314 @@
+import bisect
+import functools
+import json
+import os
+import random
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+from song_store import SongStore
+from session_journal import SessionJournal, write_snapshot
+from sqlite_store import SqliteSongStore, is_sqlite_path
+from ratings import (
+    BT_MAX_ITERATIONS,
+    BT_TOLERANCE,
+    INITIAL_SCORE,
+    RATING_ENGINES,
+    EloEngine,
+    engine_from_dict,
+    pair_information,
+)
+
+
+class MatchCountIndex:
+    """Song keys bucketed by match count, kept in sync by RankingSession."""
+
+    def __init__(self):
+        self.buckets = {}  # matches -> list of song keys
+        self.positions = {}  # song key -> (matches, index in bucket)
+        self.counts = []  # Sorted distinct match counts currently in use
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, key, matches):
+        bucket = self.buckets.get(matches)
+        if bucket is None:
+            bucket = self.buckets[matches] = []
+            bisect.insort(self.counts, matches)
+        self.positions[key] = (matches, len(bucket))
+        bucket.append(key)
+
+    def remove(self, key):
+        matches, pos = self.positions.pop(key)
+        bucket = self.buckets[matches]
+        # Swap with the last entry so removal is O(1)
+        last = bucket.pop()
+        if last != key:
+            bucket[pos] = last
+            self.positions[last] = (matches, pos)
+        if not bucket:
+            del self.buckets[matches]
+            self.counts.pop(bisect.bisect_left(self.counts, matches))
+
+    def update(self, key, matches):
+        if self.positions[key][0] != matches:
+            self.remove(key)
+            self.add(key, matches)
+
+    def pick_least_played(self, pool_size):
+        """
+        Picks a song uniformly from the `pool_size` least played songs.
+
+        Equivalent to shuffling, sorting by matches and choosing from the first
+        `pool_size` entries: the bucket that straddles the cut-off is sampled
+        uniformly, which is exactly what the shuffle did to its members.
+        """
+        i = random.randrange(min(pool_size, len(self.positions)))
+        for matches in self.counts:
+            bucket = self.buckets[matches]
+            if i < len(bucket):
+                return random.choice(bucket)
+            i -= len(bucket)
+        return None
+
+
+def opponent_weight(diff):
+    """Matchmaking weight for an opponent `diff` rating points away."""
+    return 1000 / (diff + 50)
+
+
+class ScoreIndex:
+    """
+    (score, key) pairs kept sorted by score, used to sample opponents.
+
+    sample_opponent draws from the same distribution as the exact weighted
+    loop (weight = opponent_weight(|score difference|)) by rejection sampling:
+    the score axis around song A is cut into bands whose distance doubles
+    each time, so the weight inside a band varies by at most a factor of 2.
+    A band is chosen by (songs in band * max weight), a song uniformly inside
+    it, and the song is kept with probability weight / max weight. Each try
+    is O(log n) and succeeds at least half of the time.
+    """
+
+    def __init__(self):
+        self.entries = []  # Sorted list of (score, key)
+        self.scores = {}  # key -> score as stored in entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def build(self, items):
+        """Bulk-loads (key, score) pairs with a single sort."""
+        self.scores = dict(items)
+        self.entries = sorted((score, key) for key, score in self.scores.items())
+
+    def add(self, key, score):
+        bisect.insort(self.entries, (score, key))
+        self.scores[key] = score
+
+    def remove(self, key):
+        score = self.scores.pop(key)
+        del self.entries[bisect.bisect_left(self.entries, (score, key))]
+
+    def update(self, key, score):
+        self.remove(key)
+        self.add(key, score)
+
+    def neighbors(self, key, count):
+        """Up to `count` keys closest to `key` in sorted score order."""
+        entries = self.entries
+        i = bisect.bisect_left(entries, (self.scores[key], key))
+        lo = max(0, i - count // 2)
+        hi = min(len(entries), lo + count + 1)
+        lo = max(0, hi - count - 1)
+        return [k for _, k in entries[lo:hi] if k != key]
+
+    def sample_opponent(self, song_a, excluded=(), max_tries=64):
+        """
+        Samples an opponent for `song_a`, skipping keys in `excluded`.
+        Returns None if nothing was accepted after `max_tries` draws, in which
+        case the caller should fall back to the exact weighted loop.
+        """
+        entries = self.entries
+        if len(entries) < 2:
+            return None
+        score_a = self.scores[song_a]
+        span = max(score_a - entries[0][0], entries[-1][0] - score_a)
+
+        # Band edges at distances 0, 50, 150, 350, ... until the whole range is covered
+        edges = [0]
+        while edges[-1] <= span:
+            edges.append(50 * (2 ** len(edges) - 1))
+
+        bands = []  # (lo index, hi index, max weight)
+        total = 0.0
+        for near, far in zip(edges, edges[1:]):
+            bound = opponent_weight(near)
+            for lo_score, hi_score in (
+                (score_a - far, score_a - near),
+                (score_a + near, score_a + far),
+            ):
+                lo = bisect.bisect_left(entries, (lo_score,))
+                hi = bisect.bisect_left(entries, (hi_score,))
+                if hi > lo:
+                    bands.append((lo, hi, bound))
+                    total += (hi - lo) * bound
+
+        for _ in range(max_tries):
+            r = random.random() * total
+            for lo, hi, bound in bands:
+                r -= (hi - lo) * bound
+                if r < 0:
+                    break
+            score, key = entries[random.randrange(lo, hi)]
+            if key == song_a or key in excluded:
+                continue
+            if random.random() * bound < opponent_weight(abs(score_a - score)):
+                return key
+        return None
+
+
+class OrderStatisticList:
+    """
+    Sorted list of comparable items with O(log n) rank queries.
+
+    Items are kept in sorted chunks of about LOAD items, with a Fenwick tree
+    over the chunk lengths, so add, remove, index (position of an item) and
+    [i] (item at a position) cost O(log n) plus a memmove of one chunk,
+    instead of shifting the whole list. Chunks are split when they grow past
+    twice LOAD and dropped when emptied; the tree is rebuilt then.
+    """
+
+    LOAD = 512
+
+    def __init__(self, items=()):
+        self.build(items)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def build(self, items):
+        """Bulk-loads items with a single sort."""
+        items = sorted(items)
+        load = self.LOAD
+        self.chunks = [items[i : i + load] for i in range(0, len(items), load)]
+        self.maxes = [chunk[-1] for chunk in self.chunks]
+        self.size = len(items)
+        self.rebuild_tree()
+
+    def rebuild_tree(self):
+        tree = [0] + [len(chunk) for chunk in self.chunks]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def tree_add(self, chunk_index, delta):
+        i = chunk_index + 1
+        tree = self.tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def count_before(self, chunk_index):
+        """Number of items in the chunks before chunk_index."""
+        total = 0
+        i = chunk_index
+        tree = self.tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def add(self, item):
+        if not self.chunks:
+            self.build([item])
+            return
+        c = bisect.bisect_left(self.maxes, item)
+        if c == len(self.chunks):
+            c -= 1
+            self.maxes[c] = item
+        chunk = self.chunks[c]
+        bisect.insort(chunk, item)
+        self.size += 1
+        if len(chunk) > 2 * self.LOAD:
+            half = len(chunk) // 2
+            self.chunks[c : c + 1] = [chunk[:half], chunk[half:]]
+            self.maxes[c : c + 1] = [chunk[half - 1], chunk[-1]]
+            self.rebuild_tree()
+        else:
+            self.tree_add(c, 1)
+
+    def remove(self, item):
+        """Removes an item equal to `item`; raises ValueError if missing."""
+        c = bisect.bisect_left(self.maxes, item)
+        chunk = self.chunks[c] if c < len(self.chunks) else ()
+        i = bisect.bisect_left(chunk, item)
+        if i == len(chunk) or chunk[i] != item:
+            raise ValueError(f"{item!r} not in list")
+        del chunk[i]
+        self.size -= 1
+        if not chunk:
+            del self.chunks[c]
+            del self.maxes[c]
+            self.rebuild_tree()
+            return
+        self.maxes[c] = chunk[-1]
+        self.tree_add(c, -1)
+
+    def bisect_left(self, item):
+        """Position where `item` is or would be inserted (before equal items)."""
+        c = bisect.bisect_left(self.maxes, item)
+        if c == len(self.chunks):
+            return self.size
+        return self.count_before(c) + bisect.bisect_left(self.chunks[c], item)
+
+    def index(self, item):
+        """Position of an item equal to `item`; raises ValueError if missing."""
+        position = self.bisect_left(item)
+        if position == self.size or self[position] != item:
+            raise ValueError(f"{item!r} not in list")
+        return position
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.size
+        if not 0 <= position < self.size:
+            raise IndexError("list index out of range")
+        # Walk down the Fenwick tree to the chunk holding `position`
+        c = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            nxt = c + step
+            if nxt < len(self.tree) and self.tree[nxt] <= position:
+                c = nxt
+                position -= self.tree[nxt]
+            step >>= 1
+        return self.chunks[c][position]
+
+
+class AlbumAggregate:
+    """
+    Running score statistics of one album. Sums are taken relative to
+    INITIAL_SCORE so the sum of squares keeps its precision.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0  # Sum of (score - INITIAL_SCORE)
+        self.total_sq = 0.0  # Sum of (score - INITIAL_SCORE) ** 2
+        self.matches = 0
+        self.scores = OrderStatisticList()  # (score, key)
+        self.covers = {}  # key -> cover_url of songs that have one, in album order
+
+    def add(self, key, score, matches):
+        offset = score - INITIAL_SCORE
+        self.count += 1
+        self.total += offset
+        self.total_sq += offset * offset
+        self.matches += matches
+        self.scores.add((score, key))
+
+    def remove(self, key, score, matches):
+        offset = score - INITIAL_SCORE
+        self.count -= 1
+        self.total -= offset
+        self.total_sq -= offset * offset
+        self.matches -= matches
+        self.scores.remove((score, key))
+
+    def summary(self):
+        """
+        count, total, mean, median, std (sample standard deviation), ci95
+        (half-width of the normal 95% interval of the mean) and matches.
+        """
+        n = self.count
+        mean = self.total / n
+        if n > 1:
+            variance = max(0.0, (self.total_sq - self.total * mean) / (n - 1))
+        else:
+            variance = 0.0
+        std = variance**0.5
+        middle = self.scores[n // 2][0]
+        if n % 2 == 0:
+            middle = (middle + self.scores[n // 2 - 1][0]) / 2
+        return {
+            "count": n,
+            "total": self.total + INITIAL_SCORE * n,
+            "mean": mean + INITIAL_SCORE,
+            "median": middle,
+            "std": std,
+            "ci95": 1.96 * std / n**0.5,
+            "matches": self.matches,
+        }
+
+
+class AlbumStatsIndex:
+    """Album -> AlbumAggregate, kept in sync by RankingSession."""
+
+    def __init__(self):
+        self.albums = {}
+
+    def build(self, rows):
+        """Bulk-loads (key, album, score, matches, cover_url) rows."""
+        grouped = {}
+        for key, album, score, matches, cover_url in rows:
+            if album is not None:
+                grouped.setdefault(album, []).append((key, score, matches, cover_url))
+        self.albums = {}
+        for album, songs in grouped.items():
+            agg = self.albums[album] = AlbumAggregate()
+            for key, score, matches, cover_url in songs:
+                offset = score - INITIAL_SCORE
+                agg.total += offset
+                agg.total_sq += offset * offset
+                agg.matches += matches
+                if cover_url:
+                    agg.covers[key] = cover_url
+            agg.count = len(songs)
+            agg.scores.build((score, key) for key, score, _, _ in songs)
+
+    def add(self, album, key, score, matches, cover_url=None):
+        if album is None:
+            return
+        agg = self.albums.setdefault(album, AlbumAggregate())
+        agg.add(key, score, matches)
+        if cover_url:
+            agg.covers[key] = cover_url
+
+    def remove(self, album, key, score, matches):
+        agg = self.albums.get(album)
+        if agg is None:
+            return
+        agg.remove(key, score, matches)
+        agg.covers.pop(key, None)
+        if not agg.count:
+            del self.albums[album]
+
+    def update(self, album, key, old_score, old_matches, score, matches):
+        agg = self.albums.get(album)
+        if agg is not None:
+            agg.remove(key, old_score, old_matches)
+            agg.add(key, score, matches)
+
+    def summary(self, album):
+        return self.albums[album].summary()
+
+    def cover_url(self, album):
+        """Cover of the album's first song that has one, or None."""
+        return next(iter(self.albums[album].covers.values()), None)
+
+
+# JSON session container: {"format": SESSION_FORMAT, "version": ..., "songs": {...},
+# "votes": [[winner, loser], ...]}. Older files are a bare {title: song} dict.
+SESSION_FORMAT = "songclash-session"
+SESSION_VERSION = 2
+
+
+# Per-song fields kept by any rating engine (e.g. Glicko-2 deviation)
+RATING_FIELDS = tuple(
+    dict.fromkeys(f for engine in RATING_ENGINES.values() for f in engine.FIELDS)
+)
+
+
+def split_session_data(data):
+    """
+    Returns (songs, votes, rating_engine) from a loaded JSON session of any
+    version. rating_engine is the engine's to_dict() output, or None.
+    """
+    if isinstance(data, dict) and data.get("format") == SESSION_FORMAT:
+        return data.get("songs", {}), data.get("votes", []), data.get("rating_engine")
+    return data, [], None
+
+
+def session_generation(data):
+    """
+    Snapshot generation of a loaded JSON session (see SessionJournal); 0 for
+    files saved before snapshots carried one.
+    """
+    if isinstance(data, dict) and data.get("format") == SESSION_FORMAT:
+        return data.get("generation", 0)
+    return 0
+
+
+def locked(method):
+    """Runs a RankingSession method while holding the session lock."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class RankingSession:
+    """
+    Songs, indexes and vote history of one ranking session.
+
+    All edits happen on the UI thread, but fill_matchup_queue may run in a
+    background thread: methods that change the session or draw a matchup are
+    @locked so the two never interleave.
+    """
+
+    # Below this many songs the opponent is drawn with the exact weighted loop
+    EXACT_MATCHMAKING_LIMIT = 500
+    # Sessions this large are loaded into the column-oriented SongStore
+    COLUMNAR_THRESHOLD = 100000
+    # Journal entries after which the snapshot file is rewritten
+    JOURNAL_COMPACT_EVERY = 1000
+    # "balanced": few matches + close score, "active": most informative pair
+    MATCHMAKING_MODES = ("balanced", "active")
+    # Active mode scores ACTIVE_SHORTLIST challengers x ACTIVE_OPPONENTS each
+    ACTIVE_SHORTLIST = 16
+    ACTIVE_OPPONENTS = 8
+    # Matchups computed ahead of time by fill_matchup_queue
+    MATCHUP_QUEUE_SIZE = 3
+    # A queued pair is dropped once a vote moves one of its songs this far
+    QUEUE_SCORE_TOLERANCE = 25
+
+    def __init__(self, columnar=None):
+        # columnar: True/False forces the song table type, None picks by size
+        self.columnar = columnar
+        self.songs = {}
+        self.current_filename = None
+        self.has_unsaved_changes = False
+        self.active_filter = "All Albums"  # Default filter
+        self.match_history = deque(maxlen=20)  # Track last 20 pairings to avoid repeats
+        self.match_index = MatchCountIndex()
+        self.score_index = ScoreIndex()
+        self.album_index = {}  # album -> {song key: None}, insertion ordered
+        self.artist_index = {}  # artist -> {song key: None}
+        self.album_stats = AlbumStatsIndex()
+        self.journal = None  # SessionJournal of the current file, if any
+        self.generation = 0  # Of the snapshot last loaded or saved
+        self.votes = []  # (winner, loser) history; SQLite sessions use their table
+        self.mle_scores = {}  # Last Bradley-Terry fit, {title: score}
+        self.engine = EloEngine()  # Rating system applied by update_score
+        self.matchmaking = "balanced"  # One of MATCHMAKING_MODES
+        self.lock = threading.RLock()
+        # (filter, pair, score a, score b) as of when each pair was drawn
+        self.matchup_queue = deque()
+
+    @locked
+    def new_session(self):
+        self.close()
+        self.songs = {}
+        self.votes = []
+        self.mle_scores = {}
+        self.engine = EloEngine()
+        self.current_filename = None
+        self.generation = 0
+        self.has_unsaved_changes = False
+        self.active_filter = "All Albums"
+        self.match_history.clear()
+        self.rebuild_indexes()
+
+    def rebuild_indexes(self):
+        """Rebuilds lookup structures after self.songs was replaced wholesale."""
+        self.matchup_queue.clear()
+        self.match_index = MatchCountIndex()
+        self.score_index = ScoreIndex()
+        self.album_index = {}
+        self.artist_index = {}
+        scores = []
+        album_rows = []
+        for title, score, matches, album, artist, cover in self.iter_index_rows():
+            self.match_index.add(title, matches)
+            self.index_metadata(title, album, artist)
+            scores.append((title, score))
+            album_rows.append((title, album, score, matches, cover))
+        self.score_index.build(scores)
+        self.album_stats.build(album_rows)
+
+    def iter_index_rows(self):
+        """Yields (title, score, matches, album, artist, cover_url) for every song."""
+        if isinstance(self.songs, SqliteSongStore):
+            # One query, without building a record per song
+            yield from self.songs.index_rows()
+            return
+        for title, data in self.songs.items():
+            yield (
+                title,
+                data["score"],
+                data["matches"],
+                data.get("album"),
+                data.get("artist"),
+                data.get("cover_url"),
+            )
+
+    @locked
+    def load_from_file(self, filepath):
+        if is_sqlite_path(filepath):
+            return self.load_from_sqlite(filepath)
+        try:
+            with open(filepath, "r") as f:
+                data = json.load(f)
+            songs, votes, engine = split_session_data(data)
+            generation = session_generation(data)
+            engine = engine_from_dict(engine)
+            self.close()
+            self.engine = engine
+            self.songs = self.make_song_table(songs)
+            self.rebuild_indexes()
+            # Share the key strings instead of keeping a copy per vote
+            keys = {title: title for title in self.score_index.scores}
+            self.votes = [(keys.get(w, w), keys.get(l, l)) for w, l in votes]
+            self.mle_scores = {}
+
+            # Re-apply edits made after the snapshot was last written
+            replayed = 0
+            for event in SessionJournal.read_events(filepath, generation):
+                self.apply_event(event)
+                replayed += 1
+
+            self.current_filename = filepath
+            self.generation = generation
+            self.has_unsaved_changes = replayed > 0
+            self.match_history.clear()
+            self.journal = SessionJournal(filepath, generation=generation)
+            self.journal.count = replayed
+            msg = f"Loaded {len(self.songs)} songs."
+            if replayed:
+                msg += f" Recovered {replayed} journaled edits."
+            return True, msg
+        except Exception as e:
+            return False, str(e)
+
+    @locked
+    def load_from_sqlite(self, filepath):
+        try:
+            store = SqliteSongStore(filepath)
+        except Exception as e:
+            return False, str(e)
+        self.close()
+        self.songs = store
+        self.votes = []
+        self.mle_scores = {}
+        try:
+            self.engine = engine_from_dict(store.get_meta("rating_engine"))
+        except ValueError as e:
+            print(f"{e}, falling back to Elo")
+            self.engine = EloEngine()
+        self.rebuild_indexes()
+        self.current_filename = filepath
+        self.has_unsaved_changes = False
+        self.match_history.clear()
+        return True, f"Loaded {len(self.songs)} songs."
+
+    @locked
+    def save_session(self, filepath=None):
+        target = filepath if filepath else self.current_filename
+        if not target:
+            return False, "No filename specified"
+        if is_sqlite_path(target):
+            return self.save_sqlite(target)
+        try:
+            songs = self.songs_as_dict()
+            votes = self.get_vote_log()
+            generation = self.generation + 1
+            write_snapshot(
+                target,
+                {
+                    "format": SESSION_FORMAT,
+                    "version": SESSION_VERSION,
+                    "generation": generation,
+                    "rating_engine": self.engine.to_dict(),
+                    "songs": songs,
+                    "votes": votes,
+                },
+                compact_keys=("votes",),
+            )
+            self.generation = generation
+            if isinstance(self.songs, SqliteSongStore):
+                # Saving a database session as JSON moves it back into memory
+                self.songs.close()
+                self.songs = self.make_song_table(songs)
+                self.votes = [tuple(v) for v in votes]
+            if self.journal is None or target != self.current_filename:
+                self.close_journal()
+                self.journal = SessionJournal(target, generation=generation)
+            # Everything journaled so far is now in the snapshot; until the
+            # journal is emptied, replay skips it by generation
+            self.journal.reset(generation)
+            self.current_filename = target
+            self.has_unsaved_changes = False
+            return True, "Saved successfully."
+        except Exception as e:
+            return False, str(e)
+
+    @locked
+    def save_sqlite(self, target):
+        """Saves to a SQLite file, which then becomes the session backend."""
+        try:
+            store = self.songs
+            if not (
+                isinstance(store, SqliteSongStore)
+                and store.path == os.path.abspath(target)
+            ):
+                # Every edit of a database session is already committed, so only
+                # a different target needs writing
+                store = SqliteSongStore.create(
+                    target, self.songs_as_dict(), self.get_vote_log()
+                )
+                store.set_meta("rating_engine", self.engine.to_dict())
+                self.close()
+                self.songs = store
+                self.votes = []
+            self.current_filename = target
+            self.has_unsaved_changes = False
+            return True, "Saved successfully."
+        except Exception as e:
+            return False, str(e)
+
+    @locked
+    def close(self):
+        """Releases the journal and database handles of the current session."""
+        self.close_journal()
+        if isinstance(self.songs, SqliteSongStore):
+            self.songs.close()
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def transaction(self):
+        """Groups several writes when the session is stored in SQLite."""
+        if isinstance(self.songs, SqliteSongStore):
+            return self.songs.transaction()
+        return nullcontext()
+
+    def log_event(self, op, **fields):
+        """Appends an edit to the journal and compacts it when it gets long."""
+        if self.journal is None:
+            return
+        fields["op"] = op
+        try:
+            self.journal.append(fields)
+        except Exception as e:
+            print(f"Journal write failed: {e}")
+            return
+        if self.journal.count >= self.JOURNAL_COMPACT_EVERY:
+            ok, msg = self.save_session()
+            if not ok:
+                print(f"Journal compaction failed: {msg}")
+
+    def apply_event(self, event):
+        """Replays one journal event. Events about unknown songs are skipped."""
+        op = event.get("op")
+        if op == "vote":
+            if event["winner"] in self.songs and event["loser"] in self.songs:
+                self.update_score(event["winner"], event["loser"])
+        elif op == "add":
+            self.add_song(event["title"], event["data"])
+        elif op == "delete":
+            self.delete_song(event["title"])
+        elif op == "delete_album":
+            self.delete_album(event["album"])
+        elif op == "rename":
+            self.rename_song(event["old"], event["new"])
+        elif op == "merge":
+            if all(k in self.songs for k in event["keys"]):
+                self.merge_songs(event["keys"], event["title"])
+        elif op == "import":
+            self.merge_data(event["songs"])
+        elif op == "recompute":
+            if "engine" in event:
+                self.recompute_ratings(engine_from_dict(event["engine"]))
+            else:
+                self.recompute_ratings(EloEngine(event["k_factor"]))
+        else:
+            print(f"Unknown journal event: {op}")
+
+    def make_song_table(self, songs):
+        """Wraps loaded songs in a SongStore when the session is columnar."""
+        columnar = self.columnar
+        if columnar is None:
+            columnar = len(songs) >= self.COLUMNAR_THRESHOLD
+        return SongStore(songs) if columnar else songs
+
+    def songs_as_dict(self):
+        """Plain {title: {field: value}} view of the songs, for serialization."""
+        if isinstance(self.songs, (SongStore, SqliteSongStore)):
+            return self.songs.to_dict()
+        return self.songs
+
+    @locked
+    def merge_data(self, new_data):
+        added = {}
+        with self.transaction():
+            for title, data in new_data.items():
+                if title not in self.songs:
+                    self.insert_song(title, data)
+                    added[title] = data
+        if added:
+            self.has_unsaved_changes = True
+            self.log_event("import", songs=added)
+        return len(added)
+
+    # Fields an import page may correct on songs it already added
+    IMPORT_METADATA_FIELDS = ("album", "year", "cover_url")
+
+    @locked
+    def merge_import_page(self, page, imported):
+        """
+        Applies one page of a streaming artist import: {"songs": {title:
+        song}, "renamed": [[old, new], ...]}. `imported` is the set of
+        titles this import added so far and is kept up to date; only those
+        are renamed or have their metadata corrected, so songs that were in
+        the session before the import are left alone. Votes already cast on
+        a renamed song carry over. Returns the number of songs added.
+        """
+        added = {}
+        with self.transaction():
+            for old, new in page.get("renamed", ()):
+                if old in imported and self.rename_song(old, new):
+                    imported.discard(old)
+                    imported.add(new)
+            for title, data in page["songs"].items():
+                if title not in self.songs:
+                    added[title] = data
+                elif title in imported:
+                    current = dict(self.songs[title])
+                    fields = self.IMPORT_METADATA_FIELDS
+                    if any(current.get(f) != data.get(f) for f in fields):
+                        current.update((f, data.get(f)) for f in fields)
+                        self.add_song(title, current)
+            count = self.merge_data(added)
+        imported.update(added)
+        return count
+
+    @locked
+    def add_song(self, title, data):
+        """Adds (or replaces) a song."""
+        self.insert_song(title, data)
+        self.log_event("add", title=title, data=dict(data))
+
+    @locked
+    def delete_song(self, title):
+        """Removes a song from the session. Returns False if it did not exist."""
+        if not self.remove_song(title):
+            return False
+        self.log_event("delete", title=title)
+        return True
+
+    def insert_song(self, title, data):
+        """Stores a song and registers it in the indexes (not journaled)."""
+        if title in self.songs:
+            self.remove_song(title)
+        self.songs[title] = data
+        self.match_index.add(title, data["matches"])
+        self.score_index.add(title, data["score"])
+        self.index_metadata(title, data.get("album"), data.get("artist"))
+        self.album_stats.add(
+            data.get("album"),
+            title,
+            data["score"],
+            data["matches"],
+            data.get("cover_url"),
+        )
+        self.has_unsaved_changes = True
+
+    def remove_song(self, title):
+        """Drops a song and its index entries (not journaled)."""
+        if title not in self.songs:
+            return False
+        # Unindex before deleting: SongStore records die with their row
+        data = self.songs[title]
+        self.unindex_metadata(title, data.get("album"), data.get("artist"))
+        self.album_stats.remove(
+            data.get("album"),
+            title,
+            self.score_index.scores[title],
+            self.match_index.positions[title][0],
+        )
+        del self.songs[title]
+        self.match_index.remove(title)
+        self.score_index.remove(title)
+        self.has_unsaved_changes = True
+        return True
+
+    @locked
+    def rename_song(self, old_title, new_title):
+        """Moves a song to a new key, keeping its score, matches and metadata."""
+        if old_title not in self.songs or new_title in self.songs:
+            return False
+        data = dict(self.songs[old_title])
+        with self.transaction():
+            self.remove_song(old_title)
+            self.insert_song(new_title, data)
+            self.rename_votes({old_title: new_title})
+        self.log_event("rename", old=old_title, new=new_title)
+        return True
+
+    @locked
+    def delete_album(self, album):
+        """Removes every song of `album`. Returns the number of songs deleted."""
+        keys = list(self.album_index.get(album, ()))
+        with self.transaction():
+            for k in keys:
+                self.remove_song(k)
+        if keys:
+            self.log_event("delete_album", album=album)
+        return len(keys)
+
+    def index_metadata(self, title, album, artist):
+        if album is not None:
+            self.album_index.setdefault(album, {})[title] = None
+        if artist is not None:
+            self.artist_index.setdefault(artist, {})[title] = None
+
+    def unindex_metadata(self, title, album, artist):
+        for index, value in ((self.album_index, album), (self.artist_index, artist)):
+            members = index.get(value)
+            if members is not None:
+                members.pop(title, None)
+                if not members:
+                    del index[value]
+
+    @locked
+    def merge_songs(self, keys, new_title):
+        """
+        Collapses several songs into one entry named `new_title`.
+        Metadata comes from the first song, matches are summed and the score
+        is the average of the merged songs.
+        """
+        first_data = self.songs[keys[0]]
+        total_matches = 0
+        score_sum = 0
+        for k in keys:
+            d = self.songs[k]
+            total_matches += d["matches"]
+            score_sum += d["score"]
+
+        merged = {
+            "artist": first_data["artist"],
+            "album": first_data["album"],
+            "year": first_data["year"],
+            "score": score_sum / len(keys),
+            "matches": total_matches,
+            "cover_url": first_data.get("cover_url"),
+        }
+        merged.update(self.engine.merge_fields([self.songs[k] for k in keys]))
+
+        # new_title may be one of the merged keys, so drop the old entries first
+        with self.transaction():
+            for k in keys:
+                self.remove_song(k)
+            self.insert_song(new_title, merged)
+            self.rename_votes({k: new_title for k in keys if k != new_title})
+        self.log_event("merge", keys=list(keys), title=new_title)
+
+    def get_vote_log(self):
+        """Returns the recorded (winner, loser) votes, oldest first."""
+        if isinstance(self.songs, SqliteSongStore):
+            return self.songs.votes()
+        return self.votes
+
+    def count_votes(self):
+        if isinstance(self.songs, SqliteSongStore):
+            return self.songs.vote_count()
+        return len(self.votes)
+
+    def rename_votes(self, mapping):
+        """Points past votes of renamed/merged songs at their new titles."""
+        if not mapping:
+            return
+        if isinstance(self.songs, SqliteSongStore):
+            self.songs.rename_votes(mapping)
+        else:
+            self.votes = [(mapping.get(w, w), mapping.get(l, l)) for w, l in self.votes]
+
+    @locked
+    def recompute_ratings(self, engine=None):
+        """
+        Rebuilds every rating and match count by replaying the vote log from
+        scratch, switching the session to `engine` first if given. Songs
+        without recorded votes go back to the initial score. Returns the
+        summary dict from the engine's batch_update.
+        """
+        if engine is not None:
+            self.engine = engine
+        titles = list(self.score_index.scores)
+        result = self.engine.batch_update(self.get_vote_log(), titles)
+        scores = result["scores"]
+        matches = result["matches"]
+        fields = result["fields"]
+        if isinstance(self.songs, SqliteSongStore):
+            names = tuple(fields)
+            self.songs.set_ratings(
+                (
+                    (t, scores[t], matches[t], *(fields[f][t] for f in names))
+                    for t in titles
+                ),
+                names,
+            )
+            self.songs.set_meta("rating_engine", self.engine.to_dict())
+        else:
+            for title in titles:
+                d = self.songs[title]
+                d["score"] = scores[title]
+                d["matches"] = matches[title]
+                # Drop fields left behind by a previous engine
+                for field in RATING_FIELDS:
+                    if field in fields:
+                        d[field] = fields[field][title]
+                    elif field in d:
+                        del d[field]
+        self.rebuild_indexes()
+        self.has_unsaved_changes = True
+        self.log_event("recompute", engine=self.engine.to_dict())
+        return result
+
+    @locked
+    def get_fit_payload(self, tol=BT_TOLERANCE, max_iter=BT_MAX_ITERATIONS):
+        """
+        Copies what a background Bradley-Terry fit needs, so voting can go on
+        (and the SQLite connection stays on this thread) while it runs.
+        """
+        return {
+            "votes": list(self.get_vote_log()),
+            "titles": list(self.score_index.scores),
+            "tol": tol,
+            "max_iter": max_iter,
+        }
+
+    def get_albums_list(self):
+        """Returns a sorted list of unique albums in the current database."""
+        return sorted(self.album_index)
+
+    def get_artists_list(self):
+        """Returns a sorted list of unique artists in the current database."""
+        return sorted(self.artist_index)
+
+    def get_album_keys(self, album):
+        """Returns the song keys of `album` in insertion order."""
+        return list(self.album_index.get(album, ()))
+
+    def get_artist_keys(self, artist):
+        """Returns the song keys of `artist` in insertion order."""
+        return list(self.artist_index.get(artist, ()))
+
+    def get_filtered_keys(self):
+        """Returns list of song keys matching the current filter."""
+        if self.active_filter == "All Albums":
+            return list(self.songs.keys())
+
+        return self.get_album_keys(self.active_filter)
+
+    def get_ranked_keys(self):
+        """Returns the filtered song keys sorted by score, best first."""
+        if isinstance(self.songs, SqliteSongStore):
+            album = None if self.active_filter == "All Albums" else self.active_filter
+            return self.songs.rank(album)
+        keys = self.get_filtered_keys()
+        if isinstance(self.songs, SongStore):
+            return self.songs.rank(keys)
+        return sorted(keys, key=lambda k: self.songs[k]["score"], reverse=True)
+
+    def get_field_values(self, keys, field):
+        """
+        Values of one song field for `keys`, in order. Scores and match counts
+        come from the indexes; SQLite sessions read other fields in bulk.
+        """
+        if field == "score":
+            scores = self.score_index.scores
+            return [scores[k] for k in keys]
+        if field == "matches":
+            positions = self.match_index.positions
+            return [positions[k][0] for k in keys]
+        if isinstance(self.songs, SqliteSongStore):
+            records = self.songs.get_many(keys)
+            return [records[k][field] for k in keys]
+        return [self.songs[k][field] for k in keys]
+
+    def get_album_stats(self):
+        """
+        Returns one dict per album with name, artist (of its first song),
+        cover_url (of its first song with a cover) and the running aggregates
+        of AlbumAggregate.summary: count, total, mean, median, std, ci95 and
+        matches. Reads one song per album, or SQLite's artists in one query.
+        """
+        if isinstance(self.songs, SqliteSongStore):
+            artists = self.songs.album_artists()
+        else:
+            artists = {
+                alb: self.songs[next(iter(keys))].get("artist")
+                for alb, keys in self.album_index.items()
+            }
+        stats = []
+        for alb in self.album_index:
+            item = {
+                "name": alb,
+                "artist": artists.get(alb) or "",
+                "cover_url": self.album_stats.cover_url(alb),
+            }
+            item.update(self.album_stats.summary(alb))
+            stats.append(item)
+        return stats
+
+    @locked
+    def get_matchup(self):
+        use_index = self.active_filter == "All Albums"
+        if use_index:
+            # Whole library: the indexes answer both picks, no candidate list needed
+            candidates = None
+            count = len(self.songs)
+        else:
+            candidates = self.get_filtered_keys()
+            count = len(candidates)
+        if count < 2:
+            return None
+
+        if self.matchmaking == "active":
+            pair = self.get_active_matchup(candidates, count)
+            if pair is not None:
+                return pair
+
+        # --- SMART MATCHMAKING ---
+
+        # 1. Select Song A (Challenger)
+        # Prioritize songs with fewer matches to ensure even coverage.
+
+        pool_size = max(2, count // 4)  # Bottom 25%
+
+        if use_index:
+            # The match-count index draws from the same bottom 25% without sorting
+            song_a = self.match_index.pick_least_played(pool_size)
+        else:
+            # Sort candidates by match count (ascending), then randomize slightly to break ties
+            random.shuffle(candidates)
+            candidates.sort(key=lambda k: self.match_index.positions[k][0])
+            pool_a = candidates[:pool_size]
+
+            song_a = random.choice(pool_a)
+
+        # 2. Select Song B (Opponent)
+        # Prioritize songs with similar ELO ratings for a fair fight.
+        # Also avoid recent matchups.
+
+        song_b = None
+        if use_index and count > self.EXACT_MATCHMAKING_LIMIT:
+            song_b = self.score_index.sample_opponent(
+                song_a, self.get_recent_opponents(song_a)
+            )
+        if song_b is None:
+            # Small sessions, album filters and the rare sampler give-up
+            if candidates is None:
+                candidates = list(self.songs.keys())
+            song_b = self.pick_opponent_exact(song_a, candidates)
+
+        # Record history
+        self.match_history.append(tuple(sorted((song_a, song_b))))
+
+        # Return shuffled pair so A isn't always on the left
+        pair = [song_a, song_b]
+        random.shuffle(pair)
+        return pair
+
+    def get_active_matchup(self, candidates, count):
+        """
+        Picks the pair whose vote is expected to teach the most about the
+        ranking (ratings.pair_information), searched over a shortlist:
+        challengers from the least played songs and from the whole pool, each
+        against its nearest neighbours by score. Returns None if every
+        shortlisted pair was played recently.
+        """
+        pool_size = max(2, count // 4)
+        if candidates is None:
+            # Half the least played songs, half anywhere in the library
+            entries = self.score_index.entries
+            challengers = dict.fromkeys(
+                [
+                    self.match_index.pick_least_played(pool_size)
+                    for _ in range(self.ACTIVE_SHORTLIST // 2)
+                ]
+                + [random.choice(entries)[1] for _ in range(self.ACTIVE_SHORTLIST // 2)]
+            )
+
+            def opponents(song):
+                return self.score_index.neighbors(song, self.ACTIVE_OPPONENTS)
+
+        else:
+            positions = self.match_index.positions
+            scores = self.score_index.scores
+            random.shuffle(candidates)
+            candidates.sort(key=lambda k: positions[k][0])
+            half = self.ACTIVE_SHORTLIST // 2
+            challengers = dict.fromkeys(
+                random.sample(candidates[:pool_size], min(pool_size, half))
+                + random.sample(candidates, min(count, half))
+            )
+            by_score = sorted(candidates, key=scores.__getitem__)
+            rank = {k: i for i, k in enumerate(by_score)}
+            reach = self.ACTIVE_OPPONENTS // 2
+
+            def opponents(song):
+                i = rank[song]
+                return by_score[max(0, i - reach) : i] + by_score[i + 1 : i + reach + 1]
+
+        shortlist = {song: opponents(song) for song in challengers}
+        keys = set(shortlist).union(*shortlist.values())
+        if isinstance(self.songs, SqliteSongStore):
+            records = self.songs.get_many(keys)  # One query instead of one per song
+        else:
+            records = {k: self.songs[k] for k in keys}
+        uncertainty = self.engine.uncertainty
+        beliefs = {k: (d["score"], uncertainty(d)) for k, d in records.items()}
+
+        best = None
+        best_gain = -1.0
+        for song_a, songs_b in shortlist.items():
+            belief_a = beliefs[song_a]
+            for song_b in songs_b:
+                if tuple(sorted((song_a, song_b))) in self.match_history:
+                    continue
+                gain = pair_information(*belief_a, *beliefs[song_b])
+                if gain > best_gain:
+                    best, best_gain = (song_a, song_b), gain
+        if best is None:
+            return None
+
+        self.match_history.append(tuple(sorted(best)))
+        pair = list(best)
+        random.shuffle(pair)
+        return pair
+
+    def get_recent_opponents(self, song):
+        """Songs paired with `song` in the recent match history."""
+        recent = set()
+        for a, b in self.match_history:
+            if a == song:
+                recent.add(b)
+            elif b == song:
+                recent.add(a)
+        return recent
+
+    def pick_opponent_exact(self, song_a, candidates):
+        """Reference opponent draw: weights every candidate by score closeness."""
+        score_a = self.score_index.scores[song_a]
+        opponents = [k for k in candidates if k != song_a]
+
+        weights = []
+        valid_opponents = []
+
+        for opp in opponents:
+            # Check history
+            pair_key = tuple(sorted((song_a, opp)))
+            if pair_key in self.match_history:
+                continue  # Skip recently matched pairs
+
+            score_b = self.score_index.scores[opp]
+            diff = abs(score_a - score_b)
+
+            # Weight formula: Higher weight for smaller difference
+            # Add base to avoid division by zero and give small chance to upsets
+            weight = opponent_weight(diff)
+
+            valid_opponents.append(opp)
+            weights.append(weight)
+
+        # Fallback if all opponents are in history (unlikely unless very few songs)
+        if not valid_opponents:
+            valid_opponents = opponents
+            weights = [1] * len(opponents)
+
+        return random.choices(valid_opponents, weights=weights, k=1)[0]
+
+    @locked
+    def update_score(self, winner, loser):
+        # One transaction per vote when the session lives in SQLite
+        with self.transaction():
+            d_win = self.songs[winner]
+            d_los = self.songs[loser]
+            self.engine.update(d_win, d_los)
+            d_win["matches"] += 1
+            d_los["matches"] += 1
+            if isinstance(self.songs, SqliteSongStore):
+                self.songs.add_vote(winner, loser)
+            else:
+                self.votes.append((winner, loser))
+        # The score and match indexes still hold the values before the vote
+        for key, d in ((winner, d_win), (loser, d_los)):
+            self.album_stats.update(
+                d.get("album"),
+                key,
+                self.score_index.scores[key],
+                self.match_index.positions[key][0],
+                d["score"],
+                d["matches"],
+            )
+        self.match_index.update(winner, d_win["matches"])
+        self.match_index.update(loser, d_los["matches"])
+        self.score_index.update(winner, d_win["score"])
+        self.score_index.update(loser, d_los["score"])
+        self.has_unsaved_changes = True
+        self.log_event("vote", winner=winner, loser=loser)
+        self.prune_matchup_queue()
+
+    # --- Matchup queue ---
+
+    def fill_matchup_queue(self, size=None):
+        """
+        Draws matchups until `size` (default MATCHUP_QUEUE_SIZE) are queued.
+        Meant to run off the UI thread; the lock is released between draws
+        so a vote never waits for more than one of them.
+        """
+        size = size or self.MATCHUP_QUEUE_SIZE
+        while True:
+            with self.lock:
+                if len(self.matchup_queue) >= size:
+                    return
+                pair = self.get_matchup()
+                if pair is None:
+                    return
+                scores = self.score_index.scores
+                self.matchup_queue.append(
+                    (self.active_filter, pair, scores[pair[0]], scores[pair[1]])
+                )
+
+    @locked
+    def pop_matchup(self):
+        """Returns the next still valid queued matchup, or draws one now."""
+        while self.matchup_queue:
+            entry = self.matchup_queue.popleft()
+            if self.is_queued_matchup_valid(entry):
+                return entry[1]
+        return self.get_matchup()
+
+    def is_queued_matchup_valid(self, entry):
+        active_filter, (song_a, song_b), score_a, score_b = entry
+        scores = self.score_index.scores
+        if active_filter != self.active_filter:
+            return False
+        if song_a not in scores or song_b not in scores:
+            return False  # Deleted, renamed or merged since
+        tolerance = self.QUEUE_SCORE_TOLERANCE
+        return (
+            abs(scores[song_a] - score_a) <= tolerance
+            and abs(scores[song_b] - score_b) <= tolerance
+        )
+
+    def prune_matchup_queue(self):
+        """Drops queued matchups that a vote or edit made stale."""
+        self.matchup_queue = deque(
+            e for e in self.matchup_queue if self.is_queued_matchup_valid(e)
+        )
+
+    @locked
+    def peek_matchups(self):
+        """The still valid queued matchups, next one first."""
+        return [e[1] for e in self.matchup_queue if self.is_queued_matchup_valid(e)]
+
+    @locked
+    def invalidate_matchups(self):
+        """Empties the queue, e.g. after the filter or matchmaking mode changed."""
+        self.matchup_queue.clear()
@@ -0,0 +1,406 @@
+import math
+import time
+
+DEFAULT_K_FACTOR = 32
+INITIAL_SCORE = 1200
+
+# Score points -> probit units: 1 / (1 + 10^(-d/400)) ~= Phi(d * PROBIT_SCALE)
+PROBIT_SCALE = math.log(10) / 400 / 1.702
+BALD_C = math.sqrt(math.pi * math.log(2) / 2)
+
+# Bradley-Terry fit defaults
+BT_TOLERANCE = 1e-6  # Largest change in log10-strength counted as converged
+BT_MAX_ITERATIONS = 1000
+BT_PRIOR = 1.0  # Virtual wins and losses per song against the reference
+
+
+def binary_entropy(p):
+    """Entropy in bits of a coin landing heads with probability p."""
+    if p <= 0 or p >= 1:
+        return 0.0
+    return -p * math.log2(p) - (1 - p) * math.log2(1 - p)
+
+
+def pair_information(score_a, sd_a, score_b, sd_b):
+    """
+    Expected information (in bits) one vote between a and b gives about
+    which of the two is better (BALD, Houlsby et al. 2011): entropy of the
+    predicted outcome minus the entropy left if the true ratings were known.
+    Ratings are Gaussians (score, standard deviation) and the logistic curve
+    is approximated by a probit. Highest for evenly matched pairs whose order
+    is still uncertain.
+    """
+    m = (score_a - score_b) * PROBIT_SCALE
+    s2 = (sd_a * sd_a + sd_b * sd_b) * PROBIT_SCALE * PROBIT_SCALE
+    p = 0.5 * math.erfc(-m / math.sqrt(2 * (1 + s2)))
+    c2 = BALD_C * BALD_C
+    expected_entropy = BALD_C / math.sqrt(s2 + c2) * math.exp(-m * m / (2 * (s2 + c2)))
+    return binary_entropy(p) - expected_entropy
+
+
+def encode_votes(votes, titles):
+    """
+    Maps (winner, loser) title pairs to integer song ids.
+    Returns (winners, losers, skipped) where votes on unknown songs and
+    self-votes (e.g. two merged songs) are dropped and counted in skipped.
+    """
+    index = {title: i for i, title in enumerate(titles)}
+    winners = []
+    losers = []
+    skipped = 0
+    for winner, loser in votes:
+        w = index.get(winner)
+        l = index.get(loser)
+        if w is None or l is None or w == l:
+            skipped += 1
+            continue
+        winners.append(w)
+        losers.append(l)
+    return winners, losers, skipped
+
+
+def replay_elo(
+    winners, losers, n_songs, k_factor=DEFAULT_K_FACTOR, initial=INITIAL_SCORE
+):
+    """
+    Recomputes Elo ratings from integer-encoded votes, in order.
+
+    Each vote depends on the ratings left by the previous one, so the update
+    itself cannot be vectorized; the loop works on flat float lists and does
+    one exponentiation per vote. Returns (scores, matches) lists.
+    """
+    scores = [float(initial)] * n_songs
+    matches = [0] * n_songs
+    k = float(k_factor)
+    for w, l in zip(winners, losers):
+        r_win = scores[w]
+        r_los = scores[l]
+        delta = k - k / (1 + 10 ** ((r_los - r_win) / 400))
+        scores[w] = r_win + delta
+        scores[l] = r_los - delta
+        matches[w] += 1
+        matches[l] += 1
+    return scores, matches
+
+
+def recompute_elo(votes, titles, k_factor=DEFAULT_K_FACTOR, initial=INITIAL_SCORE):
+    """
+    Replays a (winner, loser) title log over `titles` from scratch.
+    Returns {"scores": {title: score}, "matches": {title: count},
+    "votes": applied, "skipped": skipped, "seconds": elapsed}.
+    """
+    start = time.perf_counter()
+    titles = list(titles)
+    winners, losers, skipped = encode_votes(votes, titles)
+    scores, matches = replay_elo(winners, losers, len(titles), k_factor, initial)
+    return {
+        "scores": dict(zip(titles, scores)),
+        "matches": dict(zip(titles, matches)),
+        "votes": len(winners),
+        "skipped": skipped,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def fit_bradley_terry(
+    votes,
+    titles,
+    tol=BT_TOLERANCE,
+    max_iter=BT_MAX_ITERATIONS,
+    prior=BT_PRIOR,
+    initial=INITIAL_SCORE,
+):
+    """
+    Fits Bradley-Terry strengths to the whole vote log with the MM algorithm
+    (Hunter, 2004), vectorized over the distinct (winner, loser) pairs.
+
+    Each song also plays `prior` virtual wins and losses against a reference
+    of strength 1, which keeps undefeated / winless songs finite and anchors
+    the scale: strengths are reported as initial + 400 * log10(p), so songs
+    without votes sit at the initial score. Iterates until no log10-strength
+    moves by more than `tol` or `max_iter` is reached.
+
+    Returns {"scores": {title: score}, "iterations": n, "converged": bool,
+    "votes": applied, "skipped": skipped, "seconds": elapsed}.
+    Requires numpy.
+    """
+    import numpy as np
+
+    start = time.perf_counter()
+    titles = list(titles)
+    n = len(titles)
+    winners, losers, skipped = encode_votes(votes, titles)
+
+    # Collapse repeated pairings: pair_w beat pair_l pair_n times
+    if winners:
+        pairs = np.asarray(winners, dtype=np.int64) * n + np.asarray(
+            losers, dtype=np.int64
+        )
+        pairs, pair_n = np.unique(pairs, return_counts=True)
+        pair_w, pair_l = np.divmod(pairs, n)
+        pair_n = pair_n.astype(np.float64)
+    else:
+        pair_w = pair_l = np.zeros(0, dtype=np.int64)
+        pair_n = np.zeros(0, dtype=np.float64)
+
+    wins = np.bincount(pair_w, weights=pair_n, minlength=n) + prior
+    p = np.ones(n)
+    iterations = 0
+    converged = False
+    while iterations < max_iter:
+        iterations += 1
+        # sum over opponents j of n_ij / (p_i + p_j), plus the reference games
+        share = pair_n / (p[pair_w] + p[pair_l])
+        denom = 2 * prior / (p + 1)
+        denom += np.bincount(pair_w, weights=share, minlength=n)
+        denom += np.bincount(pair_l, weights=share, minlength=n)
+        new_p = wins / denom
+        change = np.max(np.abs(np.log10(new_p / p))) if n else 0.0
+        p = new_p
+        if change < tol:
+            converged = True
+            break
+
+    scores = initial + 400 * np.log10(p)
+    return {
+        "scores": dict(zip(titles, scores.tolist())),
+        "iterations": iterations,
+        "converged": converged,
+        "votes": len(winners),
+        "skipped": skipped,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+class RatingEngine:
+    """
+    Interface between RankingSession and a rating system.
+
+    Engines read and write song records (dict-like, with at least "score"
+    and "matches") and may keep extra per-song fields listed in `FIELDS`.
+    They carry no per-session state besides their settings, which are
+    stored in the session file via to_dict() / engine_from_dict().
+    """
+
+    NAME = None
+    LABEL = None
+    FIELDS = ()
+
+    def update(self, d_win, d_los):
+        """Applies one vote to the winner and loser records (not matches)."""
+        raise NotImplementedError
+
+    def expected(self, d_a, d_b):
+        """Probability that song a beats song b."""
+        raise NotImplementedError
+
+    def uncertainty(self, d):
+        """Standard deviation of a song's rating, in score points."""
+        raise NotImplementedError
+
+    def batch_update(self, votes, titles, initial=INITIAL_SCORE):
+        """
+        Replays a (winner, loser) log over `titles` from scratch. Returns
+        {"scores", "matches", "fields": {field: {title: value}}, "votes",
+        "skipped", "seconds"}.
+        """
+        raise NotImplementedError
+
+    def merge_fields(self, records):
+        """Engine fields for a song merged from `records`."""
+        return {}
+
+    def information_gain(self, d_a, d_b):
+        """Expected information (bits) from one vote, see pair_information."""
+        return pair_information(
+            d_a["score"], self.uncertainty(d_a), d_b["score"], self.uncertainty(d_b)
+        )
+
+    def settings(self):
+        return {}
+
+    def to_dict(self):
+        return dict(self.settings(), name=self.NAME)
+
+
+class EloEngine(RatingEngine):
+    """Classic Elo with a fixed K-factor."""
+
+    NAME = "elo"
+    LABEL = "Elo"
+    # Elo has no notion of uncertainty; this is scaled down by sqrt(matches)
+    BASE_UNCERTAINTY = 350
+
+    def __init__(self, k_factor=DEFAULT_K_FACTOR):
+        self.k_factor = k_factor
+
+    def update(self, d_win, d_los):
+        k = self.k_factor
+        r_win = d_win["score"]
+        r_los = d_los["score"]
+
+        e_win = 1 / (1 + 10 ** ((r_los - r_win) / 400))
+        e_los = 1 / (1 + 10 ** ((r_win - r_los) / 400))
+
+        d_win["score"] = r_win + k * (1 - e_win)
+        d_los["score"] = r_los + k * (0 - e_los)
+
+    def expected(self, d_a, d_b):
+        return 1 / (1 + 10 ** ((d_b["score"] - d_a["score"]) / 400))
+
+    def uncertainty(self, d):
+        return self.BASE_UNCERTAINTY / math.sqrt(1 + d["matches"])
+
+    def batch_update(self, votes, titles, initial=INITIAL_SCORE):
+        result = recompute_elo(votes, titles, self.k_factor, initial)
+        result["fields"] = {}
+        return result
+
+    def settings(self):
+        return {"k_factor": self.k_factor}
+
+
+class Glicko2Engine(RatingEngine):
+    """
+    Glicko-2 (Glickman, 2012), treating every vote as its own rating period.
+
+    Each song tracks a rating deviation ("rd", in score points) and a
+    volatility ("vol"). New songs start with a large rd, so their first
+    votes move them far, and the rd shrinks as evidence accumulates.
+    """
+
+    NAME = "glicko2"
+    LABEL = "Glicko-2"
+    FIELDS = ("rd", "vol")
+    SCALE = 400 / math.log(10)  # 173.7178, score points per Glicko-2 unit
+    INITIAL_RD = 350.0
+    INITIAL_VOL = 0.06
+    MIN_RD = 30.0  # Keeps long-running songs from freezing completely
+
+    def __init__(self, tau=0.5):
+        self.tau = tau
+
+    def state(self, d):
+        """Returns (mu, phi, sigma) of a song record on the Glicko-2 scale."""
+        return (
+            (d["score"] - INITIAL_SCORE) / self.SCALE,
+            d.get("rd", self.INITIAL_RD) / self.SCALE,
+            d.get("vol", self.INITIAL_VOL),
+        )
+
+    def rate(self, mu, phi, sigma, mu_j, phi_j, s):
+        """One Glicko-2 step for a single game with outcome `s` (1 or 0)."""
+        g = 1 / math.sqrt(1 + 3 * phi_j * phi_j / (math.pi * math.pi))
+        e = 1 / (1 + math.exp(-g * (mu - mu_j)))
+        v = 1 / (g * g * e * (1 - e))
+        delta = v * g * (s - e)
+
+        # New volatility: root of f(x) by the Illinois method (step 5)
+        a = math.log(sigma * sigma)
+        tau2 = self.tau * self.tau
+        phi2 = phi * phi
+
+        def f(x):
+            ex = math.exp(x)
+            d = phi2 + v + ex
+            return ex * (delta * delta - d) / (2 * d * d) - (x - a) / tau2
+
+        big_a = a
+        if delta * delta > phi2 + v:
+            big_b = math.log(delta * delta - phi2 - v)
+        else:
+            k = 1
+            while f(a - k * self.tau) < 0:
+                k += 1
+            big_b = a - k * self.tau
+        f_a = f(big_a)
+        f_b = f(big_b)
+        while abs(big_b - big_a) > 1e-6:
+            big_c = big_a + (big_a - big_b) * f_a / (f_b - f_a)
+            f_c = f(big_c)
+            if f_c * f_b <= 0:
+                big_a, f_a = big_b, f_b
+            else:
+                f_a /= 2
+            big_b, f_b = big_c, f_c
+        new_sigma = math.exp(big_a / 2)
+
+        phi_star = math.sqrt(phi2 + new_sigma * new_sigma)
+        new_phi = 1 / math.sqrt(1 / (phi_star * phi_star) + 1 / v)
+        new_phi = max(new_phi, self.MIN_RD / self.SCALE)
+        new_mu = mu + new_phi * new_phi * g * (s - e)
+        return new_mu, new_phi, new_sigma
+
+    def update(self, d_win, d_los):
+        w = self.state(d_win)
+        l = self.state(d_los)
+        for d, (mu, phi, sigma) in (
+            (d_win, self.rate(*w, l[0], l[1], 1)),
+            (d_los, self.rate(*l, w[0], w[1], 0)),
+        ):
+            d["score"] = INITIAL_SCORE + mu * self.SCALE
+            d["rd"] = phi * self.SCALE
+            d["vol"] = sigma
+
+    def expected(self, d_a, d_b):
+        mu_a, phi_a, _ = self.state(d_a)
+        mu_b, phi_b, _ = self.state(d_b)
+        phi = math.sqrt(phi_a * phi_a + phi_b * phi_b)
+        g = 1 / math.sqrt(1 + 3 * phi * phi / (math.pi * math.pi))
+        return 1 / (1 + math.exp(-g * (mu_a - mu_b)))
+
+    def uncertainty(self, d):
+        return d.get("rd", self.INITIAL_RD)
+
+    def batch_update(self, votes, titles, initial=INITIAL_SCORE):
+        start = time.perf_counter()
+        titles = list(titles)
+        winners, losers, skipped = encode_votes(votes, titles)
+        n = len(titles)
+        mus = [(initial - INITIAL_SCORE) / self.SCALE] * n
+        phis = [self.INITIAL_RD / self.SCALE] * n
+        sigmas = [self.INITIAL_VOL] * n
+        matches = [0] * n
+        rate = self.rate
+        for w, l in zip(winners, losers):
+            mu_w, phi_w, sigma_w = mus[w], phis[w], sigmas[w]
+            mu_l, phi_l, sigma_l = mus[l], phis[l], sigmas[l]
+            mus[w], phis[w], sigmas[w] = rate(mu_w, phi_w, sigma_w, mu_l, phi_l, 1)
+            mus[l], phis[l], sigmas[l] = rate(mu_l, phi_l, sigma_l, mu_w, phi_w, 0)
+            matches[w] += 1
+            matches[l] += 1
+        return {
+            "scores": {t: INITIAL_SCORE + m * self.SCALE for t, m in zip(titles, mus)},
+            "matches": dict(zip(titles, matches)),
+            "fields": {
+                "rd": {t: p * self.SCALE for t, p in zip(titles, phis)},
+                "vol": dict(zip(titles, sigmas)),
+            },
+            "votes": len(winners),
+            "skipped": skipped,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def merge_fields(self, records):
+        # The merged song is at least as well known as its best-known part
+        return {
+            "rd": min(self.uncertainty(d) for d in records),
+            "vol": sum(d.get("vol", self.INITIAL_VOL) for d in records) / len(records),
+        }
+
+    def settings(self):
+        return {"tau": self.tau}
+
+
+RATING_ENGINES = {engine.NAME: engine for engine in (EloEngine, Glicko2Engine)}
+
+
+def engine_from_dict(data):
+    """Builds an engine from to_dict() output; None or {} gives the default Elo."""
+    if not data:
+        return EloEngine()
+    settings = dict(data)
+    name = settings.pop("name", EloEngine.NAME)
+    if name not in RATING_ENGINES:
+        raise ValueError(f"Unknown rating engine: {name}")
+    return RATING_ENGINES[name](**settings)
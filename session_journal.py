@@ -0,0 +1,112 @@
+import json
+import os
+
+
+class SessionJournal:
+    """
+    Append-only log of session edits, stored next to the snapshot file.
+
+    Each event is one JSON object per line ({"op": ..., ...}), flushed and
+    fsynced as soon as it is written, so a crash loses at most the event that
+    was being written. Loading a session replays the journal on top of the
+    snapshot; compaction rewrites the snapshot and empties the journal.
+
+    Events are tagged with the generation of the snapshot they apply to, and
+    each compaction writes the next generation. A crash after the new
+    snapshot replaced the old one but before the journal was emptied leaves
+    events of the previous generation behind, which replay then skips.
+    """
+
+    SUFFIX = ".journal"
+
+    def __init__(self, snapshot_path, sync=True, generation=0):
+        self.path = snapshot_path + self.SUFFIX
+        self.sync = sync
+        self.generation = generation  # Of the snapshot new events apply to
+        self.count = 0  # Events appended since the last reset
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, event):
+        event = {**event, "gen": self.generation}
+        self.file.write(json.dumps(event, separators=(",", ":")) + "\n")
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+        self.count += 1
+
+    def reset(self, generation):
+        """
+        Empties the journal once its events are part of the snapshot of
+        `generation`, which the events appended from now on apply to.
+        """
+        # Tag first: should truncating fail, replay still skips the old events
+        self.generation = generation
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+        self.count = 0
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    @classmethod
+    def read_events(cls, snapshot_path, generation=0):
+        """
+        Yields the events recorded for `snapshot_path` on top of its snapshot
+        of `generation`, oldest first; events of other generations are already
+        in the snapshot (or belong to another file) and are skipped. Untagged
+        events count as generation 0, like snapshots without one.
+        A partial last line (cut short by a crash) is dropped from the file so
+        that later appends start on a clean line.
+        """
+        path = snapshot_path + cls.SUFFIX
+        if not os.path.exists(path):
+            return
+        valid_end = 0
+        skipped = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break
+                valid_end += len(line)
+                if event.pop("gen", 0) != generation:
+                    skipped += 1
+                    continue
+                yield event
+            torn = f.seek(0, os.SEEK_END) > valid_end
+        if skipped:
+            print(f"Skipped {skipped} entries of {path} already in the snapshot")
+        if torn:
+            print(f"Dropping partial entry at the end of {path}")
+            with open(path, "r+b") as f:
+                f.truncate(valid_end)
+
+
+def write_snapshot(path, data, indent=4, compact_keys=()):
+    """
+    Writes a JSON object to `path` atomically (temp file + rename).
+    Top-level keys listed in `compact_keys` are written on a single line,
+    which keeps long lists (e.g. the vote log) from exploding in size.
+    """
+    parts = []
+    for key, value in data.items():
+        if key in compact_keys:
+            text = json.dumps(value, separators=(",", ":"))
+        else:
+            text = json.dumps(value, indent=indent).replace("\n", "\n" + " " * indent)
+        parts.append(" " * indent + json.dumps(key) + ": " + text)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("{\n" + ",\n".join(parts) + "\n}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,338 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from ranking_session import RankingSession
+from ratings import INITIAL_SCORE, RATING_ENGINES, engine_from_dict
+
+SONGS_PER_ALBUM = 12
+ALBUMS_PER_ARTIST = 8
+DEFAULT_THRESHOLDS = (0.5, 0.7, 0.8, 0.9, 0.95)
+
+
+class SimulatedVoter:
+    """
+    Votes like a Bradley-Terry player who knows the true ratings.
+
+    A song rated d points above its opponent wins with probability
+    1 / (1 + 10^(-d / (400 * noise))); with probability `lapse` the voter
+    ignores the songs and clicks at random.
+    """
+
+    def __init__(self, true_scores, rng, noise=1.0, lapse=0.0):
+        self.true_scores = true_scores
+        self.rng = rng
+        self.noise = noise
+        self.lapse = lapse
+
+    def vote(self, song_a, song_b):
+        """Returns (winner, loser)."""
+        if self.rng.random() < self.lapse:
+            p_a = 0.5
+        else:
+            diff = self.true_scores[song_a] - self.true_scores[song_b]
+            p_a = 1 / (1 + 10 ** (-diff / (400 * self.noise)))
+        if self.rng.random() < p_a:
+            return song_a, song_b
+        return song_b, song_a
+
+
+def build_library(n_songs, spread, rng):
+    """
+    Returns ({title: song}, {title: true rating}) for a synthetic library.
+    True ratings are evenly spaced quantiles of a normal distribution with
+    standard deviation `spread`, so "Song 1" is the best song; albums and
+    artists mix songs of every quality.
+    """
+    dist = statistics.NormalDist(0, spread)
+    titles = [f"Song {i + 1}" for i in range(n_songs)]
+    true_scores = {
+        title: dist.inv_cdf((n_songs - i - 0.5) / n_songs)
+        for i, title in enumerate(titles)
+    }
+    shuffled = titles[:]
+    rng.shuffle(shuffled)
+    songs = {}
+    for i, title in enumerate(shuffled):
+        album = i // SONGS_PER_ALBUM
+        songs[title] = {
+            "artist": f"Artist {album // ALBUMS_PER_ARTIST + 1}",
+            "album": f"Album {album + 1}",
+            "year": "2000",
+            "score": INITIAL_SCORE,
+            "matches": 0,
+            "cover_url": None,
+        }
+    # Keep the library in ground-truth order, like an import would be
+    return {title: songs[title] for title in titles}, true_scores
+
+
+def count_inversions(values):
+    """
+    Number of pairs i < j with values[i] > values[j] (equal values are not
+    inversions), by bottom-up merge sort.
+    """
+    values = list(values)
+    n = len(values)
+    inversions = 0
+    width = 1
+    buffer = [None] * n
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            i, j, k = lo, mid, lo
+            while i < mid and j < hi:
+                if values[i] <= values[j]:
+                    buffer[k] = values[i]
+                    i += 1
+                else:
+                    buffer[k] = values[j]
+                    inversions += mid - i
+                    j += 1
+                k += 1
+            buffer[k : k + mid - i] = values[i:mid]
+            k += mid - i
+            buffer[k : k + hi - j] = values[j:hi]
+        values, buffer = buffer, values
+        width *= 2
+    return inversions
+
+
+def kendall_tau(true_order, scores):
+    """
+    Kendall tau-b between the ground truth (best first, no ties) and the
+    estimated `scores`. Returns 0.0 while every estimate is tied.
+    """
+    estimates = [scores[title] for title in reversed(true_order)]
+    n = len(estimates)
+    total = n * (n - 1) // 2
+    ties = sum(c * (c - 1) // 2 for c in _group_sizes(sorted(estimates)))
+    if total == 0 or ties == total:
+        return 0.0
+    discordant = count_inversions(estimates)
+    concordant = total - discordant - ties
+    return (concordant - discordant) / (total * (total - ties)) ** 0.5
+
+
+def _group_sizes(sorted_values):
+    count = 0
+    previous = None
+    for value in sorted_values:
+        if count and value == previous:
+            count += 1
+            continue
+        if count:
+            yield count
+        previous = value
+        count = 1
+    if count:
+        yield count
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    last = len(samples) - 1
+    summary = {
+        f"p{p}": samples[min(last, int(last * p / 100))] * 1000 for p in (50, 90, 99)
+    }
+    summary["max"] = samples[-1] * 1000
+    summary["calls"] = len(samples)
+    return summary
+
+
+def run_simulation(
+    n_songs=1000,
+    max_votes=None,
+    engine="elo",
+    matchmaking="balanced",
+    seed=0,
+    spread=200.0,
+    noise=1.0,
+    lapse=0.05,
+    check_every=None,
+    thresholds=DEFAULT_THRESHOLDS,
+    progress=None,
+):
+    """
+    Builds a synthetic session and votes until every threshold is reached or
+    `max_votes` is spent. Returns a JSON-serializable result dict.
+    """
+    if max_votes is None:
+        max_votes = 50 * n_songs
+    if check_every is None:
+        check_every = max(100, n_songs // 2)
+
+    rng = random.Random(seed)
+    random.seed(seed)  # Matchmaking draws from the random module
+
+    start = time.perf_counter()
+    songs, true_scores = build_library(n_songs, spread, rng)
+    true_order = list(songs)
+    session = RankingSession()
+    # Same path as loading a session file: one bulk index build
+    session.songs = session.make_song_table(songs)
+    session.rebuild_indexes()
+    session.engine = engine_from_dict({"name": engine})
+    session.matchmaking = matchmaking
+    build_seconds = time.perf_counter() - start
+
+    voter = SimulatedVoter(true_scores, rng, noise=noise, lapse=lapse)
+    matchup_times = []
+    update_times = []
+    checkpoints = []
+    reached = {t: None for t in sorted(thresholds)}
+    clock = time.perf_counter
+
+    votes = 0
+    while votes < max_votes:
+        t0 = clock()
+        pair = session.get_matchup()
+        t1 = clock()
+        winner, loser = voter.vote(*pair)
+        t2 = clock()
+        session.update_score(winner, loser)
+        t3 = clock()
+        matchup_times.append(t1 - t0)
+        update_times.append(t3 - t2)
+        votes += 1
+
+        if votes % check_every == 0 or votes == max_votes:
+            tau = kendall_tau(true_order, session.score_index.scores)
+            checkpoints.append((votes, tau))
+            for threshold in reached:
+                if reached[threshold] is None and tau >= threshold:
+                    reached[threshold] = votes
+            if progress:
+                progress(votes, tau)
+            if all(v is not None for v in reached.values()):
+                break
+
+    return {
+        "config": {
+            "songs": n_songs,
+            "max_votes": max_votes,
+            "engine": engine,
+            "matchmaking": matchmaking,
+            "seed": seed,
+            "spread": spread,
+            "noise": noise,
+            "lapse": lapse,
+            "check_every": check_every,
+        },
+        "build_seconds": build_seconds,
+        "votes": votes,
+        "final_tau": checkpoints[-1][1] if checkpoints else None,
+        "votes_to_tau": {str(t): v for t, v in reached.items()},
+        "checkpoints": checkpoints,
+        "latency_ms": {
+            "get_matchup": percentiles(matchup_times),
+            "update_score": percentiles(update_times),
+        },
+    }
+
+
+def print_report(result):
+    config = result["config"]
+    print(
+        f"{config['songs']} songs, {config['engine']} engine, "
+        f"{config['matchmaking']} matchmaking, seed {config['seed']} "
+        f"(library built in {result['build_seconds']:.2f}s)"
+    )
+    print(
+        f"Votes cast: {result['votes']}, final Kendall tau: {result['final_tau']:.4f}"
+    )
+    print("\nVotes to reach Kendall tau:")
+    for threshold, votes in result["votes_to_tau"].items():
+        text = (
+            "not reached"
+            if votes is None
+            else f"{votes} ({votes / config['songs']:.1f} per song)"
+        )
+        print(f"  {threshold:>5}: {text}")
+    print("\nLatency (ms):")
+    for name, stats in result["latency_ms"].items():
+        print(
+            f"  {name:<13} p50 {stats['p50']:.3f}  p90 {stats['p90']:.3f}  "
+            f"p99 {stats['p99']:.3f}  max {stats['max']:.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate a voter ranking a synthetic library, without the GUI."
+    )
+    parser.add_argument("--songs", type=int, default=1000, help="Library size")
+    parser.add_argument(
+        "--votes", type=int, default=None, help="Vote budget (default: 50 per song)"
+    )
+    parser.add_argument("--engine", choices=sorted(RATING_ENGINES), default="elo")
+    parser.add_argument(
+        "--matchmaking",
+        choices=RankingSession.MATCHMAKING_MODES,
+        default="balanced",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--spread",
+        type=float,
+        default=200.0,
+        help="Standard deviation of the true ratings, in score points",
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=1.0,
+        help="Voter inconsistency: 2 makes rating gaps count half as much",
+    )
+    parser.add_argument(
+        "--lapse",
+        type=float,
+        default=0.05,
+        help="Probability that a vote is a random click",
+    )
+    parser.add_argument(
+        "--check-every",
+        type=int,
+        default=None,
+        help="Votes between Kendall tau checks (default: half the library)",
+    )
+    parser.add_argument(
+        "--thresholds",
+        default=",".join(str(t) for t in DEFAULT_THRESHOLDS),
+        help="Comma-separated Kendall tau targets",
+    )
+    parser.add_argument("--json", metavar="PATH", help="Also write results to PATH")
+    parser.add_argument("--quiet", action="store_true", help="No progress output")
+    args = parser.parse_args()
+
+    def progress(votes, tau):
+        print(f"{votes} votes: tau {tau:.4f}", file=sys.stderr)
+
+    result = run_simulation(
+        n_songs=args.songs,
+        max_votes=args.votes,
+        engine=args.engine,
+        matchmaking=args.matchmaking,
+        seed=args.seed,
+        spread=args.spread,
+        noise=args.noise,
+        lapse=args.lapse,
+        check_every=args.check_every,
+        thresholds=[float(t) for t in args.thresholds.split(",")],
+        progress=None if args.quiet else progress,
+    )
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+from array import array
+from collections.abc import MutableMapping
+
+# Fields stored as integer ids into a shared table of distinct values.
+# Albums, artists, years and album covers repeat across many songs.
+INTERNED_FIELDS = ("album", "artist", "year", "cover_url")
+
+# Sentinel for optional fields that are absent (distinct from None / "")
+_MISSING = object()
+
+
+def _numpy():
+    """Returns numpy if it is installed, otherwise None."""
+    try:
+        import numpy
+
+        return numpy
+    except ImportError:
+        return None
+
+
+class SongRecord(MutableMapping):
+    """
+    Dict-like view on one row of a SongStore.
+
+    Reads and writes go straight to the store's columns, so existing code that
+    does songs[title]["score"] += ... keeps working. A record is only valid
+    while its song is in the store; do not keep it around after deleting it.
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, field):
+        return self._store.get_field(self._row, field)
+
+    def __setitem__(self, field, value):
+        self._store.set_field(self._row, field, value)
+
+    def __delitem__(self, field):
+        self._store.del_field(self._row, field)
+
+    def __iter__(self):
+        return iter(self._store.row_fields(self._row))
+
+    def __len__(self):
+        return len(self._store.row_fields(self._row))
+
+    def __repr__(self):
+        return f"SongRecord({dict(self)!r})"
+
+
+class SongStore(MutableMapping):
+    """
+    Column-oriented song table with the same interface as the plain
+    {title: {field: value}} dict used by RankingSession.
+
+    score and matches live in typed arrays, album/artist/year/cover_url are
+    interned integer ids, preview_url is a plain list and anything else goes
+    to a sparse per-row dict. A song costs a few dozen bytes of column data
+    instead of a full dict, and aggregates run over the arrays (vectorized
+    with numpy when it is available).
+    """
+
+    def __init__(self, songs=None):
+        self.rows = {}  # title -> row id, insertion ordered
+        self.titles = []  # row id -> title (None for free rows)
+        self.free_rows = []
+
+        self.score = array("d")
+        self.matches = array("q")
+        self.interned = {field: array("l") for field in INTERNED_FIELDS}
+        self.preview_url = []
+        self.extras = {}  # row id -> {field: value} for uncommon fields
+
+        self.values = []  # Interned value table
+        self.value_ids = {}  # value -> id in self.values
+
+        if songs:
+            self.update(songs)
+
+    # --- Mapping interface (title -> SongRecord) ---
+
+    def __getitem__(self, title):
+        return SongRecord(self, self.rows[title])
+
+    def __setitem__(self, title, data):
+        row = self.rows.get(title)
+        if row is None:
+            row = self.allocate_row(title)
+            self.rows[title] = row
+        else:
+            self.clear_row(row)
+        for field, value in data.items():
+            self.set_field(row, field, value)
+
+    def __delitem__(self, title):
+        row = self.rows.pop(title)
+        self.clear_row(row)
+        self.titles[row] = None
+        self.free_rows.append(row)
+
+    def __contains__(self, title):
+        return title in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # --- Row storage ---
+
+    def allocate_row(self, title):
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.titles[row] = title
+            return row
+        self.titles.append(title)
+        self.score.append(0.0)
+        self.matches.append(0)
+        for column in self.interned.values():
+            column.append(-1)
+        self.preview_url.append(_MISSING)
+        return len(self.titles) - 1
+
+    def clear_row(self, row):
+        self.score[row] = 0.0
+        self.matches[row] = 0
+        for column in self.interned.values():
+            column[row] = -1
+        self.preview_url[row] = _MISSING
+        self.extras.pop(row, None)
+
+    def intern(self, value):
+        value_id = self.value_ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.values.append(value)
+            self.value_ids[value] = value_id
+        return value_id
+
+    def get_field(self, row, field):
+        if field == "score":
+            return self.score[row]
+        if field == "matches":
+            return self.matches[row]
+        if field in self.interned:
+            value_id = self.interned[field][row]
+            if value_id < 0:
+                raise KeyError(field)
+            return self.values[value_id]
+        if field == "preview_url":
+            value = self.preview_url[row]
+            if value is _MISSING:
+                raise KeyError(field)
+            return value
+        return self.extras.get(row, {})[field]
+
+    def set_field(self, row, field, value):
+        if field == "score":
+            self.score[row] = value
+        elif field == "matches":
+            self.matches[row] = value
+        elif field in self.interned:
+            self.interned[field][row] = self.intern(value)
+        elif field == "preview_url":
+            self.preview_url[row] = value
+        else:
+            self.extras.setdefault(row, {})[field] = value
+
+    def del_field(self, row, field):
+        if field in ("score", "matches"):
+            raise KeyError(f"'{field}' is required and cannot be removed")
+        if field in self.interned:
+            if self.interned[field][row] < 0:
+                raise KeyError(field)
+            self.interned[field][row] = -1
+        elif field == "preview_url":
+            if self.preview_url[row] is _MISSING:
+                raise KeyError(field)
+            self.preview_url[row] = _MISSING
+        else:
+            extra = self.extras.get(row, {})
+            del extra[field]
+            if not extra:
+                self.extras.pop(row, None)
+
+    def row_fields(self, row):
+        fields = ["score", "matches"]
+        for field, column in self.interned.items():
+            if column[row] >= 0:
+                fields.append(field)
+        if self.preview_url[row] is not _MISSING:
+            fields.append("preview_url")
+        fields.extend(self.extras.get(row, ()))
+        return fields
+
+    # --- Bulk operations ---
+
+    def to_dict(self):
+        """Plain {title: {field: value}} copy, e.g. for json.dump."""
+        return {title: dict(SongRecord(self, row)) for title, row in self.rows.items()}
+
+    def rank(self, titles=None, reverse=True):
+        """Returns `titles` (default: all songs) sorted by score."""
+        if titles is None:
+            rows = list(self.rows.values())
+        else:
+            rows = [self.rows[t] for t in titles]
+        np = _numpy()
+        if np is not None and rows:
+            idx = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            scores = np.frombuffer(self.score, dtype=np.float64)[idx]
+            order = np.argsort(-scores if reverse else scores, kind="stable")
+            return [self.titles[r] for r in idx[order].tolist()]
+        rows.sort(key=self.score.__getitem__, reverse=reverse)
+        return [self.titles[r] for r in rows]
@@ -0,0 +1,411 @@
+import json
+import os
+import sqlite3
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS albums (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY,
+    title TEXT UNIQUE NOT NULL,
+    score REAL NOT NULL DEFAULT 1200,
+    matches INTEGER NOT NULL DEFAULT 0,
+    album_id INTEGER REFERENCES albums(id),
+    artist TEXT,
+    year TEXT,
+    cover_url TEXT,
+    preview_url TEXT,
+    rd REAL,
+    vol REAL,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS votes (
+    id INTEGER PRIMARY KEY,
+    winner TEXT NOT NULL,
+    loser TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_songs_album ON songs(album_id);
+CREATE INDEX IF NOT EXISTS idx_songs_score ON songs(score);
+CREATE INDEX IF NOT EXISTS idx_songs_matches ON songs(matches);
+"""
+
+# Song fields that map to a plain column of the songs table
+COLUMNS = (
+    "score",
+    "matches",
+    "artist",
+    "year",
+    "cover_url",
+    "preview_url",
+    "rd",
+    "vol",
+)
+SELECT_FIELDS = (
+    "score, matches, album_id, artist, year, cover_url, preview_url, rd, vol, extra"
+)
+
+# Columns added after version 1 of the schema, as (version, column, type)
+MIGRATIONS = ((2, "rd", "REAL"), (2, "vol", "REAL"))
+
+
+def is_sqlite_path(path):
+    return bool(path) and path.lower().endswith(SQLITE_EXTENSIONS)
+
+
+class SqliteSongRecord(MutableMapping):
+    """
+    Dict-like view on one song row. Values are read once when the record is
+    fetched; assignments are written straight through to the database.
+    """
+
+    __slots__ = ("_store", "_title", "_data")
+
+    def __init__(self, store, title, data):
+        self._store = store
+        self._title = title
+        self._data = data
+
+    def __getitem__(self, field):
+        return self._data[field]
+
+    def __setitem__(self, field, value):
+        self._store.set_field(self._title, field, value)
+        self._data[field] = value
+
+    def __delitem__(self, field):
+        if field in ("score", "matches"):
+            raise KeyError(f"'{field}' is required and cannot be removed")
+        del self._data[field]
+        self._store.set_field(self._title, field, None)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"SqliteSongRecord({self._data!r})"
+
+
+class SqliteSongStore(MutableMapping):
+    """
+    {title: song} mapping backed by a SQLite session file.
+
+    Songs are only read when accessed, so opening a session costs one query
+    for the lookup indexes instead of parsing every song. Leaderboards and
+    album statistics are answered with indexed SQL queries, and every vote is
+    stored in the votes table.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        # Matchups are also drawn from a background thread. RankingSession's
+        # lock keeps writes and transactions on one thread at a time; plain
+        # reads in autocommit mode are serialized by SQLite itself
+        self.conn = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        (version,) = self.conn.execute("PRAGMA user_version").fetchone()
+        self.conn.executescript(SCHEMA)
+        if version:
+            # An existing file: CREATE TABLE IF NOT EXISTS kept its old songs table
+            for added_in, column, kind in MIGRATIONS:
+                if version < added_in:
+                    self.conn.execute(f"ALTER TABLE songs ADD COLUMN {column} {kind}")
+        self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self.album_ids = dict(self.conn.execute("SELECT name, id FROM albums"))
+        self.album_names = {v: k for k, v in self.album_ids.items()}
+        (self.count,) = self.conn.execute("SELECT COUNT(*) FROM songs").fetchone()
+
+    @classmethod
+    def create(cls, path, songs, votes=()):
+        """Writes songs and votes to a new database, replacing any file at `path`."""
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        store = cls(path)
+        with store.transaction():
+            for title, data in songs.items():
+                store[title] = data
+            # Original timestamps are unknown for votes coming from JSON
+            store.conn.executemany(
+                "INSERT INTO votes (winner, loser, ts) VALUES (?, ?, 0)", votes
+            )
+        return store
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    @contextmanager
+    def transaction(self):
+        """Groups writes into one transaction (nested calls join the outer one)."""
+        if self.conn.in_transaction:
+            yield
+            return
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def album_id(self, name):
+        if name is None:
+            return None
+        album_id = self.album_ids.get(name)
+        if album_id is None:
+            album_id = self.conn.execute(
+                "INSERT INTO albums (name) VALUES (?)", (name,)
+            ).lastrowid
+            self.album_ids[name] = album_id
+            self.album_names[album_id] = name
+        return album_id
+
+    # --- Mapping interface ---
+
+    def __getitem__(self, title):
+        row = self.conn.execute(
+            f"SELECT {SELECT_FIELDS} FROM songs WHERE title = ?", (title,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(title)
+        return SqliteSongRecord(self, title, self.row_data(row))
+
+    def get_many(self, titles):
+        """Returns {title: record} for the existing songs among `titles`."""
+        titles = list(titles)
+        records = {}
+        # Stay below SQLite's default limit of 999 bound parameters
+        for i in range(0, len(titles), 900):
+            chunk = titles[i : i + 900]
+            rows = self.conn.execute(
+                f"SELECT title, {SELECT_FIELDS} FROM songs"
+                f" WHERE title IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for row in rows:
+                records[row[0]] = SqliteSongRecord(self, row[0], self.row_data(row[1:]))
+        return records
+
+    def row_data(self, row):
+        """Builds the song dict for a row selected with SELECT_FIELDS."""
+        (
+            score,
+            matches,
+            album_id,
+            artist,
+            year,
+            cover_url,
+            preview_url,
+            rd,
+            vol,
+            extra,
+        ) = row
+        # NULL artist/year/preview_url/rd/vol means the field was never set
+        data = {"score": score, "matches": matches}
+        if album_id is not None:
+            data["album"] = self.album_names[album_id]
+        for field, value in (("artist", artist), ("year", year)):
+            if value is not None:
+                data[field] = value
+        data["cover_url"] = cover_url
+        for field, value in (("preview_url", preview_url), ("rd", rd), ("vol", vol)):
+            if value is not None:
+                data[field] = value
+        if extra:
+            data.update(json.loads(extra))
+        return data
+
+    def __setitem__(self, title, data):
+        extra = {
+            k: v
+            for k, v in data.items()
+            if k not in COLUMNS and k != "album" and v is not None
+        }
+        values = (
+            title,
+            data.get("score", 1200),
+            data.get("matches", 0),
+            self.album_id(data.get("album")),
+            data.get("artist"),
+            data.get("year"),
+            data.get("cover_url"),
+            data.get("preview_url"),
+            data.get("rd"),
+            data.get("vol"),
+            json.dumps(extra) if extra else None,
+        )
+        with self.transaction():
+            deleted = self.conn.execute(
+                "DELETE FROM songs WHERE title = ?", (title,)
+            ).rowcount
+            self.conn.execute(
+                "INSERT INTO songs (title, score, matches, album_id, artist, year,"
+                " cover_url, preview_url, rd, vol, extra)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values,
+            )
+        self.count += 1 - deleted
+
+    def __delitem__(self, title):
+        deleted = self.conn.execute(
+            "DELETE FROM songs WHERE title = ?", (title,)
+        ).rowcount
+        if not deleted:
+            raise KeyError(title)
+        self.count -= 1
+
+    def __contains__(self, title):
+        return (
+            self.conn.execute(
+                "SELECT 1 FROM songs WHERE title = ?", (title,)
+            ).fetchone()
+            is not None
+        )
+
+    def __iter__(self):
+        rows = self.conn.execute("SELECT title FROM songs ORDER BY id")
+        return (title for (title,) in rows)
+
+    def __len__(self):
+        return self.count
+
+    def set_field(self, title, field, value):
+        if field in COLUMNS:
+            self.conn.execute(
+                f"UPDATE songs SET {field} = ? WHERE title = ?", (value, title)
+            )
+        elif field == "album":
+            self.conn.execute(
+                "UPDATE songs SET album_id = ? WHERE title = ?",
+                (self.album_id(value), title),
+            )
+        else:
+            with self.transaction():
+                (extra,) = self.conn.execute(
+                    "SELECT extra FROM songs WHERE title = ?", (title,)
+                ).fetchone()
+                extra = json.loads(extra) if extra else {}
+                if value is None:
+                    extra.pop(field, None)
+                else:
+                    extra[field] = value
+                self.conn.execute(
+                    "UPDATE songs SET extra = ? WHERE title = ?",
+                    (json.dumps(extra) if extra else None, title),
+                )
+
+    # --- Queries ---
+
+    def index_rows(self):
+        """Yields (title, score, matches, album, artist, cover_url) for every song."""
+        names = self.album_names
+        for title, score, matches, album_id, artist, cover_url in self.conn.execute(
+            "SELECT title, score, matches, album_id, artist, cover_url"
+            " FROM songs ORDER BY id"
+        ):
+            yield title, score, matches, names.get(album_id), artist, cover_url
+
+    def rank(self, album=None):
+        """Song titles ordered by score (best first), optionally for one album."""
+        if album is None:
+            rows = self.conn.execute("SELECT title FROM songs ORDER BY score DESC")
+        else:
+            rows = self.conn.execute(
+                "SELECT title FROM songs WHERE album_id = ? ORDER BY score DESC",
+                (self.album_ids.get(album),),
+            )
+        return [title for (title,) in rows]
+
+    def album_artists(self):
+        """Returns {album: artist of its first song} in one grouped query."""
+        # SQLite takes bare columns from the row that MIN() picked
+        rows = self.conn.execute(
+            "SELECT album_id, artist, MIN(id) FROM songs"
+            " WHERE album_id IS NOT NULL GROUP BY album_id"
+        )
+        return {self.album_names[album_id]: artist for album_id, artist, _ in rows}
+
+    def add_vote(self, winner, loser):
+        self.conn.execute(
+            "INSERT INTO votes (winner, loser, ts) VALUES (?, ?, ?)",
+            (winner, loser, time.time()),
+        )
+
+    def votes(self):
+        """Returns the recorded (winner, loser) pairs, oldest first."""
+        return self.conn.execute(
+            "SELECT winner, loser FROM votes ORDER BY id"
+        ).fetchall()
+
+    def vote_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM votes").fetchone()[0]
+
+    def rename_votes(self, mapping):
+        """Points recorded votes of the songs in `mapping` to their new titles."""
+        with self.transaction():
+            for old, new in mapping.items():
+                self.conn.execute(
+                    "UPDATE votes SET winner = ? WHERE winner = ?", (new, old)
+                )
+                self.conn.execute(
+                    "UPDATE votes SET loser = ? WHERE loser = ?", (new, old)
+                )
+
+    def set_ratings(self, rows, fields=()):
+        """
+        Bulk-updates (title, score, matches, *fields) rows, where `fields`
+        names extra rating columns (e.g. rd, vol). Columns not listed in
+        `fields` but used by a rating engine are cleared.
+        """
+        cleared = [f for f in ("rd", "vol") if f not in fields]
+        assignments = ", ".join(
+            ["score = ?", "matches = ?"]
+            + [f"{f} = ?" for f in fields]
+            + [f"{f} = NULL" for f in cleared]
+        )
+        with self.transaction():
+            self.conn.executemany(
+                f"UPDATE songs SET {assignments} WHERE title = ?",
+                (row[1:] + row[:1] for row in rows),
+            )
+
+    def get_meta(self, key, default=None):
+        """Returns a JSON value stored in the meta table."""
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
+        )
+
+    def to_dict(self):
+        """Plain {title: {field: value}} copy, e.g. for json.dump."""
+        rows = self.conn.execute(
+            f"SELECT title, {SELECT_FIELDS} FROM songs ORDER BY id"
+        )
+        return {row[0]: self.row_data(row[1:]) for row in rows}
@@ -0,0 +1,332 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from ranking_session import OrderStatisticList
+
+
+class LeaderboardModel(QAbstractTableModel):
+    """
+    Songs of one album filter, one row each, kept live while voting.
+
+    Ranks come from an OrderStatisticList of (-score, key), so a vote moves
+    just the two songs involved (scores_changed) in O(log n). Sorted by rank
+    or score, rows are read straight from that list; a header click on any
+    other column loads a second OrderStatisticList of (value, key) with a
+    single Python sort (a QSortFilterProxyModel would call back into Python
+    for every comparison), so rows are found, inserted and moved in
+    O(log n) under every sort. Cells are read from the session only when
+    the view paints them, and edits insert or remove rows in place.
+    """
+
+    COLUMNS = ("Rank", "Artist", "Song", "Score", "Matches", "MLE Score")
+    FIELDS = ("rank", "artist", "title", "score", "matches", "mle")
+
+    def __init__(self, session, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.album = session.active_filter
+        self.order = OrderStatisticList()  # (-score, key), best first
+        self.scores = {}  # key -> score its entry in self.order was made with
+        # (value, key) under the sort column, or None when rows follow self.order
+        self.keys = None
+        self.sort_values = {}  # key -> value its entry in self.keys was made with
+        self.artists = {}  # key -> artist, filled as rows are painted
+        self.sort_column = 0
+        self.sort_order = Qt.SortOrder.AscendingOrder
+        self.refresh()
+
+    # --- Qt model interface ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if (
+            role == Qt.ItemDataRole.DisplayRole
+            and orientation == Qt.Orientation.Horizontal
+        ):
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        key = self.key_at(index.row())
+        field = self.FIELDS[index.column()]
+        if field == "title":
+            return key
+        if field == "mle":
+            mle = self.session.mle_scores.get(key)
+            return "" if mle is None else str(int(mle))  # Blank until a fit
+        value = self.value(key, field)
+        return value if field == "artist" else str(int(value))
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        if self.FIELDS[column] in ("rank", "score"):
+            self.keys = None
+            self.sort_values = {}
+        else:
+            self.build_keys()
+        self.layoutChanged.emit()
+
+    # --- Helpers ---
+
+    def ranked_by_order(self):
+        """True if rows are read from self.order, False if from self.keys."""
+        return self.keys is None
+
+    def rows(self):
+        """The sorted list rows are read from."""
+        return self.order if self.ranked_by_order() else self.keys
+
+    def reversed_order(self):
+        """True if row 0 shows the last item of self.rows()."""
+        descending = self.sort_order == Qt.SortOrder.DescendingOrder
+        if not self.ranked_by_order():
+            return descending
+        # Best first is rank ascending, or score descending
+        return descending == (self.FIELDS[self.sort_column] == "rank")
+
+    def entry(self, key):
+        """The item of `key` in self.rows()."""
+        if self.ranked_by_order():
+            return (-self.scores[key], key)
+        return (self.sort_values[key], key)
+
+    def to_row(self, position):
+        """Row of the item at `position` in self.rows() (and the reverse)."""
+        if self.reversed_order():
+            return len(self.order) - 1 - position
+        return position
+
+    def key_at(self, row):
+        return self.rows()[self.to_row(row)][1]
+
+    def row_of(self, key):
+        return self.to_row(self.rows().index(self.entry(key)))
+
+    def value(self, key, field):
+        """Sort value of one cell."""
+        if field == "rank":
+            return self.order.index((-self.scores[key], key)) + 1
+        if field == "score":
+            return self.scores[key]
+        if field == "title":
+            return key.lower()
+        if field == "artist":
+            artist = self.artists.get(key)
+            if artist is None:
+                artist = self.artists[key] = self.session.songs[key]["artist"]
+            return artist
+        if field == "mle":
+            return self.session.mle_scores.get(key, float("-inf"))
+        return self.session.get_field_values([key], field)[0]
+
+    def build_keys(self):
+        """Sorts the rows by the current (non-rank) sort column."""
+        field = self.FIELDS[self.sort_column]
+        keys = [key for _, key in self.order]
+        if field in ("artist", "matches"):
+            # One bulk read instead of one per song
+            values = self.session.get_field_values(keys, field)
+            if field == "artist":
+                self.artists.update(zip(keys, values))
+        else:
+            values = [self.value(key, field) for key in keys]
+        self.sort_values = dict(zip(keys, values))
+        self.keys = OrderStatisticList(zip(values, keys))
+
+    def in_filter(self, key):
+        return (
+            self.album == "All Albums" or self.session.songs[key]["album"] == self.album
+        )
+
+    def refresh(self):
+        """Reloads every row, e.g. after all ratings were recomputed."""
+        self.beginResetModel()
+        album = self.session.active_filter
+        self.session.active_filter = self.album
+        try:
+            keys = self.session.get_filtered_keys()
+        finally:
+            self.session.active_filter = album
+        self.scores = dict(zip(keys, self.session.get_field_values(keys, "score")))
+        self.order.build((-score, key) for key, score in self.scores.items())
+        self.artists = {}
+        if not self.ranked_by_order():
+            self.build_keys()
+        self.endResetModel()
+
+    def ranks_changed(self):
+        # Any rank may have shifted; only visible cells get repainted
+        if len(self.order):
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.order) - 1, 0))
+
+    def remove_keys(self, keys):
+        """Drops the rows of songs that were deleted or merged away."""
+        for key in keys:
+            if key not in self.scores:
+                continue
+            row = self.row_of(key)
+            self.beginRemoveRows(QModelIndex(), row, row)
+            if not self.ranked_by_order():
+                self.keys.remove(self.entry(key))
+                del self.sort_values[key]
+            self.order.remove((-self.scores.pop(key), key))
+            self.endRemoveRows()
+            self.artists.pop(key, None)
+        self.ranks_changed()
+
+    def insert_keys(self, keys):
+        """Adds rows for new songs that match the filter, in sorted place."""
+        for key in keys:
+            if key in self.scores or key not in self.session.songs:
+                continue
+            if not self.in_filter(key):
+                continue
+            score = self.session.get_field_values([key], "score")[0]
+            if self.ranked_by_order():
+                entry = (-score, key)
+            else:
+                entry = (self.value(key, self.FIELDS[self.sort_column]), key)
+            # The row is found before anything changes: views must see the
+            # insertion announced while the model still has the old rows
+            position = self.rows().bisect_left(entry)
+            row = len(self.order) - position if self.reversed_order() else position
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.scores[key] = score
+            self.order.add((-score, key))
+            if not self.ranked_by_order():
+                self.sort_values[key] = entry[0]
+                self.keys.add(entry)
+            self.endInsertRows()
+        self.ranks_changed()
+
+    def scores_changed(self, keys):
+        """
+        Moves songs whose score changed (e.g. the two songs of a vote) to
+        their new rank, in O(log n) each.
+        """
+        field = self.FIELDS[self.sort_column]
+        for key in keys:
+            if key not in self.scores:
+                continue
+            score = self.session.get_field_values([key], "score")[0]
+            rows = self.rows()
+            old_entry = self.entry(key)
+            if self.ranked_by_order():
+                new_entry = (-score, key)
+            elif field == "matches":
+                new_entry = (self.value(key, field), key)
+            else:
+                new_entry = old_entry  # A vote changes no other sort value
+            old_position = rows.index(old_entry)
+            new_position = rows.bisect_left(new_entry)
+            if new_position > old_position:
+                new_position -= 1  # The old entry goes away first
+            old_row = self.to_row(old_position)
+            new_row = self.to_row(new_position)
+
+            moved = new_row != old_row and self.beginMoveRows(
+                QModelIndex(),
+                old_row,
+                old_row,
+                QModelIndex(),
+                # Counted in rows before the move
+                new_row + 1 if new_row > old_row else new_row,
+            )
+            self.order.remove((-self.scores[key], key))
+            self.order.add((-score, key))
+            self.scores[key] = score
+            if new_entry != old_entry and not self.ranked_by_order():
+                self.keys.remove(old_entry)
+                self.keys.add(new_entry)
+                self.sort_values[key] = new_entry[0]
+            if moved:
+                self.endMoveRows()
+
+            first, last = min(old_row, new_row), max(old_row, new_row)
+            self.dataChanged.emit(
+                self.index(first, 0), self.index(last, len(self.COLUMNS) - 1)
+            )
+        self.ranks_changed()
+
+    def column_changed(self, field):
+        """Repaints one column after its values changed, re-sorting if needed."""
+        column = self.FIELDS.index(field)
+        if column == self.sort_column:
+            self.sort(self.sort_column, self.sort_order)
+        elif len(self.order):
+            self.dataChanged.emit(
+                self.index(0, column), self.index(len(self.order) - 1, column)
+            )
+
+
+class AlbumRankingModel(QAbstractTableModel):
+    """
+    Album rows from RankingSession.get_album_stats, best average first.
+    The Cover column only carries the cover url (UserRole); CoverDelegate
+    paints it.
+    """
+
+    COLUMNS = (
+        "Rank",
+        "Cover",
+        "Album",
+        "Avg Score",
+        "Median",
+        "Std Dev",
+        "95% CI",
+        "Songs",
+        "Matches",
+    )
+
+    def __init__(self, albums, parent=None):
+        super().__init__(parent)
+        self.albums = albums
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.albums)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if (
+            role == Qt.ItemDataRole.DisplayRole
+            and orientation == Qt.Orientation.Horizontal
+        ):
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self.albums[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.UserRole and column == 1:
+            return item["cover_url"]
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if column == 0:
+            return str(index.row() + 1)
+        if column == 2:
+            return f"{item['name']}\n{item['artist']}"
+        if column == 3:
+            return f"{item['mean']:.1f}"
+        if column == 4:
+            return f"{item['median']:.1f}"
+        if column == 5:
+            return f"{item['std']:.1f}"
+        if column == 6:
+            return f"± {item['ci95']:.1f}"
+        if column == 7:
+            return str(item["count"])
+        if column == 8:
+            return str(item["matches"])
+        return None
@@ -0,0 +1,52 @@
+from ranking_session import RankingSession
+
+
+def make_songs():
+    songs = {}
+    for album in range(6):
+        for track in range(4):
+            songs[f"Album {album} / {track}"] = {
+                "score": 1000 + 10 * album - track,
+                "matches": track,
+                "album": f"Album {album}",
+                "artist": f"Artist {album}",
+                "cover_url": f"http://covers/{album}" if track else None,
+            }
+    songs["Loose"] = {"score": 990, "matches": 0, "album": None, "artist": "Solo"}
+    return songs
+
+
+def session_for(backend, tmp_path):
+    session = RankingSession(columnar=backend == "columnar")
+    if backend == "sqlite":
+        ok, msg = session.save_session(str(tmp_path / f"{backend}.db"))
+        assert ok, msg
+    session.merge_data(make_songs())
+    return session
+
+
+def by_album(session):
+    return {item["name"]: item for item in session.get_album_stats()}
+
+
+def test_backends_agree(tmp_path):
+    stats = {
+        backend: by_album(session_for(backend, tmp_path))
+        for backend in ("dict", "columnar", "sqlite")
+    }
+    assert stats["dict"] == stats["columnar"] == stats["sqlite"]
+    album = stats["dict"]["Album 2"]
+    assert album["artist"] == "Artist 2"
+    assert album["cover_url"] == "http://covers/2"
+    assert album["count"] == 4
+    assert None not in stats["dict"]
+
+
+def test_sqlite_reads_artists_in_one_query(tmp_path):
+    session = session_for("sqlite", tmp_path)
+    statements = []
+    session.songs.conn.set_trace_callback(statements.append)
+    stats = session.get_album_stats()
+    session.songs.conn.set_trace_callback(None)
+    assert len(stats) == 6
+    assert len(statements) == 1
@@ -0,0 +1,101 @@
+import pytest
+
+from ranking_session import RankingSession
+
+BACKENDS = ("dict", "columnar", "sqlite")
+
+
+def song(album="Album", year="2001", cover_url=None):
+    return {
+        "artist": "Band",
+        "album": album,
+        "year": year,
+        "cover_url": cover_url,
+        "score": 1200,
+        "matches": 0,
+    }
+
+
+@pytest.fixture(params=BACKENDS)
+def session(request, tmp_path):
+    session = RankingSession(columnar=request.param == "columnar")
+    if request.param == "sqlite":
+        ok, msg = session.save_session(str(tmp_path / "session.db"))
+        assert ok, msg
+    session.merge_data({"Old Hit": song(album="Greatest Hits")})
+    yield session
+    session.close()
+
+
+def test_pages_add_new_songs(session):
+    imported = set()
+    added = session.merge_import_page({"songs": {"A": song(), "B": song()}}, imported)
+    assert added == 2
+    assert imported == {"A", "B"}
+    added = session.merge_import_page({"songs": {"B": song(), "C": song()}}, imported)
+    assert added == 1
+    assert imported == {"A", "B", "C"}
+    assert len(session.songs) == 4
+
+
+def test_rename_keeps_votes_of_imported_song(session):
+    imported = set()
+    session.merge_import_page({"songs": {"Song (Live)": song(), "B": song()}}, imported)
+    session.update_score("Song (Live)", "B")
+    page = {"songs": {"Song": song()}, "renamed": [["Song (Live)", "Song"]]}
+    assert session.merge_import_page(page, imported) == 0
+    assert "Song (Live)" not in session.songs
+    assert session.songs["Song"]["matches"] == 1
+    assert imported == {"Song", "B"}
+    assert session.get_vote_log() == [("Song", "B")]
+
+
+def test_songs_from_before_the_import_are_left_alone(session):
+    imported = set()
+    page = {
+        "songs": {"Old Hit": song(album="Debut", year="1999")},
+        "renamed": [["Old Hit", "Old Hit 2"]],
+    }
+    assert session.merge_import_page(page, imported) == 0
+    assert "Old Hit 2" not in session.songs
+    assert session.songs["Old Hit"]["album"] == "Greatest Hits"
+    assert imported == set()
+
+
+def test_later_page_corrects_imported_metadata(session):
+    imported = set()
+    session.merge_import_page(
+        {"songs": {"A": song(album="Live", year="2005")}}, imported
+    )
+    session.update_score("A", "Old Hit")
+    fixed = song(album="Debut", year="1999", cover_url="http://cover")
+    session.merge_import_page({"songs": {"A": fixed}}, imported)
+    data = session.songs["A"]
+    assert (data["album"], data["year"], data["cover_url"]) == (
+        "Debut",
+        "1999",
+        "http://cover",
+    )
+    assert data["matches"] == 1
+    assert "A" in session.get_album_keys("Debut")
+    assert "Live" not in session.get_albums_list()
+
+
+def test_journal_replays_import_pages(tmp_path):
+    path = str(tmp_path / "session.json")
+    session = RankingSession()
+    assert session.save_session(path)[0]
+    imported = set()
+    session.merge_import_page({"songs": {"X (Demo)": song(), "Y": song()}}, imported)
+    session.update_score("X (Demo)", "Y")
+    session.merge_import_page(
+        {"songs": {"X": song(album="Final")}, "renamed": [["X (Demo)", "X"]]},
+        imported,
+    )
+    expected = session.songs_as_dict()
+    session.close()
+
+    loaded = RankingSession()
+    assert loaded.load_from_file(path)[0]
+    assert loaded.songs_as_dict() == expected
+    assert loaded.get_vote_log() == [("X", "Y")]
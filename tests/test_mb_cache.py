@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+import mb_cache
+from mb_cache import OfflineCacheMiss, ResponseCache, open_cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(mb_cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache" / "mb.sqlite"))
+    yield cache
+    cache.close()
+
+
+def counting_fetch(value):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return value
+
+    return fetch, calls
+
+
+def test_hit_until_expiry(cache, clock):
+    fetch, calls = counting_fetch({"release-list": [1, 2]})
+    for _ in range(3):
+        assert cache.call("browse", 60, fetch, artist="a") == {"release-list": [1, 2]}
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    clock.now += 61
+    cache.call("browse", 60, fetch, artist="a")
+    assert len(calls) == 2
+
+
+def test_arguments_are_part_of_the_key(cache):
+    fetch, calls = counting_fetch([])
+    cache.call("browse", 60, fetch, artist="a", offset=0)
+    cache.call("browse", 60, fetch, offset=0, artist="a")
+    cache.call("browse", 60, fetch, artist="a", offset=100)
+    cache.call("search", 60, fetch, artist="a", offset=0)
+    assert len(calls) == 3
+
+
+def test_offline_uses_expired_entries_and_fails_on_misses(tmp_path, clock):
+    path = str(tmp_path / "mb.sqlite")
+    online = ResponseCache(path)
+    online.call("search", 60, lambda: {"artist-list": ["x"]}, artist="Band")
+    online.close()
+    clock.now += 3600
+
+    offline = ResponseCache(path, offline=True)
+    fetch, calls = counting_fetch(None)
+    assert offline.call("search", 60, fetch, artist="Band") == {"artist-list": ["x"]}
+    assert offline.stale_hits == 1
+    with pytest.raises(OfflineCacheMiss):
+        offline.call("search", 60, fetch, artist="Other")
+    assert calls == []
+    offline.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    value = {"data": os.urandom(3000).hex()}  # Barely compressible
+    cache = ResponseCache(str(tmp_path / "mb.sqlite"), max_bytes=12000)
+    for name in ("a", "b", "c"):
+        clock.now += 1
+        cache.call(name, 60, lambda: value)
+    clock.now += 1
+    cache.get(cache.make_key("a", {}))  # Now "b" is the oldest
+    clock.now += 1
+    cache.call("d", 60, lambda: value)
+
+    stats = cache.stats()
+    assert stats["cache_bytes"] <= 12000
+    assert cache.get(cache.make_key("b", {})) is None
+    for name in ("a", "c", "d"):
+        assert cache.get(cache.make_key(name, {})) == value
+    cache.close()
+
+
+def test_oversized_responses_are_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path / "mb.sqlite"), max_bytes=100)
+    cache.call("big", 60, lambda: os.urandom(500).hex())
+    assert cache.stats()["cache_entries"] == 0
+    cache.close()
+
+
+def test_open_cache_reads_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv(mb_cache.CACHE_PATH_ENV, "off")
+    assert open_cache() is None
+
+    path = str(tmp_path / "mb.sqlite")
+    monkeypatch.setenv(mb_cache.CACHE_PATH_ENV, path)
+    monkeypatch.setenv(mb_cache.OFFLINE_ENV, "1")
+    cache = open_cache()
+    assert cache.path == path
+    assert cache.offline
+    cache.close()
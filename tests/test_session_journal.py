@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from ranking_session import RankingSession
+from session_journal import SessionJournal
+
+
+def make_songs(count=4):
+    return {
+        f"Song {i}": {"score": 1000, "matches": 0, "album": "Album", "artist": "Band"}
+        for i in range(count)
+    }
+
+
+def vote_n(session, count):
+    for i in range(count):
+        session.update_score("Song 0", f"Song {1 + i % 3}")
+
+
+def saved_session(path):
+    session = RankingSession()
+    session.merge_data(make_songs())
+    ok, msg = session.save_session(str(path))
+    assert ok, msg
+    return session
+
+
+def reload(path):
+    session = RankingSession()
+    ok, msg = session.load_from_file(str(path))
+    assert ok, msg
+    return session
+
+
+def test_unsaved_votes_are_replayed(tmp_path):
+    path = tmp_path / "session.json"
+    session = saved_session(path)
+    vote_n(session, 5)
+    session.close()
+
+    loaded = reload(path)
+    assert loaded.count_votes() == 5
+    assert loaded.songs["Song 0"]["matches"] == 5
+    assert loaded.has_unsaved_changes
+
+
+def test_save_empties_journal(tmp_path):
+    path = tmp_path / "session.json"
+    session = saved_session(path)
+    vote_n(session, 5)
+    assert session.save_session()[0]
+    session.close()
+
+    assert list(SessionJournal.read_events(str(path), generation=2)) == []
+    assert reload(path).count_votes() == 5
+
+
+def test_crash_before_journal_reset_does_not_replay_twice(tmp_path, monkeypatch):
+    path = tmp_path / "session.json"
+    session = saved_session(path)
+    vote_n(session, 20)
+
+    # The process dies after the new snapshot replaced the old one
+    def crash(self, generation):
+        raise RuntimeError("crashed")
+
+    monkeypatch.setattr(SessionJournal, "reset", crash)
+    ok, _ = session.save_session()
+    assert not ok
+    session.close()
+    monkeypatch.undo()
+
+    loaded = reload(path)
+    assert loaded.count_votes() == 20
+    assert loaded.songs["Song 0"]["matches"] == 20
+
+    # Edits made after recovering are replayed on top of the new snapshot
+    vote_n(loaded, 3)
+    loaded.close()
+    again = reload(path)
+    assert again.count_votes() == 23
+    assert again.songs["Song 0"]["matches"] == 23
+
+
+def test_untagged_events_replay_on_old_snapshots(tmp_path):
+    path = tmp_path / "session.json"
+    path.write_text(json.dumps(make_songs()))
+    with open(str(path) + SessionJournal.SUFFIX, "w") as f:
+        f.write(json.dumps({"op": "vote", "winner": "Song 0", "loser": "Song 1"}))
+        f.write("\n")
+
+    loaded = reload(path)
+    assert loaded.count_votes() == 1
+    assert loaded.generation == 0
+
+
+def test_partial_last_line_is_dropped(tmp_path):
+    path = tmp_path / "session.json"
+    session = saved_session(path)
+    vote_n(session, 2)
+    session.close()
+    with open(str(path) + SessionJournal.SUFFIX, "a") as f:
+        f.write('{"op":"vote","winner":"Song 0"')
+
+    loaded = reload(path)
+    assert loaded.count_votes() == 2
+    vote_n(loaded, 1)
+    loaded.close()
+    assert reload(path).count_votes() == 3
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_generation_advances_with_each_save(tmp_path, columnar):
+    path = tmp_path / "session.json"
+    session = RankingSession(columnar=columnar)
+    session.merge_data(make_songs())
+    for generation in (1, 2, 3):
+        assert session.save_session(str(path))[0]
+        assert session.generation == generation
+    session.close()
+    assert reload(path).generation == 3
@@ -0,0 +1,226 @@
+import os
+import random
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtCore = pytest.importorskip("PyQt6.QtCore")
+QtTest = pytest.importorskip("PyQt6.QtTest")
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+
+from PyQt6.QtCore import (  # noqa: E402
+    Qt,
+    QtMsgType,
+    qInstallMessageHandler,
+)
+from PyQt6.QtTest import QAbstractItemModelTester  # noqa: E402
+from PyQt6.QtWidgets import QApplication, QTableView  # noqa: E402
+
+from ranking_session import RankingSession  # noqa: E402
+from table_models import LeaderboardModel  # noqa: E402
+
+ORDERS = (Qt.SortOrder.AscendingOrder, Qt.SortOrder.DescendingOrder)
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def qt_warnings(app):
+    """Warnings Qt logged during the test (the model tester's findings)."""
+    messages = []
+
+    def handler(mode, context, text):
+        if mode == QtMsgType.QtDebugMsg or mode == QtMsgType.QtInfoMsg:
+            return
+        # The tester expects column 0 of the rows around an insertion to keep
+        # its value, but that column is the rank, which does shift
+        if "(c.last)" in text or "(c.next)" in text:
+            return
+        messages.append(text)
+
+    previous = qInstallMessageHandler(handler)
+    yield messages
+    qInstallMessageHandler(previous)
+
+
+def make_session(count=40, seed=1):
+    rng = random.Random(seed)
+    session = RankingSession()
+    session.merge_data(
+        {
+            f"Song {i:02d}": {
+                "score": rng.choice((950, 1000, 1000, 1050, 1100)),
+                "matches": rng.randrange(4),
+                "album": f"Album {i % 3}",
+                "artist": rng.choice(("Band", "Alpha", "Zed")),
+            }
+            for i in range(count)
+        }
+    )
+    return session
+
+
+def checked_model(session, column, order):
+    model = LeaderboardModel(session)
+    model.sort(column, order)
+    tester = QAbstractItemModelTester(
+        model, QAbstractItemModelTester.FailureReportingMode.Warning
+    )
+    return model, tester
+
+
+def displayed_keys(model):
+    return [model.key_at(row) for row in range(model.rowCount())]
+
+
+def expected_keys(model):
+    """The rows recomputed from the session with a plain sort."""
+    session = model.session
+    field = model.FIELDS[model.sort_column]
+    descending = model.sort_order == Qt.SortOrder.DescendingOrder
+    keys = list(model.scores)
+    if field in ("rank", "score"):
+        keys.sort(key=lambda k: (-session.score_index.scores[k], k))
+        return keys[::-1] if descending == (field == "rank") else keys
+    if field == "title":
+        values = {k: k.lower() for k in keys}
+    elif field == "mle":
+        values = {k: session.mle_scores.get(k, float("-inf")) for k in keys}
+    else:
+        values = dict(zip(keys, session.get_field_values(keys, field)))
+    keys.sort(key=lambda k: (values[k], k), reverse=descending)
+    return keys
+
+
+def assert_consistent(model):
+    keys = displayed_keys(model)
+    assert keys == expected_keys(model)
+    assert [model.row_of(k) for k in keys] == list(range(len(keys)))
+
+
+@pytest.mark.parametrize("order", ORDERS)
+@pytest.mark.parametrize("column", range(len(LeaderboardModel.COLUMNS)))
+def test_insert_and_remove_rows(qt_warnings, column, order):
+    session = make_session()
+    model, tester = checked_model(session, column, order)
+    assert_consistent(model)
+
+    new = {
+        "New Top": {"score": 1300, "matches": 9, "album": "X", "artist": "Mid"},
+        "new bottom": {"score": 800, "matches": 0, "album": "X", "artist": "Aaa"},
+        "New Tie": {"score": 1000, "matches": 2, "album": "X", "artist": "Band"},
+    }
+    for title, data in new.items():
+        session.add_song(title, data)
+        model.insert_keys([title])
+        assert_consistent(model)
+
+    removed = ["New Tie", "Song 00", displayed_keys(model)[0]]
+    for title in removed:
+        session.delete_song(title)
+        model.remove_keys([title])
+        assert_consistent(model)
+    assert not qt_warnings
+
+
+def test_insert_announces_row_before_adding_it(app):
+    session = make_session(count=5)
+    model = LeaderboardModel(session)
+    model.sort(1, Qt.SortOrder.AscendingOrder)
+    seen = []
+    model.rowsAboutToBeInserted.connect(
+        lambda parent, first, last: seen.append(model.rowCount())
+    )
+    session.add_song("Late", {"score": 1000, "matches": 0, "artist": "B"})
+    model.insert_keys(["Late"])
+    assert seen == [5]
+    assert model.rowCount() == 6
+
+
+def test_filtered_model_skips_other_albums(app):
+    session = make_session()
+    session.active_filter = "Album 1"
+    model = LeaderboardModel(session)
+    session.active_filter = "All Albums"
+    model.sort(2, Qt.SortOrder.AscendingOrder)
+    assert all(session.songs[k]["album"] == "Album 1" for k in displayed_keys(model))
+
+    session.add_song("Elsewhere", {"score": 1, "matches": 0, "album": "Album 2"})
+    rows = model.rowCount()
+    model.insert_keys(["Elsewhere"])
+    assert model.rowCount() == rows
+    assert_consistent(model)
+
+
+@pytest.mark.parametrize("order", ORDERS)
+@pytest.mark.parametrize("column", range(len(LeaderboardModel.COLUMNS)))
+def test_votes_move_rows(qt_warnings, column, order):
+    session = make_session()
+    model, tester = checked_model(session, column, order)
+    rng = random.Random(column)
+    keys = sorted(session.songs)
+    for _ in range(20):
+        winner, loser = rng.sample(keys, 2)
+        session.update_score(winner, loser)
+        model.scores_changed((winner, loser))
+        assert_consistent(model)
+    assert not qt_warnings
+
+
+def test_votes_after_fit_sorted_by_mle(qt_warnings):
+    session = make_session()
+    model, tester = checked_model(session, 5, Qt.SortOrder.DescendingOrder)
+    session.mle_scores = {
+        key: i * 7 % 40 for i, key in enumerate(sorted(session.songs))
+    }
+    model.column_changed("mle")
+    assert_consistent(model)
+    session.update_score("Song 01", "Song 02")
+    model.scores_changed(("Song 01", "Song 02"))
+    assert_consistent(model)
+    assert not qt_warnings
+
+
+def paint_all(model):
+    """Reads every cell like a repaint of the whole table does."""
+    for row in range(model.rowCount()):
+        for column in range(model.columnCount()):
+            model.data(model.index(row, column))
+
+
+@pytest.mark.parametrize("column", (0, 1))
+def test_album_delete_then_repaint(qt_warnings, column):
+    session = make_session()
+    model, tester = checked_model(session, column, Qt.SortOrder.AscendingOrder)
+    view = QTableView()
+    view.setModel(model)
+    view.resize(600, 2000)
+    view.show()
+
+    # What MainWindow.delete_current_album does with an open leaderboard
+    keys = session.get_album_keys("Album 1")
+    assert session.delete_album("Album 1") == len(keys)
+    model.remove_keys(keys)
+
+    assert model.rowCount() == len(session.songs)
+    assert not set(keys) & set(displayed_keys(model))
+    paint_all(model)
+    view.grab()
+    assert_consistent(model)
+    assert not qt_warnings
+
+
+def test_refresh_after_the_session_is_replaced(app):
+    session = make_session()
+    model = LeaderboardModel(session)
+    model.sort(1, Qt.SortOrder.AscendingOrder)
+    session.new_session()
+    session.merge_data(
+        {"Only": {"score": 1000, "matches": 0, "album": "A", "artist": "B"}}
+    )
+    model.refresh()
+    assert displayed_keys(model) == ["Only"]
+    paint_all(model)
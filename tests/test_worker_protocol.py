@@ -0,0 +1,83 @@
+import io
+import json
+
+from worker_protocol import PROTOCOL_VERSION, FrameParser, decode, encode, send
+
+
+def test_encode_is_one_compact_line():
+    frame = encode("status", message="line one\nline two")
+    assert frame.endswith("\n")
+    assert frame.count("\n") == 1
+    assert json.loads(frame) == {
+        "v": PROTOCOL_VERSION,
+        "type": "status",
+        "message": "line one\nline two",
+    }
+
+
+def test_send_writes_a_frame():
+    stream = io.StringIO()
+    send("final", stream=stream, result={"count": 3})
+    assert decode(stream.getvalue()) == {
+        "v": PROTOCOL_VERSION,
+        "type": "final",
+        "result": {"count": 3},
+    }
+
+
+def test_foreign_lines_become_logs():
+    assert decode("Traceback (most recent call last):\n") == {
+        "type": "log",
+        "text": "Traceback (most recent call last):",
+    }
+    assert decode('{"type": "something else"}')["type"] == "log"
+    assert decode("[1, 2]")["type"] == "log"
+
+
+def test_other_protocol_versions_are_errors():
+    message = decode(json.dumps({"v": PROTOCOL_VERSION + 1, "type": "final"}))
+    assert message["type"] == "error"
+    assert "version" in message["message"]
+
+
+def test_frames_split_across_chunks():
+    data = (
+        encode("status", message="Searching...")
+        + encode("partial", data={"songs": {"Café": {}}})
+        + encode("final", result=None)
+    ).encode("utf-8")
+    # Every split point, including inside the multibyte é
+    for cut in range(1, len(data)):
+        parser = FrameParser()
+        messages = parser.feed(data[:cut]) + parser.feed(data[cut:])
+        assert [m["type"] for m in messages] == ["status", "partial", "final"]
+        assert messages[1]["data"] == {"songs": {"Café": {}}}
+        assert parser.close() == []
+
+
+def test_byte_at_a_time():
+    data = encode("progress", current=1, total=2, message="x").encode("utf-8") * 3
+    parser = FrameParser()
+    messages = []
+    for i in range(len(data)):
+        messages += parser.feed(data[i : i + 1])
+    assert len(messages) == 3
+    assert all(m["current"] == 1 for m in messages)
+
+
+def test_partial_frame_waits_for_its_newline():
+    parser = FrameParser()
+    frame = encode("error", message="boom").encode("utf-8")
+    assert parser.feed(frame[:-1]) == []
+    assert parser.feed(b"") == []
+    assert parser.feed(b"\n\n") == [decode(frame.decode("utf-8"))]
+    assert len(parser.buffer) == 0
+
+
+def test_close_flushes_an_unterminated_line():
+    parser = FrameParser()
+    assert parser.feed(b"stray print\n" + encode("final", result=1).encode()[:-1]) == [
+        {"type": "log", "text": "stray print"}
+    ]
+    assert parser.close() == [{"v": PROTOCOL_VERSION, "type": "final", "result": 1}]
+    assert parser.close() == []
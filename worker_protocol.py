@@ -0,0 +1,92 @@
+"""
+Messages fetch_data.py sends to the app over stdout.
+
+Every message is one line of compact JSON (JSON escapes newlines inside
+strings, so a newline always ends a frame) carrying the protocol version
+and its type:
+
+    {"v": 1, "type": "status", "message": "Searching..."}
+    {"v": 1, "type": "progress", "current": 30, "total": 120, "message": "..."}
+    {"v": 1, "type": "partial", "data": {...}}
+    {"v": 1, "type": "final", "result": ...}
+    {"v": 1, "type": "error", "message": "..."}
+    {"v": 1, "type": "metrics", "seconds": 4.2, ...}
+
+Answers of the "serve" mode are "final" or "error" messages with the "id"
+of their request.
+"""
+
+import json
+import sys
+
+PROTOCOL_VERSION = 1
+MESSAGE_TYPES = ("status", "progress", "partial", "final", "error", "metrics")
+
+
+def encode(kind, **fields):
+    """One framed message, newline included."""
+    message = {"v": PROTOCOL_VERSION, "type": kind, **fields}
+    return json.dumps(message, separators=(",", ":")) + "\n"
+
+
+def send(kind, stream=None, **fields):
+    """Writes a message to `stream` (stdout by default) and flushes it."""
+    stream = stream or sys.stdout
+    stream.write(encode(kind, **fields))
+    stream.flush()
+
+
+def decode(line):
+    """
+    Parses one frame. Lines that are not protocol messages (stray prints,
+    tracebacks) come back as {"type": "log", "text": line}; messages of
+    another protocol version as an "error".
+    """
+    try:
+        message = json.loads(line)
+    except ValueError:
+        message = None
+    if not isinstance(message, dict) or message.get("type") not in MESSAGE_TYPES:
+        return {"type": "log", "text": line.rstrip()}
+    if message.get("v") != PROTOCOL_VERSION:
+        return {
+            "type": "error",
+            "message": f"Unsupported worker protocol version {message.get('v')}",
+        }
+    return message
+
+
+class FrameParser:
+    """
+    Splits a byte stream into messages as chunks arrive.
+
+    Only the bytes of each new chunk are searched for the end of a frame;
+    the buffer never holds more than one incomplete line.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Adds a chunk; returns the messages it completed."""
+        # The buffer has no newline, so the search can start at the new bytes
+        search_from = len(self.buffer)
+        self.buffer += data
+        messages = []
+        start = 0
+        while True:
+            end = self.buffer.find(b"\n", search_from)
+            if end < 0:
+                break
+            line = self.buffer[start:end].decode("utf-8", errors="replace")
+            if line.strip():
+                messages.append(decode(line))
+            start = search_from = end + 1
+        del self.buffer[:start]
+        return messages
+
+    def close(self):
+        """Messages left in an unterminated last line, at end of stream."""
+        line = self.buffer.decode("utf-8", errors="replace")
+        self.buffer.clear()
+        return [decode(line)] if line.strip() else []